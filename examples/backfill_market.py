@@ -0,0 +1,63 @@
+import argparse
+import asyncio
+import json
+
+from solders.pubkey import Pubkey
+
+from phoenix.backfill import Backfill
+
+
+async def main():
+    parser = argparse.ArgumentParser(
+        description="Writes the fills of a market's transaction history as JSON lines, oldest first"
+    )
+    parser.add_argument(
+        "-m",
+        "--market",
+        type=str,
+        help="Market base58 string",
+        default="4DoNfFBfF7UokCC2FQzriy7yHK6DY6NVdYpuekQ5pRgg",
+    )
+    parser.add_argument(
+        "-u",
+        "--url",
+        type=str,
+        help="URL of Solana cluster",
+        default="https://api.mainnet-beta.solana.com",
+    )
+    parser.add_argument("--min-slot", type=int, default=0)
+    parser.add_argument("--checkpoint", type=str, default="backfill_checkpoint.json")
+    parser.add_argument("--output", type=str, default="fills.jsonl")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    backfill = Backfill(
+        args.url,
+        Pubkey.from_string(args.market),
+        checkpoint_path=args.checkpoint,
+        max_concurrency=args.max_concurrency,
+    )
+    # Appending keeps the fills written before a restart; fills handed out
+    # after the last checkpoint are written again
+    with open(args.output, "a") as output:
+        async for backfill_transaction in backfill.run(min_slot=args.min_slot):
+            transaction = backfill_transaction.transaction
+            for instruction in transaction.events_from_instructions:
+                header = instruction.header
+                for event in instruction.events:
+                    if event.kind != "Fill":
+                        continue
+                    fill = event.value[0].to_json()
+                    fill.update(
+                        signature=backfill_transaction.signature,
+                        slot=header.slot,
+                        timestamp=header.timestamp,
+                        sequence_number=header.sequence_number,
+                        taker=str(header.signer),
+                    )
+                    output.write(json.dumps(fill) + "\n")
+            output.flush()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
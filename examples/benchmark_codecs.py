@@ -0,0 +1,108 @@
+import argparse
+import os
+import struct
+import timeit
+
+from phoenix.codec import CODECS
+from phoenix.events import EVENT_CLASSES, get_phoenix_events_from_log_data
+from phoenix.types import (
+    AuditLogHeader,
+    EvictEvent,
+    ExpiredOrderEvent,
+    FeeEvent,
+    FillEvent,
+    FillSummaryEvent,
+    PlaceEvent,
+    ReduceEvent,
+    TimeInForceEvent,
+)
+from phoenix.types.phoenix_market_event import (
+    Evict,
+    ExpiredOrder,
+    Fee,
+    Fill,
+    FillSummary,
+    Place,
+    Reduce,
+    TimeInForce,
+)
+from phoenix.types.phoenix_market_event import from_decoded
+from phoenix.types.phoenix_market_event import layout as phoenix_market_event_layout
+
+EVENT_KINDS = [
+    (Fill, FillEvent),
+    (Place, PlaceEvent),
+    (Reduce, ReduceEvent),
+    (Evict, EvictEvent),
+    (FillSummary, FillSummaryEvent),
+    (Fee, FeeEvent),
+    (TimeInForce, TimeInForceEvent),
+    (ExpiredOrder, ExpiredOrderEvent),
+]
+
+
+def borsh_decode(cls, buf: bytes, offset: int):
+    size = cls.layout.sizeof()
+    return cls.from_decoded(cls.layout.parse(buf[offset : offset + size]))
+
+
+def build_log_data(num_events: int) -> bytes:
+    header = AuditLogHeader.layout.parse(os.urandom(AuditLogHeader.layout.sizeof()))
+    header.total_events = num_events
+    data = bytearray([1]) + AuditLogHeader.layout.build(header)
+    for index in range(num_events):
+        kind, cls = EVENT_KINDS[index % len(EVENT_KINDS)]
+        event = cls.from_decoded(cls.layout.parse(os.urandom(cls.layout.sizeof())))
+        data += phoenix_market_event_layout.build(kind((event,)).to_encodable())
+    return bytes(data)
+
+
+def borsh_decode_log_data(data: bytes):
+    # Decoding path used before the struct codecs: the header and every event
+    # are parsed with borsh from a copy of the remaining buffer
+    header = AuditLogHeader.layout.parse(data[1:])
+    events_data = (
+        struct.pack("I", header.total_events)
+        + data[1 + AuditLogHeader.layout.sizeof() :]
+    )
+    offset = 4
+    events = []
+    while offset < len(events_data):
+        event = phoenix_market_event_layout.parse(events_data[offset:])
+        events.append(from_decoded(event))
+        kind = next(iter(event.keys()))
+        offset += 1 + EVENT_CLASSES[kind].layout.sizeof()
+    return header, events
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Times the struct codecs against the borsh layouts. Their parity is"
+        " checked by tests/test_codec.py"
+    )
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=500)
+    args = parser.parse_args()
+
+    for cls, codec in CODECS.items():
+        buf = os.urandom(cls.layout.sizeof())
+        borsh = timeit.timeit(lambda: borsh_decode(cls, buf, 0), number=args.number)
+        struct_codec = timeit.timeit(
+            lambda: codec.from_buffer(buf, 0), number=args.number
+        )
+        print(
+            f"{cls.__name__:>18}: borsh {borsh / args.number * 1e6:7.2f} us,"
+            f" struct {struct_codec / args.number * 1e6:5.2f} us"
+        )
+
+    data = build_log_data(args.events)
+    for name, fn in [
+        ("borsh", borsh_decode_log_data),
+        ("struct", get_phoenix_events_from_log_data),
+    ]:
+        best = min(timeit.repeat(lambda: fn(data), number=1, repeat=5))
+        print(f"{name:>6}: {best * 1000:.2f} ms for a log of {args.events} events")
+
+
+if __name__ == "__main__":
+    main()
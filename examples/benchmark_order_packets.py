@@ -0,0 +1,140 @@
+import argparse
+import random
+import timeit
+
+from phoenix.codec import encode_multiple_order_packet, encode_order_packet
+from phoenix.types import failed_multiple_limit_order_behavior
+from phoenix.types.condensed_order import CondensedOrder
+from phoenix.types.multiple_order_packet import MultipleOrderPacket
+from phoenix.types.order_packet import ImmediateOrCancel, Limit, PostOnly
+from phoenix.types.order_packet import layout as order_packet_layout
+from phoenix.types.self_trade_behavior import Abort, CancelProvide, DecrementTake
+from phoenix.types.side import Ask, Bid
+
+rng = random.Random(0)
+
+
+def random_int(bits: int) -> int:
+    # Bias towards the edges of the range, where encodings usually break
+    return rng.choice([0, 1, (1 << bits) - 1, rng.getrandbits(bits)])
+
+
+def random_option(bits: int):
+    return None if rng.random() < 0.5 else random_int(bits)
+
+
+def random_packet():
+    side = rng.choice([Bid(), Ask()])
+    self_trade_behavior = rng.choice([Abort(), CancelProvide(), DecrementTake()])
+    kind = rng.choice([PostOnly, Limit, ImmediateOrCancel])
+    if kind is PostOnly:
+        return PostOnly(
+            {
+                "side": side,
+                "price_in_ticks": random_int(64),
+                "num_base_lots": random_int(64),
+                "client_order_id": random_int(128),
+                "reject_post_only": rng.random() < 0.5,
+                "use_only_deposited_funds": rng.random() < 0.5,
+                "last_valid_slot": random_option(64),
+                "last_valid_unix_timestamp_in_seconds": random_option(64),
+                "fail_silently_on_insufficient_funds": rng.random() < 0.5,
+            }
+        )
+    if kind is Limit:
+        return Limit(
+            {
+                "side": side,
+                "price_in_ticks": random_int(64),
+                "num_base_lots": random_int(64),
+                "self_trade_behavior": self_trade_behavior,
+                "match_limit": random_option(64),
+                "client_order_id": random_int(128),
+                "use_only_deposited_funds": rng.random() < 0.5,
+                "last_valid_slot": random_option(64),
+                "last_valid_unix_timestamp_in_seconds": random_option(64),
+                "fail_silently_on_insufficient_funds": rng.random() < 0.5,
+            }
+        )
+    return ImmediateOrCancel(
+        {
+            "side": side,
+            "price_in_ticks": random_option(64),
+            "num_base_lots": random_int(64),
+            "num_quote_lots": random_int(64),
+            "min_base_lots_to_fill": random_int(64),
+            "min_quote_lots_to_fill": random_int(64),
+            "self_trade_behavior": self_trade_behavior,
+            "match_limit": random_option(64),
+            "client_order_id": random_int(128),
+            "use_only_deposited_funds": rng.random() < 0.5,
+            "last_valid_slot": random_option(64),
+            "last_valid_unix_timestamp_in_seconds": random_option(64),
+        }
+    )
+
+
+def random_multiple_order_packet():
+    def random_orders():
+        return [
+            CondensedOrder(
+                price_in_ticks=random_int(64),
+                size_in_base_lots=random_int(64),
+                last_valid_slot=random_option(64),
+                last_valid_unix_timestamp_in_seconds=random_option(64),
+            )
+            for _ in range(rng.randrange(12))
+        ]
+
+    behavior = rng.choice(
+        [
+            failed_multiple_limit_order_behavior.FailOnInsufficientFundsAndAmendOnCross,
+            failed_multiple_limit_order_behavior.FailOnInsufficientFundsAndFailOnCross,
+            failed_multiple_limit_order_behavior.SkipOnInsufficientFundsAndAmendOnCross,
+            failed_multiple_limit_order_behavior.SkipOnInsufficientFundsAndFailOnCross,
+        ]
+    )
+    return MultipleOrderPacket(
+        bids=random_orders(),
+        asks=random_orders(),
+        client_order_id=random_option(128),
+        failed_multiple_limit_order_behavior=behavior(),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Times the order packet encoder against the borsh layout. Their parity"
+        " is checked by tests/test_codec.py"
+    )
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for kind in [PostOnly, Limit, ImmediateOrCancel]:
+        packet = random_packet()
+        while not isinstance(packet, kind):
+            packet = random_packet()
+        borsh = timeit.timeit(
+            lambda: order_packet_layout.build(packet.to_encodable()),
+            number=args.number,
+        )
+        encoder = timeit.timeit(lambda: encode_order_packet(packet), number=args.number)
+        print(
+            f"{kind.kind:>17}: borsh {borsh / args.number * 1e6:6.2f} us,"
+            f" struct {encoder / args.number * 1e6:5.2f} us"
+        )
+
+    packet = random_multiple_order_packet()
+    number = args.number // 10
+    borsh = timeit.timeit(
+        lambda: MultipleOrderPacket.layout.build(packet.to_encodable()), number=number
+    )
+    encoder = timeit.timeit(lambda: encode_multiple_order_packet(packet), number=number)
+    print(
+        f"MultipleOrderPacket of {len(packet.bids)} bids and {len(packet.asks)} asks:"
+        f" borsh {borsh / number * 1e6:.2f} us, struct {encoder / number * 1e6:.2f} us"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import os
+import struct
+import timeit
+
+from phoenix.market import (
+    deserialize_pubkey,
+    deserialize_red_black_tree_nodes,
+    deserialize_trader_state,
+    deserialize_trader_tree,
+)
+from phoenix.types.trader_state import TraderState
+
+TRADER_NODE_SIZE = 16 + 32 + TraderState.size()
+
+
+def build_trader_tree(num_seats: int, num_free: int) -> bytes:
+    """
+    Builds a serialized trader tree with every seat allocated and the first
+    `num_free` nodes on the free list. Tree registers are left empty since
+    decoding walks the nodes in address order.
+    """
+    data = bytearray(32 + TRADER_NODE_SIZE * num_seats)
+    free_list_head = num_seats + 1
+    for index in range(num_seats):
+        offset = 32 + index * TRADER_NODE_SIZE
+        if index < num_free:
+            struct.pack_into("<I", data, offset, free_list_head)
+            free_list_head = index + 1
+        data[offset + 16 : offset + 48] = os.urandom(32)
+        struct.pack_into("<4Q", data, offset + 48, *struct.unpack("<4H", os.urandom(8)))
+    struct.pack_into("<QII", data, 16, num_seats, num_seats + 1, free_list_head)
+    return bytes(data)
+
+
+def two_pass(data: bytes):
+    # Decoding path used before traders and index maps were decoded together:
+    # every node is decoded once for the traders and again for the index maps
+    args = (data, 32, TraderState.size(), deserialize_pubkey, deserialize_trader_state)
+    nodes, free_nodes = deserialize_red_black_tree_nodes(*args)
+    traders = {
+        trader: trader_state
+        for index, (trader, trader_state) in enumerate(nodes)
+        if index not in free_nodes
+    }
+    nodes, free_nodes = deserialize_red_black_tree_nodes(*args)
+    trader_pubkey_to_trader_index = {
+        trader: index + 1
+        for index, (trader, _) in enumerate(nodes)
+        if index not in free_nodes
+    }
+    trader_index_to_trader_pubkey = {
+        index: trader for trader, index in trader_pubkey_to_trader_index.items()
+    }
+    return traders, trader_pubkey_to_trader_index, trader_index_to_trader_pubkey
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compares two-pass and single-pass trader tree decoding"
+    )
+    parser.add_argument("--seats", type=int, default=8193)
+    parser.add_argument("--free", type=int, default=128)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = build_trader_tree(args.seats, args.free)
+    assert two_pass(data) == deserialize_trader_tree(data)
+
+    for name, fn in [("two pass", two_pass), ("single pass", deserialize_trader_tree)]:
+        best = min(timeit.repeat(lambda: fn(data), number=1, repeat=args.repeat))
+        print(f"{name:>12}: {best * 1000:.1f} ms for {args.seats} seats")
+
+
+if __name__ == "__main__":
+    main()
@@ -412,12 +412,8 @@ class Bot:
         if len(self.bids) > 0:
             bid = self.bids[0]
             bid_order_id = FIFOOrderId.from_int(bid.order_id)
-            for order in market.bids:
-                if order[1].trader_index != trader_index:
-                    continue
-                if order[0].order_sequence_number == bid_order_id.order_sequence_number:
-                    found_bid = True
-                    break
+            order = market.get_order(bid_order_id.order_sequence_number)
+            found_bid = order is not None and order[1].trader_index == trader_index
             if not found_bid:
                 self.bids = []
         else:
@@ -425,12 +421,8 @@ class Bot:
         if len(self.asks) > 0:
             ask = self.asks[0]
             ask_order_id = FIFOOrderId.from_int(ask.order_id)
-            for order in market.asks:
-                if order[1].trader_index != trader_index:
-                    continue
-                if order[0].order_sequence_number == ask_order_id.order_sequence_number:
-                    found_ask = True
-                    break
+            order = market.get_order(ask_order_id.order_sequence_number)
+            found_ask = order is not None and order[1].trader_index == trader_index
             if not found_ask:
                 self.asks = []
         else:
@@ -449,7 +441,11 @@ class Bot:
     async def market_subscribe(self):
         if not self.is_running:
             raise Exception("Bot not initialized")
-        await self.phoenix_client.market_subscribe(self.market, self.handle_market)
+        # Snapshots that are not newer than the last one seen are dropped before
+        # decoding; handle_market still checks against order responses
+        await self.phoenix_client.market_subscribe(
+            self.market, self.handle_market, lazy=True, skip_stale=True
+        )
 
     """
     If you press the down arrow in the terminal, it will shift the fair price down by 1 tick    
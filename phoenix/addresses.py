@@ -0,0 +1,49 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable
+
+from solders.pubkey import Pubkey
+from spl.token.instructions import get_associated_token_address
+
+from .program_id import PROGRAM_ID
+
+if TYPE_CHECKING:
+    from .market_metadata import MarketMetadata
+
+# Maximum number of derived addresses kept per cache
+ADDRESS_CACHE_SIZE = 4096
+
+LOG_AUTHORITY = Pubkey.find_program_address([b"log"], PROGRAM_ID)[0]
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def get_seat_address(market: Pubkey, trader: Pubkey) -> Pubkey:
+    """
+    Returns the seat PDA of a trader on a market. Derivations are cached.
+    """
+    return Pubkey.find_program_address(
+        [b"seat", bytes(market), bytes(trader)], PROGRAM_ID
+    )[0]
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def get_token_account_address(owner: Pubkey, mint: Pubkey) -> Pubkey:
+    """
+    Returns the associated token account of an owner for a mint. Derivations
+    are cached.
+    """
+    return get_associated_token_address(owner, mint)
+
+
+def prewarm_addresses(
+    traders: Iterable[Pubkey], markets: Iterable["MarketMetadata"]
+) -> None:
+    """
+    Derives the seat and base and quote token accounts of every trader on
+    every market ahead of building instructions for them.
+    """
+    markets = list(markets)
+    for trader in traders:
+        for market in markets:
+            get_seat_address(market.address, trader)
+            get_token_account_address(trader, market.base_mint)
+            get_token_account_address(trader, market.quote_mint)
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import aclosing
+from dataclasses import asdict, dataclass
+from typing import Any, AsyncIterator, Deque, List, Optional, Tuple
+
+import httpx
+from jsonrpcclient import request
+from solders.pubkey import Pubkey
+from solders.transaction_status import EncodedConfirmedTransactionWithStatusMeta
+
+from .events import (
+    EventFilter,
+    PhoenixTransaction,
+    get_phoenix_events_from_confirmed_transaction_with_meta,
+)
+
+
+@dataclass
+class BackfillTransaction:
+    slot: int
+    signature: str
+    block_time: Optional[int]
+    transaction: PhoenixTransaction
+
+
+@dataclass
+class BackfillCheckpoint:
+    """
+    Newest transaction handed out by a backfill. A backfill that resumes from
+    a checkpoint only returns transactions newer than it.
+    """
+
+    signature: str
+    slot: int
+
+    @classmethod
+    def load(cls, path: str) -> Optional["BackfillCheckpoint"]:
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return cls(**json.load(f))
+
+    def save(self, path: str):
+        # Write then rename so that an interrupted save keeps the previous one
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(asdict(self), f)
+        os.replace(tmp_path, path)
+
+
+class RpcError(Exception):
+    pass
+
+
+def get_result(response: str) -> Any:
+    response = json.loads(response)
+    if "error" in response:
+        raise RpcError(response["error"])
+    return response["result"]
+
+
+def decode_transaction_response(
+    response: str, event_filter: Optional[EventFilter] = None
+) -> Optional[Tuple[int, Optional[int], PhoenixTransaction]]:
+    """
+    Decodes a raw getTransaction response into its slot, block time and Phoenix
+    events. Returns None if the transaction was not found. Runs in the worker
+    processes of a backfill, so it only takes and returns picklable values.
+    """
+    result = get_result(response)
+    if result is None:
+        return None
+    transaction = EncodedConfirmedTransactionWithStatusMeta.from_json(
+        json.dumps(result)
+    )
+    return (
+        transaction.slot,
+        transaction.block_time,
+        get_phoenix_events_from_confirmed_transaction_with_meta(
+            transaction, event_filter
+        ),
+    )
+
+
+class Backfill:
+    """
+    Reconstructs the Phoenix events of the transaction history of a market.
+
+    Signatures are paged from getSignaturesForAddress, newest first, down to
+    `until` (or the checkpoint). Transactions are then fetched oldest first
+    with at most `max_concurrency` requests in flight and decoded in a process
+    pool, and are returned in slot order. With a `checkpoint_path`, a
+    checkpoint is saved every `checkpoint_interval` transactions once the
+    caller has handled them, and the next run resumes after it. Transactions
+    handed out after the last checkpoint of an interrupted run are returned
+    again by the next one.
+
+    Transactions that failed on chain are skipped.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        market_pubkey: Pubkey,
+        commitment: str = "confirmed",
+        checkpoint_path: Optional[str] = None,
+        checkpoint_interval: int = 256,
+        max_concurrency: int = 16,
+        page_limit: int = 1000,
+        max_retries: int = 5,
+        event_filter: Optional[EventFilter] = None,
+        executor: Optional[Executor] = None,
+    ):
+        self.endpoint = endpoint
+        self.market_pubkey = market_pubkey
+        self.commitment = commitment
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.max_concurrency = max_concurrency
+        self.page_limit = page_limit
+        self.max_retries = max_retries
+        self.event_filter = (
+            event_filter
+            if event_filter is not None
+            else EventFilter(markets=[market_pubkey])
+        )
+        self.executor = executor
+
+    async def run(
+        self,
+        before: Optional[str] = None,
+        until: Optional[str] = None,
+        min_slot: int = 0,
+    ) -> AsyncIterator[BackfillTransaction]:
+        """
+        Yields the transactions between the `until` and `before` signatures
+        (both exclusive, and unbounded when None) that landed at or after
+        `min_slot`, oldest first.
+        """
+        if self.checkpoint_path is not None:
+            checkpoint = BackfillCheckpoint.load(self.checkpoint_path)
+            if checkpoint is not None:
+                until = checkpoint.signature
+
+        executor = self.executor
+        if executor is None:
+            executor = ProcessPoolExecutor()
+        try:
+            async with httpx.AsyncClient(timeout=30) as http:
+                signatures = await self.get_signatures(http, before, until, min_slot)
+                num_handled = 0
+                async with aclosing(
+                    self.get_transactions(http, signatures, executor)
+                ) as transactions:
+                    async for transaction in transactions:
+                        yield transaction
+
+                        # The caller has handled the transaction once it asks
+                        # for the next one
+                        num_handled += 1
+                        if self.checkpoint_path is not None and (
+                            num_handled % self.checkpoint_interval == 0
+                            or num_handled == len(signatures)
+                        ):
+                            BackfillCheckpoint(
+                                transaction.signature, transaction.slot
+                            ).save(self.checkpoint_path)
+        finally:
+            if self.executor is None:
+                executor.shutdown(cancel_futures=True)
+
+    async def get_transactions(
+        self, http: httpx.AsyncClient, signatures: List[dict], executor: Executor
+    ) -> AsyncIterator[BackfillTransaction]:
+        """
+        Fetches and decodes the transactions of `signatures`, returning them in
+        the same order. Fetches are started ahead of the transaction being
+        returned, up to a bounded window.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        window = max(self.max_concurrency * 4, self.checkpoint_interval)
+        pending: Deque[Tuple[str, asyncio.Future]] = deque()
+        index = 0
+        try:
+            while index < len(signatures) or pending:
+                while index < len(signatures) and len(pending) < window:
+                    signature = signatures[index]["signature"]
+                    future = asyncio.ensure_future(
+                        self.get_transaction(http, signature, semaphore, executor)
+                    )
+                    pending.append((signature, future))
+                    index += 1
+
+                signature, future = pending.popleft()
+                slot, block_time, transaction = await future
+                yield BackfillTransaction(slot, signature, block_time, transaction)
+        finally:
+            # Also reached when the caller stops iterating early
+            for _, future in pending:
+                future.cancel()
+            await asyncio.gather(
+                *(future for _, future in pending), return_exceptions=True
+            )
+
+    async def get_signatures(
+        self,
+        http: httpx.AsyncClient,
+        before: Optional[str],
+        until: Optional[str],
+        min_slot: int = 0,
+    ) -> List[dict]:
+        """
+        Pages getSignaturesForAddress for the market and returns the
+        signatures of the successful transactions, oldest first.
+        """
+        signatures = []
+        while True:
+            config = {"limit": self.page_limit, "commitment": self.commitment}
+            if before is not None:
+                config["before"] = before
+            if until is not None:
+                config["until"] = until
+            page = get_result(
+                await self.post(
+                    http, "getSignaturesForAddress", [str(self.market_pubkey), config]
+                )
+            )
+            signatures.extend(info for info in page if info["slot"] >= min_slot)
+            if len(page) < self.page_limit or page[-1]["slot"] < min_slot:
+                break
+            before = page[-1]["signature"]
+        signatures.reverse()
+        return [info for info in signatures if info["err"] is None]
+
+    async def get_transaction(
+        self,
+        http: httpx.AsyncClient,
+        signature: str,
+        semaphore: asyncio.Semaphore,
+        executor: Executor,
+    ) -> Tuple[int, Optional[int], PhoenixTransaction]:
+        loop = asyncio.get_running_loop()
+        params = [
+            signature,
+            {
+                "encoding": "json",
+                "commitment": self.commitment,
+                "maxSupportedTransactionVersion": 0,
+            },
+        ]
+        for attempt in range(self.max_retries):
+            async with semaphore:
+                response = await self.post(http, "getTransaction", params)
+            decoded = await loop.run_in_executor(
+                executor, decode_transaction_response, response, self.event_filter
+            )
+            if decoded is not None:
+                return decoded
+            # Recent transactions may not be available from every node yet
+            await asyncio.sleep(0.5 * 2**attempt)
+        raise RpcError(f"Transaction not found: {signature}")
+
+    async def post(self, http: httpx.AsyncClient, method: str, params: Any) -> str:
+        """
+        Sends a JSON-RPC request and returns the raw response body, retrying
+        rate limited and failed requests with exponential backoff.
+        """
+        for attempt in range(self.max_retries):
+            try:
+                response = await http.post(self.endpoint, json=request(method, params))
+            except httpx.TransportError:
+                if attempt == self.max_retries - 1:
+                    raise
+            else:
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.text
+            await asyncio.sleep(0.5 * 2**attempt)
+        raise RpcError(f"{method} failed after {self.max_retries} attempts")
@@ -1,9 +1,19 @@
 import asyncio
 import traceback
 from dataclasses import dataclass
+from functools import partial
 import base58
 import json
-from typing import Any, Callable, Dict, Iterator, Tuple, TypedDict, Union, List
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    Optional,
+    Tuple,
+    Union,
+    List,
+)
 from uuid import uuid4
 import time
 import traceback
@@ -30,7 +40,14 @@ from phoenix.instructions.cancel_multiple_orders_by_id_with_free_funds import (
     CancelMultipleOrdersByIdWithFreeFundsAccounts,
     CancelMultipleOrdersByIdWithFreeFundsArgs,
 )
+from phoenix.addresses import (
+    LOG_AUTHORITY,
+    get_token_account_address,
+    prewarm_addresses,
+)
+from phoenix.incremental_market import IncrementalMarketDecoder
 from phoenix.market_metadata import MarketMetadata
+from phoenix.order_book import OrderBook
 from phoenix.order_subscribe_response import (
     CancelledOrder,
     FilledOrder,
@@ -39,11 +56,19 @@ from phoenix.order_subscribe_response import (
     OrderSubscribeResponse,
 )
 from phoenix.program_id import PROGRAM_ID
+from phoenix.sequencer import MarketSequencer
 from phoenix.types import self_trade_behavior
 from phoenix.types.cancel_multiple_orders_by_id_params import (
     CancelMultipleOrdersByIdParams,
 )
 from phoenix.types.cancel_order_params import CancelOrderParams
+from phoenix.types.cancel_up_to_params import CancelUpToParams
+from phoenix.types.condensed_order import CondensedOrder
+from phoenix.types.failed_multiple_limit_order_behavior import (
+    FailedMultipleLimitOrderBehaviorKind,
+    FailOnInsufficientFundsAndAmendOnCross,
+)
+from phoenix.types.multiple_order_packet import MultipleOrderPacket
 from phoenix.types.order_packet import (
     ImmediateOrCancel,
     ImmediateOrCancelValue,
@@ -53,12 +78,12 @@ from phoenix.types.order_packet import (
     PostOnly,
     PostOnlyValue,
 )
-from spl.token.instructions import get_associated_token_address
 from phoenix.types.side import Ask, Bid, SideKind, from_order_sequence_number
 from phoenix.events import (
+    EventFilter,
     PhoenixTransaction,
     get_phoenix_events_from_confirmed_transaction_with_meta,
-    get_phoenix_events_from_log_data,
+    get_phoenix_events_from_log_data_array,
 )
 from solana.rpc.commitment import Commitment
 from solana.rpc.async_api import AsyncClient
@@ -73,7 +98,14 @@ from phoenix.types.fifo_order_id import FIFOOrderId
 from phoenix.types.withdraw_params import WithdrawParams
 from jsonrpcclient import request
 
-from .market import DEFAULT_L2_LADDER_DEPTH, ActiveOrder, Ladder, Market
+from .market import (
+    DEFAULT_L2_LADDER_DEPTH,
+    ActiveOrder,
+    Ladder,
+    LazyMarket,
+    Market,
+    get_market_sequence_number,
+)
 
 
 class ExecutableOrder:
@@ -107,12 +139,15 @@ class PhoenixResponse:
         self,
         signature: Signature,
         sequence_number: int | None,
-        client_orders_map: Dict[int, PhoenixOrder],
+        client_orders_map: Dict[int, Optional[PhoenixOrder]],
         cancelled_orders: List[PhoenixOrder] = None,
         fills: List[FilledOrder] = None,
+        placed_orders: List[PhoenixOrder] = None,
     ):
         self.signature = signature
         self.sequence_number = sequence_number
+        # Resting order of each client order id sent, or None if the order did
+        # not rest on the book (e.g. it was fully filled)
         self.client_orders_map = client_orders_map
         if cancelled_orders is None:
             self.cancelled_orders = []
@@ -122,13 +157,17 @@ class PhoenixResponse:
             self.fills = []
         else:
             self.fills = fills
+        if placed_orders is None:
+            self.placed_orders = []
+        else:
+            self.placed_orders = placed_orders
 
     @property
     def skipped(self):
         return self.sequence_number is None
 
     def __repr__(self) -> str:
-        return f"PhoenixResponse(signature={self.signature}, sequence_number={self.sequence_number}, client_orders_map={self.client_orders_map}, cancelled_orders={self.cancelled_orders}, fills={self.fills})"
+        return f"PhoenixResponse(signature={self.signature}, sequence_number={self.sequence_number}, client_orders_map={self.client_orders_map}, cancelled_orders={self.cancelled_orders}, fills={self.fills}, placed_orders={self.placed_orders})"
 
 
 class PhoenixClient:
@@ -155,6 +194,9 @@ class PhoenixClient:
         self.encoding = encoding
 
         self.markets = {}
+        # Last sequence number decoded by the market subscriptions that share a
+        # (market, dedup key) pair, kept across reconnects
+        self.last_market_sequence_numbers: Dict[Tuple[Pubkey, str], int] = {}
 
         self.__slot = -1
         self.__subscribed_to_slot = False
@@ -163,16 +205,37 @@ class PhoenixClient:
         market_bytes = await self.client.get_account_info(
             market_pubkey, self.commitment, self.encoding
         )
-        self.markets[market_pubkey] = Market.deserialize_market_data(
+        self.markets[market_pubkey] = LazyMarket.deserialize_market_data(
             market_pubkey, market_bytes.value.data
         ).metadata
 
+    """
+    Derives the seat and token account addresses of the traders on the given
+    markets (all added markets by default), so that building their first
+    instructions does not pay for the derivations.
+    """
+
+    def prewarm_addresses(
+        self,
+        traders: List[Pubkey],
+        market_pubkeys: Optional[List[Pubkey]] = None,
+    ):
+        if market_pubkeys is None:
+            market_pubkeys = list(self.markets.keys())
+        markets = []
+        for market_pubkey in market_pubkeys:
+            market_metadata = self.markets.get(market_pubkey, None)
+            if market_metadata == None:
+                raise ValueError("Market not found: ", market_pubkey)
+            markets.append(market_metadata)
+        prewarm_addresses(traders, markets)
+
     async def get_l2_book(self, market_pubkey: Pubkey, levels=DEFAULT_L2_LADDER_DEPTH):
         market_account = await self.client.get_account_info(
             market_pubkey, self.commitment, self.encoding
         )
         slot = market_account.context.slot
-        market = Market.deserialize_market_data(
+        market = LazyMarket.deserialize_market_data(
             market_pubkey, market_account.value.data
         )
         unix_timestamp = (await self.client.get_block_time(slot)).value
@@ -213,7 +276,7 @@ class PhoenixClient:
             market_account = await self.client.get_account_info(
                 market_pubkey, self.commitment, self.encoding
             )
-            market = Market.deserialize_market_data(
+            market = LazyMarket.deserialize_market_data(
                 market_pubkey, market_account.value.data
             )
         active_orders = market.get_active_orders(trader=trader_pubkey)
@@ -272,7 +335,10 @@ class PhoenixClient:
                             continue
                         phoenix_transaction = (
                             get_phoenix_events_from_confirmed_transaction_with_meta(
-                                transaction
+                                transaction,
+                                EventFilter(
+                                    markets=[market_pubkey], traders=[trader_pubkey]
+                                ),
                             )
                         )
                         response = self.__get_response_from_phoenix_transaction(
@@ -385,6 +451,18 @@ class PhoenixClient:
     def __process_transaction_event(
         self, response, market_pubkey: Pubkey, trader_pubkey: Pubkey
     ) -> [OrderSubscribeResponse]:
+        # Instructions on other markets and events of other traders are
+        # skipped before they are decoded
+        event_filter = EventFilter(markets=[market_pubkey], traders=[trader_pubkey])
+        return self.__get_response_from_phoenix_transaction(
+            self.__parse_transaction_event(response, event_filter),
+            market_pubkey=market_pubkey,
+            trader_pubkey=trader_pubkey,
+        )
+
+    def __parse_transaction_event(
+        self, response, event_filter: Optional[EventFilter] = None
+    ) -> PhoenixTransaction:
         payload = response["params"]["result"]["value"]
         meta = payload["meta"]
         loaded_addresses = meta.get("loadedAddresses", {"readonly": [], "writable": []})
@@ -411,19 +489,16 @@ class PhoenixClient:
                     continue
                 data = base58.b58decode(ix["data"])
                 if data[0] == 15:
-                    data_array.append(data[1:])
+                    data_array.append(memoryview(data)[1:])
 
-        instructions = [get_phoenix_events_from_log_data(data) for data in data_array]
+        instructions = get_phoenix_events_from_log_data_array(data_array, event_filter)
 
-        phoenix_tx = PhoenixTransaction(
+        return PhoenixTransaction(
             instructions,
             signature=Signature.from_bytes(payload["transaction"]["signatures"][1]),
             txReceived=True,
             txFailed=False,
         )
-        return self.__get_response_from_phoenix_transaction(
-            phoenix_tx, market_pubkey=market_pubkey, trader_pubkey=trader_pubkey
-        )
 
     def __get_response_from_phoenix_transaction(
         self, phoenix_tx, market_pubkey, trader_pubkey
@@ -606,12 +681,35 @@ class PhoenixClient:
                                 break
         return response
 
+    """
+    Subscribes to market account updates and calls handle_market with each decoded snapshot
+
+    Params:
+
+    market_pubkey: Pubkey of the market to subscribe to
+    handle_market: Callback receiving the decoded Market
+    lazy: If True, handle_market receives a LazyMarket whose bids, asks and traders are only decoded when first accessed.
+          Otherwise each snapshot is fully decoded, re-parsing only the nodes that changed since the previous one (optional, defaults to False)
+    skip_stale: If True, snapshots whose sequence number is not greater than that of the last snapshot
+                decoded by this subscription are dropped before being decoded (optional, defaults to False)
+    dedup_key: If set with skip_stale, the last sequence number is kept in last_market_sequence_numbers
+               under (market_pubkey, dedup_key) instead, so it survives reconnects and is shared by the
+               subscriptions to the market that pass the same key (optional)
+    """
+
     async def market_subscribe(
-        self, market_pubkey: Pubkey, handle_market: Callable[[Market], Any]
+        self,
+        market_pubkey: Pubkey,
+        handle_market: Callable[[Market], Any],
+        lazy: bool = False,
+        skip_stale: bool = False,
+        dedup_key: Optional[str] = None,
     ):
         await asyncio.gather(
             self.__slot_subscribe(),
-            self.__market_subscribe(market_pubkey, handle_market),
+            self.__market_subscribe(
+                market_pubkey, handle_market, lazy, skip_stale, dedup_key
+            ),
         )
 
     async def l2_orderbook_subscribe(
@@ -626,22 +724,129 @@ class PhoenixClient:
             )
             await handle_l2_orderbook(ladder)
 
-        await self.market_subscribe(market_pubkey, handle_market)
+        # The ladder only needs the bids and asks of each snapshot
+        await self.market_subscribe(market_pubkey, handle_market, lazy=True)
+
+    """
+    Keeps an OrderBook of the given market up to date from the events of its transactions
+    and calls handle_book with the book after each update. Event batches are applied in
+    sequence number order: out of order batches are buffered, and a gap that is not filled
+    within max_pending batches or max_gap_slots slots is recovered from a fresh market
+    snapshot without reconnecting. The first snapshot is fetched once the first batch
+    arrives.
+
+    Params:
+
+    market_pubkey: Pubkey of the market to subscribe to
+    handle_book: Callback receiving the OrderBook, which is updated in place
+    commitment: Commitment of the transaction subscription and snapshots (optional)
+    max_pending: Number of buffered batches after which a gap triggers a resync (optional)
+    max_gap_slots: Number of slots a gap may stay open before it triggers a resync (optional)
+    """
+
+    async def book_subscribe(
+        self,
+        market_pubkey: Pubkey,
+        handle_book: Callable[[OrderBook], Any],
+        commitment: Commitment | None = None,
+        max_pending: int = 32,
+        max_gap_slots: int = 150,
+    ):
+        commitment = commitment if commitment != None else self.commitment
+
+        async def fetch_snapshot() -> Market:
+            market_account = await self.client.get_account_info(
+                market_pubkey, commitment, self.encoding
+            )
+            return LazyMarket.deserialize_market_data(
+                market_pubkey, market_account.value.data
+            )
+
+        sequencer = MarketSequencer(
+            market_pubkey, fetch_snapshot, max_pending, max_gap_slots
+        )
+        # Only the market filter applies: every instruction advances the
+        # market's sequence number, even if it logged no events of interest
+        event_filter = EventFilter(markets=[market_pubkey])
+        while True:
+            async with websockets.connect(self.ws_endpoint + "/whirligig") as websocket:
+                transaction_subscribe = request(
+                    "transactionSubscribe",
+                    params=[
+                        {
+                            "mentions": [str(market_pubkey)],
+                            "failed": False,
+                            "vote": False,
+                        },
+                        {
+                            "commitment": str(commitment),
+                        },
+                    ],
+                )
+                await websocket.send(json.dumps(transaction_subscribe))
+                # Ignore the first message
+                await websocket.recv()
+                while True:
+                    try:
+                        phoenix_tx = self.__parse_transaction_event(
+                            json.loads(await websocket.recv()), event_filter
+                        )
+                        applied = 0
+                        for events in phoenix_tx.events_from_instructions:
+                            applied += await sequencer.push(events)
+                        if applied > 0:
+                            await handle_book(sequencer.book)
+                    except websockets.exceptions.ConnectionClosed:
+                        print("Connection closed unexpectedly. Reconnecting...")
+                        break
+                    except Exception as e:
+                        print(
+                            f"WARNING: Failed to process transaction in book subscribe: {e}"
+                        )
+                        print(traceback.format_exc())
 
     async def __market_subscribe(
-        self, market_pubkey: Pubkey, handle_market: Callable[[Market], Any]
+        self,
+        market_pubkey: Pubkey,
+        handle_market: Callable[[Market], Any],
+        lazy: bool = False,
+        skip_stale: bool = False,
+        dedup_key: Optional[str] = None,
     ):
+        dedup = (market_pubkey, dedup_key)
+        # Eagerly decoded snapshots only re-parse the tree nodes that changed
+        decode = (
+            partial(LazyMarket.deserialize_market_data, market_pubkey)
+            if lazy
+            else IncrementalMarketDecoder(market_pubkey).decode
+        )
         async with connect(self.ws_endpoint) as websocket:
             await websocket.account_subscribe(
                 market_pubkey, self.commitment, self.encoding
             )
             first_resp = await websocket.recv()
             subscription_id = first_resp[0].result
+            last_sequence_number = -1
             async for _, msg in enumerate(websocket):
                 try:
-                    market = Market.deserialize_market_data(
-                        market_pubkey, msg[0].result.value.data
-                    )
+                    data = msg[0].result.value.data
+                    if skip_stale:
+                        # Duplicates from redundant subscriptions or commitment
+                        # levels carry a sequence number that was already seen
+                        sequence_number = get_market_sequence_number(data)
+                        if dedup_key is not None:
+                            last_sequence_number = (
+                                self.last_market_sequence_numbers.get(dedup, -1)
+                            )
+                        if sequence_number <= last_sequence_number:
+                            continue
+                    market = decode(data)
+                    if skip_stale:
+                        # Only snapshots that decoded are recorded, so a snapshot
+                        # that failed to decode is not dropped when it arrives again
+                        last_sequence_number = sequence_number
+                        if dedup_key is not None:
+                            self.last_market_sequence_numbers[dedup] = sequence_number
                     await handle_market(market)
                 except Exception as e:
                     print(f"WARNING: Failed to parse message in market subscribe: {e}")
@@ -849,6 +1054,20 @@ class PhoenixClient:
             raise ValueError("Market not found for order: ", ioc_order_packet)
         return market_metadata.create_swap_instruction(ioc_order_packet, trader_pubkey)
 
+    def create_place_multiple_post_only_orders_instruction(
+        self,
+        multiple_order_packet: MultipleOrderPacket,
+        market_pubkey: Pubkey,
+        trader_pubkey: Pubkey,
+        use_only_deposited_funds: bool = False,
+    ) -> Instruction:
+        market_metadata: MarketMetadata = self.markets.get(market_pubkey, None)
+        if market_metadata == None:
+            raise ValueError("Market not found: ", market_pubkey)
+        return market_metadata.create_place_multiple_post_only_orders_instruction(
+            multiple_order_packet, trader_pubkey, use_only_deposited_funds
+        )
+
     async def send_orders(
         self,
         signer: Keypair,
@@ -869,7 +1088,7 @@ class PhoenixClient:
             for instruction in pre_instructions:
                 transaction.add(instruction)
 
-        client_orders_map: TypedDict[int, FIFOOrderId] = {}
+        client_orders_map: Dict[int, Optional[PhoenixOrder]] = {}
         for executable_order in order_packets:
             order_packet = executable_order.order_packet
             market_pubkey = executable_order.market_pubkey
@@ -892,6 +1111,26 @@ class PhoenixClient:
             for instruction in post_instructions:
                 transaction.add(instruction)
 
+        return await self.__send_order_transaction(
+            signer,
+            transaction,
+            client_orders_map,
+            skip_response=skip_response,
+            commitment=commitment,
+            tx_opts=tx_opts,
+            recent_blockhash=recent_blockhash,
+        )
+
+    async def __send_order_transaction(
+        self,
+        signer: Keypair,
+        transaction: Transaction,
+        client_orders_map: Dict[int, Optional[PhoenixOrder]],
+        skip_response: bool = False,
+        commitment=None,
+        tx_opts: TxOpts | None = None,
+        recent_blockhash: Hash | None = None,
+    ) -> PhoenixResponse | None:
         # Send transaction
         try:
             response = await self.client.send_transaction(
@@ -928,13 +1167,14 @@ class PhoenixClient:
 
         cancelled_orders = []
         fills = []
+        placed_orders = []
         sequence_number = -1
         for ix_events in phoenix_transaction.events_from_instructions:
             header = ix_events.header
             sequence_number = header.sequence_number
             current_market = header.market
             if current_market not in self.markets:
-                await self.add_market(market_pubkey)
+                await self.add_market(current_market)
             meta = self.markets[current_market]
             for phoenix_event in ix_events.events:
                 if phoenix_event.kind == "Fill":
@@ -952,7 +1192,7 @@ class PhoenixClient:
                     )
                     filled_order = FilledOrder(
                         order_id=fifo_order_id.to_int(),
-                        market_pubkey=market_pubkey,
+                        market_pubkey=current_market,
                         slot=header.slot,
                         unix_timestamp_in_seconds=header.timestamp,
                         sequence_number=header.sequence_number,
@@ -969,15 +1209,17 @@ class PhoenixClient:
                     )
                     fills.append(filled_order)
                 elif phoenix_event.kind == "Place":
-                    client_orders_map[
-                        phoenix_event.value[0].client_order_id
-                    ] = PhoenixOrder(
+                    placed_order = PhoenixOrder(
                         FIFOOrderId(
                             phoenix_event.value[0].price_in_ticks,
                             phoenix_event.value[0].order_sequence_number,
                         ),
                         phoenix_event.value[0].base_lots_placed,
                     )
+                    client_orders_map[
+                        phoenix_event.value[0].client_order_id
+                    ] = placed_order
+                    placed_orders.append(placed_order)
                 elif phoenix_event.kind == "Reduce":
                     cancelled_orders.append(
                         PhoenixOrder(
@@ -1017,6 +1259,94 @@ class PhoenixClient:
             client_orders_map=client_orders_map,
             cancelled_orders=cancelled_orders,
             fills=fills,
+            placed_orders=placed_orders,
+        )
+
+    """
+    Places post-only orders at every level of a bid and ask ladder on one
+    market with a single PlaceMultiplePostOnlyOrders instruction. Placed
+    orders are returned in the placed_orders of the response, bids first.
+
+    Params:
+
+    bids: List of (price_in_quote_units, size_in_base_units) levels to bid at
+    asks: List of (price_in_quote_units, size_in_base_units) levels to offer at
+    client_order_id: Client order id shared by every order of the ladder (optional)
+    failed_multiple_limit_order_behavior: What to do when an order would cross or the trader lacks funds
+                                          (optional, defaults to FailOnInsufficientFundsAndAmendOnCross)
+    use_only_deposited_funds: Only use funds deposited on the market, without token transfers
+    last_valid_slot, last_valid_unix_timestamp: Expiry applied to every order (optional)
+    """
+
+    async def send_quote_ladder(
+        self,
+        signer: Keypair,
+        market_pubkey: Pubkey,
+        bids: List[Tuple[float, float]],
+        asks: List[Tuple[float, float]],
+        client_order_id: int | None = None,
+        failed_multiple_limit_order_behavior: FailedMultipleLimitOrderBehaviorKind | None = None,
+        use_only_deposited_funds: bool = False,
+        last_valid_slot: int = None,
+        last_valid_unix_timestamp: int = None,
+        pre_instructions: [Instruction] = None,
+        post_instructions: [Instruction] = None,
+        skip_response: bool = False,
+        commitment=None,
+        tx_opts: TxOpts | None = None,
+        recent_blockhash: Hash | None = None,
+    ) -> PhoenixResponse | None:
+        market_metadata: MarketMetadata = self.markets.get(market_pubkey, None)
+        if market_metadata == None:
+            raise ValueError("Market address not found: ", market_pubkey)
+        if failed_multiple_limit_order_behavior is None:
+            failed_multiple_limit_order_behavior = (
+                FailOnInsufficientFundsAndAmendOnCross()
+            )
+
+        def condensed_orders(levels: List[Tuple[float, float]]):
+            return [
+                CondensedOrder(
+                    price_in_ticks=market_metadata.float_price_to_ticks_rounded_down(
+                        price_in_quote_units
+                    ),
+                    size_in_base_lots=market_metadata.raw_base_units_to_base_lots_rounded_down(
+                        size_in_base_units
+                    ),
+                    last_valid_slot=last_valid_slot,
+                    last_valid_unix_timestamp_in_seconds=last_valid_unix_timestamp,
+                )
+                for price_in_quote_units, size_in_base_units in levels
+            ]
+
+        multiple_order_packet = MultipleOrderPacket(
+            bids=condensed_orders(bids),
+            asks=condensed_orders(asks),
+            client_order_id=client_order_id,
+            failed_multiple_limit_order_behavior=failed_multiple_limit_order_behavior,
+        )
+
+        transaction = Transaction()
+        if pre_instructions is not None:
+            for instruction in pre_instructions:
+                transaction.add(instruction)
+        transaction.add(
+            market_metadata.create_place_multiple_post_only_orders_instruction(
+                multiple_order_packet, signer.pubkey(), use_only_deposited_funds
+            )
+        )
+        if post_instructions is not None:
+            for instruction in post_instructions:
+                transaction.add(instruction)
+
+        return await self.__send_order_transaction(
+            signer,
+            transaction,
+            {} if client_order_id is None else {client_order_id: None},
+            skip_response=skip_response,
+            commitment=commitment,
+            tx_opts=tx_opts,
+            recent_blockhash=recent_blockhash,
         )
 
     def create_cancel_order_instruction(
@@ -1026,7 +1356,6 @@ class PhoenixClient:
         order_ids: Union[List[Union[FIFOOrderId, int]], None] = None,
         withdraw_funds=True,
     ) -> Instruction:
-        log_account = Pubkey.find_program_address([b"log"], PROGRAM_ID)[0]
         market_metadata = self.markets.get(market_pubkey, None)
         if market_metadata == None:
             raise ValueError("Market not found: ", market_pubkey)
@@ -1034,13 +1363,13 @@ class PhoenixClient:
             if withdraw_funds:
                 accounts = CancelAllOrdersAccounts(
                     phoenix_program=PROGRAM_ID,
-                    log_authority=log_account,
+                    log_authority=LOG_AUTHORITY,
                     market=market_pubkey,
                     trader=trader,
-                    base_account=get_associated_token_address(
+                    base_account=get_token_account_address(
                         trader, market_metadata.base_mint
                     ),
-                    quote_account=get_associated_token_address(
+                    quote_account=get_token_account_address(
                         trader, market_metadata.quote_mint
                     ),
                     base_vault=market_metadata.base_vault,
@@ -1050,7 +1379,7 @@ class PhoenixClient:
             else:
                 accounts = CancelAllOrdersWithFreeFundsAccounts(
                     phoenix_program=PROGRAM_ID,
-                    log_authority=log_account,
+                    log_authority=LOG_AUTHORITY,
                     market=market_pubkey,
                     trader=trader,
                 )
@@ -1071,13 +1400,13 @@ class PhoenixClient:
             if withdraw_funds:
                 accounts = CancelMultipleOrdersByIdAccounts(
                     phoenix_program=PROGRAM_ID,
-                    log_authority=log_account,
+                    log_authority=LOG_AUTHORITY,
                     market=market_pubkey,
                     trader=trader,
-                    base_account=get_associated_token_address(
+                    base_account=get_token_account_address(
                         trader, market_metadata.base_mint
                     ),
-                    quote_account=get_associated_token_address(
+                    quote_account=get_token_account_address(
                         trader, market_metadata.quote_mint
                     ),
                     base_vault=market_metadata.base_vault,
@@ -1091,7 +1420,7 @@ class PhoenixClient:
             else:
                 accounts = CancelMultipleOrdersByIdWithFreeFundsAccounts(
                     phoenix_program=PROGRAM_ID,
-                    log_authority=log_account,
+                    log_authority=LOG_AUTHORITY,
                     market=market_pubkey,
                     trader=trader,
                 )
@@ -1132,19 +1461,108 @@ class PhoenixClient:
         tx_opts: TxOpts | None = None,
         recent_blockhash: Hash | None = None,
     ) -> Tuple[Signature, List[int]]:
-        market_metadata = self.markets.get(market_pubkey, None)
+        return await self.__send_cancel_transaction(
+            signer,
+            market_pubkey,
+            self.create_cancel_order_instruction(
+                signer.pubkey(),
+                market_pubkey,
+                order_ids,
+                withdraw_funds=withdraw_cancelled_funds,
+            ),
+            withdraw_free_funds=withdraw_free_funds,
+            commitment=commitment,
+            tx_opts=tx_opts,
+            recent_blockhash=recent_blockhash,
+        )
+
+    def create_cancel_up_to_instruction(
+        self,
+        trader: Pubkey,
+        market_pubkey: Pubkey,
+        side: SideKind,
+        tick_limit: int | None = None,
+        num_orders_to_cancel: int | None = None,
+        num_orders_to_search: int | None = None,
+        withdraw_funds=True,
+    ) -> Instruction:
+        market_metadata: MarketMetadata = self.markets.get(market_pubkey, None)
         if market_metadata == None:
             raise ValueError("Market not found: ", market_pubkey)
+        return market_metadata.create_cancel_up_to_instruction(
+            CancelUpToParams(
+                side=side,
+                tick_limit=tick_limit,
+                num_orders_to_search=num_orders_to_search,
+                num_orders_to_cancel=num_orders_to_cancel,
+            ),
+            trader,
+            withdraw_funds=withdraw_funds,
+        )
 
-        transaction = Transaction()
-        transaction.add(
-            self.create_cancel_order_instruction(
+    """
+    Cancels the trader's orders on one side of a market, starting from the
+    best price, with a single CancelUpTo instruction. No order ids or market
+    fetch are needed.
+
+    Params:
+
+    side: SideKind (Bid or Ask) of the orders to cancel
+    tick_limit: Only cancel bids priced at or above, or asks priced at or below, this price in ticks (optional)
+    num_orders_to_cancel: Maximum number of orders to cancel (optional)
+    num_orders_to_search: Maximum number of orders on the side to search through (optional)
+    withdraw_cancelled_funds: Withdraw the funds of the cancelled orders. If False, they stay deposited on the market
+    withdraw_free_funds: Also withdraw all other deposited funds
+    """
+
+    async def cancel_up_to(
+        self,
+        signer: Keypair,
+        market_pubkey: Pubkey,
+        side: SideKind,
+        tick_limit: int | None = None,
+        num_orders_to_cancel: int | None = None,
+        num_orders_to_search: int | None = None,
+        withdraw_cancelled_funds=True,
+        withdraw_free_funds=False,
+        commitment=None,
+        tx_opts: TxOpts | None = None,
+        recent_blockhash: Hash | None = None,
+    ) -> Tuple[Signature, List[int]]:
+        return await self.__send_cancel_transaction(
+            signer,
+            market_pubkey,
+            self.create_cancel_up_to_instruction(
                 signer.pubkey(),
                 market_pubkey,
-                order_ids,
+                side,
+                tick_limit=tick_limit,
+                num_orders_to_cancel=num_orders_to_cancel,
+                num_orders_to_search=num_orders_to_search,
                 withdraw_funds=withdraw_cancelled_funds,
-            )
+            ),
+            withdraw_free_funds=withdraw_free_funds,
+            commitment=commitment,
+            tx_opts=tx_opts,
+            recent_blockhash=recent_blockhash,
         )
+
+    async def __send_cancel_transaction(
+        self,
+        signer: Keypair,
+        market_pubkey: Pubkey,
+        cancel_instruction: Instruction,
+        withdraw_free_funds=False,
+        commitment=None,
+        tx_opts: TxOpts | None = None,
+        recent_blockhash: Hash | None = None,
+    ) -> Tuple[Signature, List[int]]:
+        market_metadata = self.markets.get(market_pubkey, None)
+        if market_metadata == None:
+            raise ValueError("Market not found: ", market_pubkey)
+
+        transaction = Transaction()
+        transaction.add(cancel_instruction)
         if withdraw_free_funds:
             args = WithdrawFundsArgs(
                 withdraw_funds_params=WithdrawParams(
@@ -1154,13 +1572,13 @@ class PhoenixClient:
             )
             accounts = WithdrawFundsAccounts(
                 phoenix_program=PROGRAM_ID,
-                log_authority=Pubkey.find_program_address([b"log"], PROGRAM_ID)[0],
+                log_authority=LOG_AUTHORITY,
                 market=market_pubkey,
                 trader=signer.pubkey(),
-                base_account=get_associated_token_address(
+                base_account=get_token_account_address(
                     signer.pubkey(), market_metadata.base_mint
                 ),
-                quote_account=get_associated_token_address(
+                quote_account=get_token_account_address(
                     signer.pubkey(), market_metadata.quote_mint
                 ),
                 base_vault=market_metadata.base_vault,
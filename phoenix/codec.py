@@ -0,0 +1,341 @@
+import struct
+import typing
+from dataclasses import fields
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from construct import Array, BytesInteger, FormatField
+from solders.pubkey import Pubkey
+from anchorpy.borsh_extension import BorshPubkeyAdapter
+from borsh_construct import CStruct
+
+from .types.audit_log_header import AuditLogHeader
+from .types.evict_event import EvictEvent
+from .types.expired_order_event import ExpiredOrderEvent
+from .types.fee_event import FeeEvent
+from .types.fifo_order_id import FIFOOrderId
+from .types.fifo_resting_order import FIFORestingOrder
+from .types.fill_event import FillEvent
+from .types.fill_summary_event import FillSummaryEvent
+from .types.market_header import MarketHeader
+from .types.market_size_params import MarketSizeParams
+from .types.place_event import PlaceEvent
+from .types.reduce_event import ReduceEvent
+from .types.seat import Seat
+from .types.time_in_force_event import TimeInForceEvent
+from .types.token_params import TokenParams
+from .types.trader_state import TraderState
+
+# Reads one field from the unpacked values starting at the given index
+FieldReader = Optional[Callable[[tuple, int], Any]]
+
+
+class StructCodec:
+    """
+    Decoder for a generated type with a fixed-size borsh layout. The layout is
+    compiled into a single struct.Struct when the codec is created, and
+    decoding builds the type directly from the unpacked values instead of
+    going through construct Containers.
+    """
+
+    def __init__(self, cls: type):
+        self.cls = cls
+        hints = typing.get_type_hints(cls)
+        formats = []
+        # (number of unpacked values, reader) per field, in layout order
+        self.fields: List[Tuple[int, FieldReader]] = []
+        for field, subcon in zip(fields(cls), cls.layout.subcons):
+            fmt, width, reader = compile_field(subcon.subcon, hints[field.name])
+            formats.append(fmt)
+            self.fields.append((width, reader))
+        self.struct = struct.Struct("<" + "".join(formats))
+        self.size = self.struct.size
+        self.width = sum(width for width, _ in self.fields)
+        if self.size != cls.layout.sizeof():
+            raise ValueError(
+                f"Layout of {cls.__name__} has no fixed-size struct format"
+            )
+        self.plain = all(reader is None for _, reader in self.fields)
+
+    def from_buffer(self, buf, offset: int = 0) -> Any:
+        values = self.struct.unpack_from(buf, offset)
+        if self.plain:
+            return self.cls(*values)
+        return self.from_values(values, 0)
+
+    def from_values(self, values: tuple, index: int) -> Any:
+        args = []
+        for width, reader in self.fields:
+            args.append(values[index] if reader is None else reader(values, index))
+            index += width
+        return self.cls(*args)
+
+
+def compile_field(con, field_type) -> Tuple[str, int, FieldReader]:
+    """
+    Returns the struct format of a field, the number of values it unpacks to,
+    and the reader that converts those values (None for plain numbers).
+    """
+    if isinstance(con, FormatField):
+        return con.fmtstr[1:], 1, None
+    if isinstance(con, BorshPubkeyAdapter):
+        return "32s", 1, read_pubkey
+    if isinstance(con, BytesInteger) and con.swapped and not con.signed:
+        return f"{con.length}s", 1, read_little_endian_int
+    if isinstance(con, Array) and isinstance(con.subcon, FormatField):
+        count = con.count
+        return (
+            f"{count}{con.subcon.fmtstr[1:]}",
+            count,
+            lambda values, index: list(values[index : index + count]),
+        )
+    if isinstance(con, CStruct) and getattr(field_type, "layout", None) is con:
+        nested = StructCodec(field_type)
+        return nested.struct.format[1:], nested.width, nested.from_values
+    raise ValueError(f"Unsupported fixed-size field: {con}")
+
+
+def read_pubkey(values: tuple, index: int) -> Pubkey:
+    return Pubkey(values[index])
+
+
+def read_little_endian_int(values: tuple, index: int) -> int:
+    return int.from_bytes(values[index], "little")
+
+
+# Codecs of the generated types with a fixed-size layout, compiled at import
+CODECS: Dict[type, StructCodec] = {
+    cls: StructCodec(cls)
+    for cls in [
+        AuditLogHeader,
+        EvictEvent,
+        ExpiredOrderEvent,
+        FeeEvent,
+        FIFOOrderId,
+        FIFORestingOrder,
+        FillEvent,
+        FillSummaryEvent,
+        MarketHeader,
+        MarketSizeParams,
+        PlaceEvent,
+        ReduceEvent,
+        Seat,
+        TimeInForceEvent,
+        TokenParams,
+        TraderState,
+    ]
+}
+
+
+# Borsh fields of each OrderPacket variant, in layout order, as
+# (name, encoding). The variant is written first as a u8.
+ORDER_PACKET_FIELDS = {
+    "PostOnly": [
+        ("side", "enum"),
+        ("price_in_ticks", "u64"),
+        ("num_base_lots", "u64"),
+        ("client_order_id", "u128"),
+        ("reject_post_only", "bool"),
+        ("use_only_deposited_funds", "bool"),
+        ("last_valid_slot", "option_u64"),
+        ("last_valid_unix_timestamp_in_seconds", "option_u64"),
+        ("fail_silently_on_insufficient_funds", "bool"),
+    ],
+    "Limit": [
+        ("side", "enum"),
+        ("price_in_ticks", "u64"),
+        ("num_base_lots", "u64"),
+        ("self_trade_behavior", "enum"),
+        ("match_limit", "option_u64"),
+        ("client_order_id", "u128"),
+        ("use_only_deposited_funds", "bool"),
+        ("last_valid_slot", "option_u64"),
+        ("last_valid_unix_timestamp_in_seconds", "option_u64"),
+        ("fail_silently_on_insufficient_funds", "bool"),
+    ],
+    "ImmediateOrCancel": [
+        ("side", "enum"),
+        ("price_in_ticks", "option_u64"),
+        ("num_base_lots", "u64"),
+        ("num_quote_lots", "u64"),
+        ("min_base_lots_to_fill", "u64"),
+        ("min_quote_lots_to_fill", "u64"),
+        ("self_trade_behavior", "enum"),
+        ("match_limit", "option_u64"),
+        ("client_order_id", "u128"),
+        ("use_only_deposited_funds", "bool"),
+        ("last_valid_slot", "option_u64"),
+        ("last_valid_unix_timestamp_in_seconds", "option_u64"),
+    ],
+}
+
+# Borsh fields of CancelUpToParams, in layout order
+CANCEL_UP_TO_PARAMS_FIELDS = [
+    ("side", "enum"),
+    ("tick_limit", "option_u64"),
+    ("num_orders_to_search", "option_u32"),
+    ("num_orders_to_cancel", "option_u32"),
+]
+
+FIELD_FORMATS = {
+    "enum": "B",
+    "u32": "I",
+    "u64": "Q",
+    "u128": "QQ",
+    "bool": "?",
+}
+
+U64_MASK = (1 << 64) - 1
+
+
+def get_fields_format(fields: List[Tuple[str, str]], options: Tuple[bool, ...]) -> str:
+    """
+    Returns the struct format of borsh fields given which of their Option
+    fields are set. An Option is a u8 tag followed by the value if set.
+    """
+    formats = []
+    present = iter(options)
+    for _, encoding in fields:
+        if encoding.startswith("option_"):
+            formats.append("B")
+            if next(present):
+                formats.append(FIELD_FORMATS[encoding[len("option_") :]])
+        else:
+            formats.append(FIELD_FORMATS[encoding])
+    return "".join(formats)
+
+
+def get_field_values(
+    fields: List[Tuple[str, str]], value: dict, values: list
+) -> Tuple[bool, ...]:
+    """
+    Appends the values to pack for borsh fields read from `value`, and
+    returns which of their Option fields are set.
+    """
+    options = []
+    for name, encoding in fields:
+        field = value[name]
+        if encoding == "enum":
+            values.append(field.discriminator)
+        elif encoding == "u128":
+            if field >> 128:
+                raise ValueError(f"{name} does not fit in a u128: {field}")
+            values.append(field & U64_MASK)
+            values.append(field >> 64)
+        elif encoding in FIELD_FORMATS:
+            values.append(field)
+        elif field is None:
+            values.append(0)
+            options.append(False)
+        else:
+            values.append(1)
+            values.append(field)
+            options.append(True)
+    return tuple(options)
+
+
+@lru_cache(maxsize=None)
+def get_order_packet_struct(kind: str, options: Tuple[bool, ...]) -> struct.Struct:
+    """
+    Returns the struct of an OrderPacket variant given which of its Option
+    fields are set.
+    """
+    return struct.Struct("<B" + get_fields_format(ORDER_PACKET_FIELDS[kind], options))
+
+
+def get_order_packet_values(packet) -> Tuple[struct.Struct, list]:
+    values = [packet.discriminator]
+    options = get_field_values(ORDER_PACKET_FIELDS[packet.kind], packet.value, values)
+    return get_order_packet_struct(packet.kind, options), values
+
+
+def encode_order_packet(packet) -> bytes:
+    """
+    Encodes a PostOnly, Limit or ImmediateOrCancel order packet to the same
+    bytes as its borsh layout, without building the encodable dict.
+    """
+    packet_struct, values = get_order_packet_values(packet)
+    # Instruction data must be bytes, so packing into a reusable buffer would
+    # still copy the packet out of it, which is slower than a single pack
+    return packet_struct.pack(*values)
+
+
+def encode_order_packet_into(buf: bytearray, offset: int, packet) -> int:
+    """
+    Writes the borsh encoding of an order packet into `buf` at `offset` and
+    returns its size.
+    """
+    packet_struct, values = get_order_packet_values(packet)
+    packet_struct.pack_into(buf, offset, *values)
+    return packet_struct.size
+
+
+@lru_cache(maxsize=None)
+def get_condensed_order_struct(options: Tuple[bool, bool]) -> struct.Struct:
+    last_valid_slot, last_valid_unix_timestamp = options
+    return struct.Struct(
+        "<QQ"
+        + ("BQ" if last_valid_slot else "B")
+        + ("BQ" if last_valid_unix_timestamp else "B")
+    )
+
+
+def encode_condensed_orders(orders: list) -> bytes:
+    """
+    Encodes a borsh Vec of CondensedOrders.
+    """
+    parts = [struct.pack("<I", len(orders))]
+    for order in orders:
+        values = [order.price_in_ticks, order.size_in_base_lots]
+        for field in (
+            order.last_valid_slot,
+            order.last_valid_unix_timestamp_in_seconds,
+        ):
+            if field is None:
+                values.append(0)
+            else:
+                values.append(1)
+                values.append(field)
+        options = (
+            order.last_valid_slot is not None,
+            order.last_valid_unix_timestamp_in_seconds is not None,
+        )
+        parts.append(get_condensed_order_struct(options).pack(*values))
+    return b"".join(parts)
+
+
+def encode_multiple_order_packet(packet) -> bytes:
+    """
+    Encodes a MultipleOrderPacket to the same bytes as its borsh layout.
+    """
+    client_order_id = packet.client_order_id
+    if client_order_id is None:
+        client_order_id_bytes = b"\x00"
+    else:
+        if client_order_id >> 128:
+            raise ValueError(
+                f"client_order_id does not fit in a u128: {client_order_id}"
+            )
+        client_order_id_bytes = b"\x01" + client_order_id.to_bytes(16, "little")
+    return b"".join(
+        [
+            encode_condensed_orders(packet.bids),
+            encode_condensed_orders(packet.asks),
+            client_order_id_bytes,
+            bytes([packet.failed_multiple_limit_order_behavior.discriminator]),
+        ]
+    )
+
+
+@lru_cache(maxsize=None)
+def get_cancel_up_to_params_struct(options: Tuple[bool, ...]) -> struct.Struct:
+    return struct.Struct("<" + get_fields_format(CANCEL_UP_TO_PARAMS_FIELDS, options))
+
+
+def encode_cancel_up_to_params(params) -> bytes:
+    """
+    Encodes CancelUpToParams to the same bytes as its borsh layout.
+    """
+    values = []
+    options = get_field_values(CANCEL_UP_TO_PARAMS_FIELDS, vars(params), values)
+    return get_cancel_up_to_params_struct(options).pack(*values)
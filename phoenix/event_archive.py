@@ -0,0 +1,214 @@
+import os
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+from .events import EVENT_DTYPES, EventBatch
+
+# About a day of slots
+DEFAULT_PARTITION_SLOTS = 216_000
+
+HEADER_COLUMNS = [
+    ("slot", np.dtype("<u8"), ()),
+    ("timestamp", np.dtype("<i8"), ()),
+    ("sequence_number", np.dtype("<u8"), ()),
+    ("signer", np.dtype("u1"), (32,)),
+]
+
+# One record per appended chunk of rows. The index is written after the
+# column data, so it is also the record of which rows were committed.
+CHUNK_DTYPE = np.dtype(
+    [
+        ("partition", "<u8"),
+        ("row", "<u8"),
+        ("num_rows", "<u8"),
+        ("min_slot", "<u8"),
+        ("max_slot", "<u8"),
+        ("min_sequence_number", "<u8"),
+        ("max_sequence_number", "<u8"),
+    ]
+)
+
+INDEX_FILE = "index.bin"
+
+
+def get_archive_columns(kind: str) -> List[Tuple[str, np.dtype, Tuple[int, ...]]]:
+    """
+    Returns the (name, dtype, shape) of each column stored for events of
+    `kind`: the event fields followed by the instruction header fields.
+    """
+    if kind not in EVENT_DTYPES:
+        raise ValueError(f"No columnar layout for {kind} events")
+    dtype = EVENT_DTYPES[kind]
+    columns = []
+    for name in dtype.names:
+        if name == "discriminator":
+            continue
+        field_dtype = dtype.fields[name][0]
+        columns.append((name, field_dtype.base, field_dtype.shape))
+    return columns + HEADER_COLUMNS
+
+
+class EventArchive:
+    """
+    Append-only store of decoded events, one directory per market and event
+    kind. Rows are partitioned into slot ranges of `partition_slots`, and each
+    partition keeps one fixed-width file per column, so that reads are memory
+    maps of the column files.
+
+    The index of each market and kind records the slot and sequence number
+    range of every appended chunk. Rows must be appended in slot order.
+    """
+
+    def __init__(self, root: str, partition_slots: int = DEFAULT_PARTITION_SLOTS):
+        self.root = root
+        self.partition_slots = partition_slots
+
+    def append(self, batch: EventBatch):
+        """
+        Appends the events of a batch, grouped by market.
+        """
+        if len(batch) == 0:
+            return
+        markets, inverse = np.unique(batch.market, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        for index, market in enumerate(markets):
+            rows = np.flatnonzero(inverse == index)
+            columns = {
+                name: batch.events[name][rows]
+                for name, _, _ in get_archive_columns(batch.kind)[
+                    : -len(HEADER_COLUMNS)
+                ]
+            }
+            columns.update(
+                slot=batch.slot[rows],
+                timestamp=batch.timestamp[rows],
+                sequence_number=batch.sequence_number[rows],
+                signer=batch.signer[rows],
+            )
+            self.append_columns(Pubkey(bytes(market)), batch.kind, columns)
+
+    def append_columns(self, market: Pubkey, kind: str, columns: Dict[str, np.ndarray]):
+        """
+        Appends rows given as one array per column (see get_archive_columns).
+        Their slots must not be older than those already in the archive.
+        """
+        archive_columns = get_archive_columns(kind)
+        slots = np.asarray(columns["slot"], dtype=np.uint64)
+        num_rows = len(slots)
+        if num_rows == 0:
+            return
+        if np.any(slots[1:] < slots[:-1]):
+            raise ValueError("Rows must be in slot order")
+        directory = self.get_directory(market, kind)
+        os.makedirs(directory, exist_ok=True)
+        index = self.get_index(market, kind)
+        if len(index) > 0 and slots[0] < index["max_slot"][-1]:
+            raise ValueError(
+                f"Slot {slots[0]} is older than the last archived slot {index['max_slot'][-1]}"
+            )
+
+        sequence_numbers = np.asarray(columns["sequence_number"], dtype=np.uint64)
+        partitions = slots // self.partition_slots
+        boundaries = np.flatnonzero(partitions[1:] != partitions[:-1]) + 1
+        starts = np.concatenate([[0], boundaries])
+        ends = np.concatenate([boundaries, [num_rows]])
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            partition = int(partitions[start])
+            partition_directory = os.path.join(directory, f"{partition:012d}")
+            os.makedirs(partition_directory, exist_ok=True)
+            row = int(index["num_rows"][index["partition"] == partition].sum())
+            for name, dtype, shape in archive_columns:
+                values = np.ascontiguousarray(columns[name][start:end], dtype=dtype)
+                if values.shape[1:] != shape:
+                    raise ValueError(f"Column {name} must have shape (n, *{shape})")
+                path = os.path.join(partition_directory, name + ".bin")
+                with open(path, "ab") as f:
+                    # Drop rows of an append that did not reach the index
+                    f.truncate(row * dtype.itemsize * int(np.prod(shape)))
+                    f.write(values.tobytes())
+
+            chunk = np.zeros(1, CHUNK_DTYPE)
+            chunk["partition"] = partition
+            chunk["row"] = row
+            chunk["num_rows"] = end - start
+            chunk["min_slot"] = slots[start]
+            chunk["max_slot"] = slots[end - 1]
+            chunk["min_sequence_number"] = sequence_numbers[start:end].min()
+            chunk["max_sequence_number"] = sequence_numbers[start:end].max()
+            with open(os.path.join(directory, INDEX_FILE), "ab") as f:
+                f.truncate(len(index) * CHUNK_DTYPE.itemsize)
+                f.write(chunk.tobytes())
+            index = np.concatenate([index, chunk])
+
+    def scan(
+        self,
+        market: Pubkey,
+        kind: str,
+        min_slot: int = 0,
+        max_slot: int = 2**64 - 1,
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Yields, for each partition that overlaps [min_slot, max_slot], the rows
+        in that slot range as one memory-mapped, read-only array per column.
+        """
+        index = self.get_index(market, kind)
+        if len(index) == 0:
+            return
+        directory = self.get_directory(market, kind)
+        overlapping = (index["max_slot"] >= min_slot) & (index["min_slot"] <= max_slot)
+        for partition in np.unique(index["partition"][overlapping]).tolist():
+            chunks = index[index["partition"] == partition]
+            num_rows = int(chunks["num_rows"].sum())
+            partition_directory = os.path.join(directory, f"{partition:012d}")
+            columns = {
+                name: np.memmap(
+                    os.path.join(partition_directory, name + ".bin"),
+                    dtype=dtype,
+                    mode="r",
+                    shape=(num_rows, *shape),
+                )
+                for name, dtype, shape in get_archive_columns(kind)
+            }
+            # Rows are in slot order within a partition
+            slots = columns["slot"]
+            start = int(np.searchsorted(slots, min_slot, side="left"))
+            end = int(np.searchsorted(slots, max_slot, side="right"))
+            if start < end:
+                yield {name: column[start:end] for name, column in columns.items()}
+
+    def read(
+        self,
+        market: Pubkey,
+        kind: str,
+        min_slot: int = 0,
+        max_slot: int = 2**64 - 1,
+    ) -> Dict[str, np.ndarray]:
+        """
+        Returns the rows in [min_slot, max_slot] as one array per column. Unlike
+        scan, this copies rows when they span several partitions.
+        """
+        parts = list(self.scan(market, kind, min_slot, max_slot))
+        if len(parts) == 1:
+            return parts[0]
+        return {
+            name: (
+                np.concatenate([part[name] for part in parts])
+                if parts
+                else np.zeros((0, *shape), dtype)
+            )
+            for name, dtype, shape in get_archive_columns(kind)
+        }
+
+    def get_index(self, market: Pubkey, kind: str) -> np.ndarray:
+        path = os.path.join(self.get_directory(market, kind), INDEX_FILE)
+        if not os.path.exists(path):
+            return np.zeros(0, CHUNK_DTYPE)
+        # A torn final record is ignored, like the rows it would have committed
+        data = np.fromfile(path, dtype=np.uint8)
+        num_chunks = len(data) // CHUNK_DTYPE.itemsize
+        return data[: num_chunks * CHUNK_DTYPE.itemsize].view(CHUNK_DTYPE)
+
+    def get_directory(self, market: Pubkey, kind: str) -> str:
+        return os.path.join(self.root, str(market), kind)
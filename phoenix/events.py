@@ -1,11 +1,15 @@
 import base58
 import struct
-from typing import List, Optional
+import typing
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from phoenix.codec import CODECS
 from phoenix.program_id import PROGRAM_ID
 from phoenix.types.audit_log_header import AuditLogHeader
 from phoenix.types.fill_summary_event import FillSummaryEvent
-from phoenix.types.phoenix_market_event import PhoenixMarketEventKind, from_decoded
-from phoenix.types.phoenix_market_event import layout as phoenix_market_event_layout
+from phoenix.types import phoenix_market_event
+from phoenix.types.phoenix_market_event import PhoenixMarketEventKind
 from phoenix.types.place_event import PlaceEvent
 from phoenix.types.reduce_event import ReduceEvent
 from phoenix.types.evict_event import EvictEvent
@@ -17,6 +21,14 @@ from solders.transaction_status import EncodedConfirmedTransactionWithStatusMeta
 from solders.pubkey import Pubkey
 
 LOG_INSTRUCTION_DISCRIMINATOR = 15
+AUDIT_LOG_HEADER_SIZE = AuditLogHeader.layout.sizeof()
+AUDIT_LOG_HEADER_CODEC = CODECS[AuditLogHeader]
+# Offsets of the market and signer in the audit log header, and of the maker
+# in the events that carry one (after the discriminator and the u16 index)
+HEADER_MARKET_OFFSET = 1 + 8 + 8 + 8
+HEADER_SIGNER_OFFSET = HEADER_MARKET_OFFSET + 32
+HEADER_TOTAL_EVENTS_OFFSET = HEADER_SIGNER_OFFSET + 32
+EVENT_MAKER_OFFSET = 1 + 2
 
 
 class PhoenixEventsFromInstruction:
@@ -39,6 +51,46 @@ class PhoenixTransaction:
         self.txFailed = txFailed
 
 
+class EventFilter:
+    """
+    Selects the instructions and events to decode, checked against the raw log
+    bytes before any event object is built. A filter left as None matches
+    everything.
+
+    markets: Only instructions on these markets are decoded
+    traders: Instructions signed by one of these traders are kept whole. For
+             other instructions only the events whose maker is one of the
+             traders are kept, along with the FillSummary and Fee events that
+             summarize the instruction when any such event is kept
+    kinds: Only events of these kinds (e.g. "Fill") are kept
+
+    Instructions left without events by the trader or kind filters are
+    skipped entirely.
+    """
+
+    def __init__(
+        self,
+        markets: Optional[Iterable[Pubkey]] = None,
+        traders: Optional[Iterable[Pubkey]] = None,
+        kinds: Optional[Iterable[str]] = None,
+    ):
+        self.market_keys = (
+            None if markets is None else frozenset(bytes(m) for m in markets)
+        )
+        self.trader_keys = (
+            None if traders is None else frozenset(bytes(t) for t in traders)
+        )
+        self.discriminators = (
+            None
+            if kinds is None
+            else frozenset(
+                discriminator
+                for discriminator, (kind, _, _) in EVENT_DECODERS.items()
+                if kind.kind in kinds
+            )
+        )
+
+
 class PhoenixEvents:
     def __init__(self, events: List[PhoenixMarketEventKind]):
         self.events = events
@@ -46,6 +98,7 @@ class PhoenixEvents:
 
 def get_phoenix_events_from_confirmed_transaction_with_meta(
     tx_data: EncodedConfirmedTransactionWithStatusMeta,
+    event_filter: Optional[EventFilter] = None,
 ) -> PhoenixTransaction:
     meta = tx_data.transaction.meta
 
@@ -71,9 +124,9 @@ def get_phoenix_events_from_confirmed_transaction_with_meta(
                 continue
             raw_data = base58.b58decode(inner.data)
             if raw_data[0] == LOG_INSTRUCTION_DISCRIMINATOR:
-                data_array.append(raw_data[1:])
+                data_array.append(memoryview(raw_data)[1:])
 
-    instructions = [get_phoenix_events_from_log_data(data) for data in data_array]
+    instructions = get_phoenix_events_from_log_data_array(data_array, event_filter)
 
     return PhoenixTransaction(
         instructions,
@@ -83,25 +136,62 @@ def get_phoenix_events_from_confirmed_transaction_with_meta(
     )
 
 
-def get_phoenix_events_from_log_data(data: bytes) -> PhoenixEventsFromInstruction:
-    reader_index = 0
+def get_phoenix_events_from_log_data(
+    data: bytes, event_filter: Optional[EventFilter] = None
+) -> Optional[PhoenixEventsFromInstruction]:
+    """
+    Decodes the events logged by one instruction. Returns None when the
+    instruction is skipped by `event_filter`.
+    """
+    # Decode in place: offsets index into a single view of the log data
+    data = memoryview(data)
 
     # Read the first byte
     # A byte of 1 identifies a header event
-    (byte,) = struct.unpack_from("B", data, reader_index)
-    reader_index += 1
-    if byte != 1:
+    if data[0] != 1:
         raise Exception("early Unexpected event")
 
-    header = AuditLogHeader.layout.parse(data[reader_index:])
-    # Create the length buffer
-    length_buffer = struct.pack("I", header.total_events)
-    # Coerce the buffer for Borsh-encoded vector decoding
-    events_data = length_buffer + data[AuditLogHeader.layout.sizeof() + 1 :]
+    header_offset = 1
+    events_offset = header_offset + AUDIT_LOG_HEADER_SIZE
+    if event_filter is not None:
+        if event_filter.market_keys is not None:
+            market_offset = header_offset + HEADER_MARKET_OFFSET
+            market = bytes(data[market_offset : market_offset + 32])
+            if market not in event_filter.market_keys:
+                return None
+        makers = None
+        if event_filter.trader_keys is not None:
+            signer_offset = header_offset + HEADER_SIGNER_OFFSET
+            signer = bytes(data[signer_offset : signer_offset + 32])
+            if signer not in event_filter.trader_keys:
+                makers = event_filter.trader_keys
+        if makers is not None or event_filter.discriminators is not None:
+            header = AUDIT_LOG_HEADER_CODEC.from_buffer(data, header_offset)
+            events = filter_phoenix_events_from(
+                data,
+                events_offset,
+                header.total_events,
+                event_filter.discriminators,
+                makers,
+            )
+            if not events:
+                return None
+            return PhoenixEventsFromInstruction(header, events)
+
+    header = AUDIT_LOG_HEADER_CODEC.from_buffer(data, header_offset)
+    events = decode_phoenix_events_from(data, events_offset, header.total_events)
+    return PhoenixEventsFromInstruction(header, events)
 
-    events = decode_phoenix_events(events_data)
 
-    return PhoenixEventsFromInstruction(header, events)
+def get_phoenix_events_from_log_data_array(
+    data_array: List[bytes], event_filter: Optional[EventFilter] = None
+) -> List[PhoenixEventsFromInstruction]:
+    instructions = []
+    for data in data_array:
+        instruction = get_phoenix_events_from_log_data(data, event_filter)
+        if instruction is not None:
+            instructions.append(instruction)
+    return instructions
 
 
 EVENT_CLASSES = {
@@ -117,22 +207,51 @@ EVENT_CLASSES = {
     "ExpiredOrder": ExpiredOrderEvent,
 }
 
+# Event kind, decoder and encoded size (including the discriminator byte),
+# keyed by the enum discriminator that prefixes each event
+EVENT_DECODERS: Dict[int, Tuple[type, Callable[[bytes, int], Any], int]] = {
+    kind.discriminator: (
+        kind,
+        CODECS[EVENT_CLASSES[kind.kind]].from_buffer,
+        EVENT_CLASSES[kind.kind].layout.sizeof() + 1,
+    )
+    for kind in typing.get_args(PhoenixMarketEventKind)
+    if kind is not phoenix_market_event.Uninitialized
+}
+
+MAKER_EVENT_DISCRIMINATORS = frozenset(
+    kind.discriminator
+    for kind in (
+        phoenix_market_event.Fill,
+        phoenix_market_event.Evict,
+        phoenix_market_event.ExpiredOrder,
+    )
+)
+SUMMARY_EVENT_DISCRIMINATORS = frozenset(
+    kind.discriminator
+    for kind in (phoenix_market_event.FillSummary, phoenix_market_event.Fee)
+)
+
 
 def decode_phoenix_events(data: bytes) -> List[PhoenixMarketEventKind]:
-    # Decode the length of the events array
-    num_of_events = int.from_bytes(data[:4], "little")
-    offset = 4
+    # Decode the length of the Borsh-encoded events vector
+    data = memoryview(data)
+    (num_of_events,) = struct.unpack_from("<I", data, 0)
+    return decode_phoenix_events_from(data, 4, num_of_events)
+
+
+def decode_phoenix_events_from(
+    data: bytes, offset: int, num_of_events: int
+) -> List[PhoenixMarketEventKind]:
+    """
+    Decodes the events that run from `offset` to the end of `data`, checking
+    that there are `num_of_events` of them.
+    """
     events = []
-
-    while offset < len(data):
-        # Deserializing each event based on the layout
-        event = phoenix_market_event_layout.parse(data[offset:])
-        # Get the corresponding class, parse and adjust the offset
-        event_type = list(event.keys())[0]
-        event_class = EVENT_CLASSES[event_type]
-        event_instance = from_decoded(event)
-        events.append(event_instance)
-        event_size = event_class.layout.sizeof() + 1
+    end = len(data)
+    while offset < end:
+        kind, decode, event_size = EVENT_DECODERS[data[offset]]
+        events.append(kind((decode(data, offset + 1),)))
         offset += event_size
     assert (
         len(events) == num_of_events
@@ -141,6 +260,201 @@ def decode_phoenix_events(data: bytes) -> List[PhoenixMarketEventKind]:
     return events
 
 
+def filter_phoenix_events_from(
+    data: bytes,
+    offset: int,
+    num_of_events: int,
+    discriminators: Optional[frozenset] = None,
+    makers: Optional[frozenset] = None,
+) -> List[PhoenixMarketEventKind]:
+    """
+    Like decode_phoenix_events_from, but only decodes the events whose
+    discriminator is in `discriminators` and, if `makers` is given, whose
+    maker_id bytes are in `makers` (or that summarize the instruction).
+    """
+    events = []
+    num_events_read = 0
+    end = len(data)
+    while offset < end:
+        discriminator = data[offset]
+        kind, decode, event_size = EVENT_DECODERS[discriminator]
+        num_events_read += 1
+        if discriminators is None or discriminator in discriminators:
+            if makers is None or discriminator in SUMMARY_EVENT_DISCRIMINATORS:
+                events.append(kind((decode(data, offset + 1),)))
+            elif discriminator in MAKER_EVENT_DISCRIMINATORS:
+                maker_offset = offset + EVENT_MAKER_OFFSET
+                if bytes(data[maker_offset : maker_offset + 32]) in makers:
+                    events.append(kind((decode(data, offset + 1),)))
+        offset += event_size
+    assert (
+        num_events_read == num_of_events
+    ), "Decoding events from transaction: Mismatch in event length"
+
+    # Summaries only matter alongside the events they summarize
+    if makers is not None and all(
+        event.discriminator in SUMMARY_EVENT_DISCRIMINATORS for event in events
+    ):
+        return []
+    return events
+
+
+# Audit log header and event records as laid out in the log data. Event
+# records start with the enum discriminator byte. Pubkeys are 32 u8 fields
+# and u128 client order ids are (low, high) u64 pairs.
+AUDIT_LOG_HEADER_DTYPE = np.dtype(
+    [
+        ("instruction", "u1"),
+        ("sequence_number", "<u8"),
+        ("timestamp", "<i8"),
+        ("slot", "<u8"),
+        ("market", "u1", (32,)),
+        ("signer", "u1", (32,)),
+        ("total_events", "<u2"),
+    ]
+)
+
+FILL_EVENT_DTYPE = np.dtype(
+    [
+        ("discriminator", "u1"),
+        ("index", "<u2"),
+        ("maker_id", "u1", (32,)),
+        ("order_sequence_number", "<u8"),
+        ("price_in_ticks", "<u8"),
+        ("base_lots_filled", "<u8"),
+        ("base_lots_remaining", "<u8"),
+    ]
+)
+
+PLACE_EVENT_DTYPE = np.dtype(
+    [
+        ("discriminator", "u1"),
+        ("index", "<u2"),
+        ("order_sequence_number", "<u8"),
+        ("client_order_id", "<u8", (2,)),
+        ("price_in_ticks", "<u8"),
+        ("base_lots_placed", "<u8"),
+    ]
+)
+
+REDUCE_EVENT_DTYPE = np.dtype(
+    [
+        ("discriminator", "u1"),
+        ("index", "<u2"),
+        ("order_sequence_number", "<u8"),
+        ("price_in_ticks", "<u8"),
+        ("base_lots_removed", "<u8"),
+        ("base_lots_remaining", "<u8"),
+    ]
+)
+
+EVENT_DTYPES = {
+    "Fill": FILL_EVENT_DTYPE,
+    "Place": PLACE_EVENT_DTYPE,
+    "Reduce": REDUCE_EVENT_DTYPE,
+}
+
+
+@dataclass
+class EventBatch:
+    """
+    Events of one kind from many instructions, decoded into columns. `events`
+    is a structured array with the fields of EVENT_DTYPES[kind], and each
+    header column holds, for every event, the field of the instruction that
+    logged it. Pubkey columns are (n, 32) u8 arrays.
+    """
+
+    kind: str
+    events: np.ndarray
+    slot: np.ndarray
+    timestamp: np.ndarray
+    sequence_number: np.ndarray
+    market: np.ndarray
+    signer: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        return self.events[field]
+
+
+def get_event_batches_from_log_data(
+    data_array: Iterable[bytes], kinds: Iterable[str] = ("Fill", "Place", "Reduce")
+) -> Dict[str, EventBatch]:
+    """
+    Decodes the events of the given kinds (any of EVENT_DTYPES) logged by many
+    instructions into one EventBatch per kind, without building an object per
+    event.
+    """
+    kinds = set(kinds)
+    for kind in kinds:
+        if kind not in EVENT_DTYPES:
+            raise ValueError(f"No columnar layout for {kind} events")
+    discriminators = {
+        discriminator: kind.kind
+        for discriminator, (kind, _, _) in EVENT_DECODERS.items()
+        if kind.kind in kinds
+    }
+
+    data_array = list(data_array)
+    buffer = np.frombuffer(b"".join(data_array), dtype=np.uint8)
+    header_offsets = []
+    # Per kind: offsets of the events in the joined buffer and the index of the
+    # instruction that logged each one
+    offsets: Dict[int, List[int]] = {d: [] for d in discriminators}
+    instructions: Dict[int, List[int]] = {d: [] for d in discriminators}
+    base = 0
+    for instruction, data in enumerate(data_array):
+        if data[0] != 1:
+            raise Exception("early Unexpected event")
+        header_offsets.append(base + 1)
+        offset = 1 + AUDIT_LOG_HEADER_SIZE
+        end = len(data)
+        num_events_read = 0
+        while offset < end:
+            discriminator = data[offset]
+            if discriminator in offsets:
+                offsets[discriminator].append(base + offset)
+                instructions[discriminator].append(instruction)
+            offset += EVENT_DECODERS[discriminator][2]
+            num_events_read += 1
+        (total_events,) = struct.unpack_from("<H", data, HEADER_TOTAL_EVENTS_OFFSET + 1)
+        assert (
+            num_events_read == total_events
+        ), "Decoding events from transaction: Mismatch in event length"
+        base += end
+
+    headers = gather_records(buffer, header_offsets, AUDIT_LOG_HEADER_DTYPE)
+    batches = {}
+    for discriminator, kind in discriminators.items():
+        event_headers = headers[np.array(instructions[discriminator], dtype=np.int64)]
+        batches[kind] = EventBatch(
+            kind,
+            gather_records(buffer, offsets[discriminator], EVENT_DTYPES[kind]),
+            event_headers["slot"],
+            event_headers["timestamp"],
+            event_headers["sequence_number"],
+            event_headers["market"],
+            event_headers["signer"],
+        )
+    return batches
+
+
+def gather_records(
+    buffer: np.ndarray, offsets: List[int], dtype: np.dtype
+) -> np.ndarray:
+    """
+    Copies the records of `dtype` that start at `offsets` in a u8 buffer into
+    a structured array.
+    """
+    if not offsets:
+        return np.zeros(0, dtype)
+    # Rows of a sliding window view are the records starting at every byte
+    windows = np.lib.stride_tricks.sliding_window_view(buffer, dtype.itemsize)
+    return windows[np.array(offsets, dtype=np.int64)].view(dtype).reshape(-1)
+
+
 def read_public_key(data: bytes) -> Pubkey:
     # Extract the 32 bytes for the public key
     pubkey_bytes = data[:32]
@@ -0,0 +1,228 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+from .market import (
+    MARKET_HEADER_CODEC,
+    MARKET_SEQUENCE_NUMBER_OFFSET,
+    Market,
+    deserialize_fifo_order_id,
+    deserialize_fifo_resting_order,
+    deserialize_pubkey,
+    deserialize_trader_state,
+    get_market_sequence_number,
+    split_market_data,
+)
+from .market_arrays import TREE_HEADER_SIZE, live_node_mask
+from .market_metadata import MarketMetadata
+from .types.fifo_order_id import FIFOOrderId
+from .types.fifo_resting_order import FIFORestingOrder
+from .types.market_header import MARKET_HEADER_SIZE, MarketHeader
+from .types.side import Ask, Bid, SideKind
+from .types.trader_state import TraderState
+
+
+class IncrementalMarketDecoder:
+    """
+    Decodes successive snapshots of a single market account, re-parsing only
+    the tree nodes that changed since the previous snapshot.
+
+    Orders and trader states that did not change are shared with the Market
+    returned for the previous snapshot, so they should be treated as read-only.
+    """
+
+    def __init__(self, market_pubkey: Pubkey):
+        self.market_pubkey = market_pubkey
+        self._header_bytes: Optional[bytes] = None
+        self._header: Optional[MarketHeader] = None
+        self._metadata: Optional[MarketMetadata] = None
+        self._bids = _OrderTreeState(Bid())
+        self._asks = _OrderTreeState(Ask())
+        self._traders = _TraderTreeState()
+
+    def decode(self, data: bytes) -> Market:
+        # The header only changes in its sequence number between most updates
+        header_bytes = bytes(data[:MARKET_HEADER_SIZE])
+        if self._header_bytes is None or (
+            header_bytes[:MARKET_SEQUENCE_NUMBER_OFFSET]
+            != self._header_bytes[:MARKET_SEQUENCE_NUMBER_OFFSET]
+            or header_bytes[MARKET_SEQUENCE_NUMBER_OFFSET + 8 :]
+            != self._header_bytes[MARKET_SEQUENCE_NUMBER_OFFSET + 8 :]
+        ):
+            self._header = MARKET_HEADER_CODEC.from_buffer(header_bytes)
+            self._metadata = MarketMetadata(self.market_pubkey, self._header)
+        self._header_bytes = header_bytes
+        sequence_number = get_market_sequence_number(header_bytes)
+
+        _, market_fields, bid_buffer, ask_buffer, trader_buffer = split_market_data(
+            data, self._header
+        )
+        (
+            traders,
+            trader_pubkey_to_trader_index,
+            trader_index_to_trader_pubkey,
+        ) = self._traders.update(trader_buffer)
+
+        return Market(
+            address=self.market_pubkey,
+            metadata=self._metadata,
+            sequence_number=sequence_number,
+            **market_fields,
+            bids=self._bids.update(bid_buffer),
+            asks=self._asks.update(ask_buffer),
+            traders=traders,
+            trader_pubkey_to_trader_index=trader_pubkey_to_trader_index,
+            trader_index_to_trader_pubkey=trader_index_to_trader_pubkey,
+        )
+
+
+class _TreeState(ABC):
+    """
+    Keeps a view over the previous snapshot of a serialized red-black tree and
+    the entries decoded from it, keyed by node slot.
+    """
+
+    def __init__(self, key_size: int, value_size: int):
+        self.key_size = key_size
+        self.node_size = 16 + key_size + value_size
+        self.nodes: Optional[np.ndarray] = None
+        self.live = np.zeros(0, dtype=bool)
+        self.entries: Dict[int, Tuple[Any, Any]] = {}
+
+    @abstractmethod
+    def decode_node(self, data, offset: int) -> Tuple[Any, Any]:
+        """
+        Decodes the (key, value) entry of the node whose key starts at offset.
+        """
+
+    def diff(
+        self, data
+    ) -> Tuple[List[Tuple[Any, Any]], List[Tuple[int, Tuple[Any, Any]]]]:
+        """
+        Returns the entries removed since the previous snapshot and the
+        (slot, entry) pairs that were added or rewritten.
+        """
+        capacity = (len(data) - TREE_HEADER_SIZE) // self.node_size
+        # Compare whole node slots as rows of u64 words
+        nodes = np.frombuffer(
+            data,
+            dtype="<u8",
+            count=capacity * self.node_size // 8,
+            offset=TREE_HEADER_SIZE,
+        ).reshape(capacity, self.node_size // 8)
+
+        # A node can be freed and another reallocated without changing the
+        # allocator header, so the free list is walked on every snapshot
+        live = np.zeros(capacity, dtype=bool)
+        mask = live_node_mask(data, self.node_size)
+        live[: len(mask)] = mask
+
+        removed = []
+        if self.nodes is None or self.nodes.shape != nodes.shape:
+            removed = list(self.entries.values())
+            self.entries = {}
+            changed = np.flatnonzero(live)
+        else:
+            changed = np.union1d(
+                np.flatnonzero((nodes != self.nodes).any(axis=1)),
+                np.flatnonzero(live != self.live),
+            )
+
+        added = []
+        for slot in changed.tolist():
+            entry = self.entries.pop(slot, None)
+            if entry is not None:
+                removed.append(entry)
+            if live[slot]:
+                entry = self.decode_node(
+                    data, TREE_HEADER_SIZE + slot * self.node_size + 16
+                )
+                self.entries[slot] = entry
+                added.append((slot, entry))
+
+        self.nodes = nodes
+        self.live = live
+        return removed, added
+
+
+class _OrderTreeState(_TreeState):
+    def __init__(self, side: SideKind):
+        super().__init__(FIFOOrderId.size(), FIFORestingOrder.size())
+        self.is_bid = isinstance(side, Bid)
+        # Parallel lists kept in price-time priority (best order first)
+        self.sort_keys: List[Tuple[int, int]] = []
+        self.orders: List[Tuple[FIFOOrderId, FIFORestingOrder]] = []
+
+    def decode_node(self, data, offset: int) -> Tuple[FIFOOrderId, FIFORestingOrder]:
+        return (
+            deserialize_fifo_order_id(data, offset),
+            deserialize_fifo_resting_order(data, offset + self.key_size),
+        )
+
+    def sort_key(self, order_id: FIFOOrderId) -> Tuple[int, int]:
+        if self.is_bid:
+            return (-order_id.price_in_ticks, -order_id.order_sequence_number)
+        return (order_id.price_in_ticks, order_id.order_sequence_number)
+
+    def update(self, data) -> List[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        removed, added = self.diff(data)
+        if not removed and not added:
+            return self.orders
+
+        # Copy on write so that previously returned lists stay untouched
+        self.sort_keys = self.sort_keys.copy()
+        self.orders = self.orders.copy()
+        for order_id, _ in removed:
+            index = bisect_left(self.sort_keys, self.sort_key(order_id))
+            del self.sort_keys[index]
+            del self.orders[index]
+        for _, order in added:
+            key = self.sort_key(order[0])
+            index = bisect_left(self.sort_keys, key)
+            self.sort_keys.insert(index, key)
+            self.orders.insert(index, order)
+        return self.orders
+
+
+class _TraderTreeState(_TreeState):
+    def __init__(self):
+        super().__init__(32, TraderState.size())
+        self.traders: Dict[Pubkey, TraderState] = {}
+        self.trader_pubkey_to_trader_index: Dict[Pubkey, int] = {}
+        self.trader_index_to_trader_pubkey: Dict[int, Pubkey] = {}
+
+    def decode_node(self, data, offset: int) -> Tuple[Pubkey, TraderState]:
+        return (
+            deserialize_pubkey(data, offset),
+            deserialize_trader_state(data, offset + self.key_size),
+        )
+
+    def update(
+        self, data
+    ) -> Tuple[Dict[Pubkey, TraderState], Dict[Pubkey, int], Dict[int, Pubkey]]:
+        removed, added = self.diff(data)
+        if removed or added:
+            # Copy on write so that previously returned maps stay untouched
+            self.traders = self.traders.copy()
+            self.trader_pubkey_to_trader_index = (
+                self.trader_pubkey_to_trader_index.copy()
+            )
+            self.trader_index_to_trader_pubkey = (
+                self.trader_index_to_trader_pubkey.copy()
+            )
+            for pubkey, _ in removed:
+                del self.traders[pubkey]
+                index = self.trader_pubkey_to_trader_index.pop(pubkey)
+                del self.trader_index_to_trader_pubkey[index]
+            for slot, (pubkey, trader_state) in added:
+                self.traders[pubkey] = trader_state
+                self.trader_pubkey_to_trader_index[pubkey] = slot + 1
+                self.trader_index_to_trader_pubkey[slot + 1] = pubkey
+        return (
+            self.traders,
+            self.trader_pubkey_to_trader_index,
+            self.trader_index_to_trader_pubkey,
+        )
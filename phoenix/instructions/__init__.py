@@ -43,3 +43,14 @@ from .cancel_multiple_orders_by_id_with_free_funds import (
 )
 from .withdraw_funds import withdraw_funds, WithdrawFundsArgs, WithdrawFundsAccounts
 from .deposit_funds import deposit_funds, DepositFundsArgs, DepositFundsAccounts
+from .place_multiple_post_only_orders import (
+    place_multiple_post_only_orders,
+    PlaceMultiplePostOnlyOrdersArgs,
+    PlaceMultiplePostOnlyOrdersAccounts,
+)
+from .place_multiple_post_only_orders_with_free_funds import (
+    place_multiple_post_only_orders_with_free_funds,
+    PlaceMultiplePostOnlyOrdersWithFreeFundsArgs,
+    PlaceMultiplePostOnlyOrdersWithFreeFundsAccounts,
+)
+from .template import InstructionTemplate, InstructionTemplateCache
@@ -0,0 +1,90 @@
+from __future__ import annotations
+import typing
+from collections import OrderedDict
+from solders.pubkey import Pubkey
+from solders.instruction import Instruction, AccountMeta
+import borsh_construct as borsh
+
+# Maximum number of templates kept per cache
+TEMPLATE_CACHE_SIZE = 256
+
+
+class InstructionTemplate:
+    """
+    Instruction of one kind with a fixed list of accounts, e.g. the limit
+    orders of one trader on one market. The account metas and identifier are
+    kept from a first instruction, and only the arguments are encoded when
+    building another one.
+    """
+
+    def __init__(
+        self,
+        program_id: Pubkey,
+        identifier: bytes,
+        keys: typing.List[AccountMeta],
+        layout: typing.Optional[borsh.CStruct] = None,
+    ):
+        self.program_id = program_id
+        self.identifier = identifier
+        self.keys = keys
+        self.layout = layout
+
+    @classmethod
+    def from_instruction(
+        cls, instruction: Instruction, layout: typing.Optional[borsh.CStruct] = None
+    ) -> "InstructionTemplate":
+        """
+        Takes the accounts of an instruction built by one of the instruction
+        functions. `layout` is the args layout of its module, if it has args.
+        """
+        return cls(
+            instruction.program_id,
+            bytes(instruction.data[:1]),
+            instruction.accounts,
+            layout,
+        )
+
+    def build(self, args: typing.Optional[dict] = None) -> Instruction:
+        """
+        Builds an instruction from the same args as the instruction function.
+        """
+        if self.layout is None:
+            return Instruction(self.program_id, self.identifier, self.keys)
+        encoded_args = self.layout.build(
+            {name: value.to_encodable() for name, value in args.items()}
+        )
+        return self.build_from_encoded_args(encoded_args)
+
+    def build_from_encoded_args(self, encoded_args: bytes) -> Instruction:
+        return Instruction(self.program_id, self.identifier + encoded_args, self.keys)
+
+
+class InstructionTemplateCache:
+    """
+    Least recently used cache of instruction templates, so that a process
+    trading for many traders does not keep the accounts of every one of them.
+    """
+
+    def __init__(self, maxsize: int = TEMPLATE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.templates: OrderedDict[typing.Hashable, InstructionTemplate] = (
+            OrderedDict()
+        )
+
+    def get(self, key: typing.Hashable) -> typing.Optional[InstructionTemplate]:
+        template = self.templates.get(key)
+        if template is not None:
+            self.templates.move_to_end(key)
+        return template
+
+    def __setitem__(self, key: typing.Hashable, template: InstructionTemplate):
+        self.templates[key] = template
+        self.templates.move_to_end(key)
+        if len(self.templates) > self.maxsize:
+            self.templates.popitem(last=False)
+
+    def __contains__(self, key: typing.Hashable) -> bool:
+        return key in self.templates
+
+    def __len__(self) -> int:
+        return len(self.templates)
@@ -0,0 +1,203 @@
+from dataclasses import dataclass
+from typing import Iterable, Optional, Tuple
+
+from .types.fifo_order_id import FIFOOrderId
+from .types.fifo_resting_order import FIFORestingOrder
+from .types.self_trade_behavior import DecrementTake, SelfTradeBehaviorKind
+from .types.side import SideKind
+
+U64_MAX = 2**64 - 1
+
+
+@dataclass
+class IocSimulation:
+    """
+    Outcome of matching an immediate-or-cancel order against a book snapshot,
+    in lots. `voided` is set when the program would reject the whole order
+    (expired order, self trade with Abort, or minimum fill not met); the fill
+    fields then describe the matching done before the order was rejected.
+    """
+
+    side: SideKind
+    num_base_lots_filled: int = 0
+    num_quote_lots_filled: int = 0
+    num_quote_lot_fees: int = 0
+    num_orders_matched: int = 0
+    best_price_in_ticks: Optional[int] = None
+    worst_price_in_ticks: Optional[int] = None
+    voided: bool = False
+    # Sum of price_in_ticks * base lots over the fills
+    num_tick_lots_filled: int = 0
+
+    @property
+    def num_quote_lots_with_fees(self) -> int:
+        """Quote lots paid for a buy or received for a sell, after taker fees"""
+        if self.side.kind == "Bid":
+            return self.num_quote_lots_filled + self.num_quote_lot_fees
+        return self.num_quote_lots_filled - self.num_quote_lot_fees
+
+    @property
+    def average_price_in_ticks(self) -> Optional[float]:
+        if self.num_base_lots_filled == 0:
+            return None
+        return self.num_tick_lots_filled / self.num_base_lots_filled
+
+    @property
+    def slippage_in_bps(self) -> Optional[float]:
+        """Adverse move of the average fill price from the first fill price"""
+        average_price_in_ticks = self.average_price_in_ticks
+        if average_price_in_ticks is None or not self.best_price_in_ticks:
+            return None
+        slippage = (
+            average_price_in_ticks - self.best_price_in_ticks
+        ) / self.best_price_in_ticks
+        if self.side.kind == "Ask":
+            slippage = -slippage
+        return slippage * 10_000
+
+
+def simulate_ioc(
+    resting_orders: Iterable[Tuple[FIFOOrderId, FIFORestingOrder]],
+    side: SideKind,
+    base_lots_per_base_unit: int,
+    quote_lots_per_base_unit_per_tick: int,
+    taker_fee_bps: int,
+    num_base_lots: int = 0,
+    num_quote_lots: int = 0,
+    price_in_ticks: Optional[int] = None,
+    min_base_lots_to_fill: int = 0,
+    min_quote_lots_to_fill: int = 0,
+    self_trade_behavior: SelfTradeBehaviorKind = DecrementTake,
+    match_limit: Optional[int] = None,
+    trader_index: Optional[int] = None,
+    last_valid_slot: Optional[int] = None,
+    last_valid_unix_timestamp_in_seconds: Optional[int] = None,
+    slot: int = -1,
+    unix_timestamp: int = -1,
+) -> IocSimulation:
+    """
+    Matches an immediate-or-cancel order against `resting_orders`, the
+    opposite side of the book best-first, following the program's matching
+    rules. A zero `num_base_lots` or `num_quote_lots` leaves that budget
+    unbounded. Resting orders that expired at (slot, unix_timestamp) are
+    skipped, and each one counts towards the match limit.
+    """
+    is_bid = side.kind == "Bid"
+    result = IocSimulation(side)
+    if (last_valid_slot is not None and 0 <= last_valid_slot < slot) or (
+        last_valid_unix_timestamp_in_seconds is not None
+        and 0 <= last_valid_unix_timestamp_in_seconds < unix_timestamp
+    ):
+        result.voided = True
+        return result
+
+    if price_in_ticks is None:
+        price_in_ticks = U64_MAX if is_bid else 0
+    base_lot_budget = num_base_lots if num_base_lots > 0 else U64_MAX
+    # Taker fees are charged on top of the matched quote lots, so the quote
+    # budget shrinks for buys and grows for sells
+    if num_quote_lots > 0:
+        if is_bid:
+            adjusted_quote_lot_budget = (
+                num_quote_lots * base_lots_per_base_unit * 10_000
+            ) // (10_000 + taker_fee_bps)
+        else:
+            adjusted_quote_lot_budget = (
+                num_quote_lots * base_lots_per_base_unit * 10_000
+            ) // (10_000 - taker_fee_bps)
+    else:
+        adjusted_quote_lot_budget = U64_MAX
+    if match_limit is None:
+        match_limit = U64_MAX
+
+    matched_adjusted_quote_lots = 0
+    for order_id, resting_order in resting_orders:
+        if base_lot_budget == 0 or adjusted_quote_lot_budget == 0 or match_limit == 0:
+            break
+        resting_price_in_ticks = order_id.price_in_ticks
+        if (is_bid and resting_price_in_ticks > price_in_ticks) or (
+            not is_bid and resting_price_in_ticks < price_in_ticks
+        ):
+            break
+        if (
+            resting_order.last_valid_slot != 0 and resting_order.last_valid_slot < slot
+        ) or (
+            resting_order.last_valid_unix_timestamp_in_seconds != 0
+            and resting_order.last_valid_unix_timestamp_in_seconds < unix_timestamp
+        ):
+            # The program removes the expired orders it crosses while matching
+            # (FIFOMarket::match_order) and decrements the match limit for each
+            match_limit -= 1
+            continue
+
+        adjusted_quote_lots_per_base_lot = (
+            resting_price_in_ticks * quote_lots_per_base_unit_per_tick
+        )
+        if trader_index is not None and resting_order.trader_index == trader_index:
+            if self_trade_behavior.kind == "Abort":
+                result.voided = True
+                return result
+            match_limit -= 1
+            if self_trade_behavior.kind == "DecrementTake":
+                base_lots_removed = min(
+                    base_lot_budget,
+                    adjusted_quote_lot_budget // adjusted_quote_lots_per_base_lot,
+                    resting_order.num_base_lots,
+                )
+                base_lot_budget -= base_lots_removed
+                adjusted_quote_lot_budget -= (
+                    base_lots_removed * adjusted_quote_lots_per_base_lot
+                )
+            continue
+
+        num_base_lots_quoted = resting_order.num_base_lots
+        num_adjusted_quote_lots_quoted = (
+            num_base_lots_quoted * adjusted_quote_lots_per_base_lot
+        )
+        fully_matched = (
+            num_base_lots_quoted <= base_lot_budget
+            and num_adjusted_quote_lots_quoted <= adjusted_quote_lot_budget
+        )
+        if fully_matched:
+            matched_base_lots = num_base_lots_quoted
+        else:
+            matched_base_lots = min(
+                base_lot_budget,
+                adjusted_quote_lot_budget // adjusted_quote_lots_per_base_lot,
+            )
+        matched_adjusted = matched_base_lots * adjusted_quote_lots_per_base_lot
+
+        base_lot_budget -= matched_base_lots
+        adjusted_quote_lot_budget -= matched_adjusted
+        match_limit -= 1
+        if matched_base_lots > 0:
+            if result.best_price_in_ticks is None:
+                result.best_price_in_ticks = resting_price_in_ticks
+            result.worst_price_in_ticks = resting_price_in_ticks
+            result.num_orders_matched += 1
+            result.num_base_lots_filled += matched_base_lots
+            result.num_tick_lots_filled += matched_base_lots * resting_price_in_ticks
+            matched_adjusted_quote_lots += matched_adjusted
+        # A partially matched resting order means the taker is exhausted
+        if not fully_matched:
+            break
+
+    # Buys round the quote lots owed up and sells round the proceeds down.
+    # Fees are rounded up.
+    if is_bid:
+        result.num_quote_lots_filled = -(
+            -matched_adjusted_quote_lots // base_lots_per_base_unit
+        )
+    else:
+        result.num_quote_lots_filled = (
+            matched_adjusted_quote_lots // base_lots_per_base_unit
+        )
+    result.num_quote_lot_fees = -(
+        -result.num_quote_lots_filled * taker_fee_bps // 10_000
+    )
+    if (
+        result.num_base_lots_filled < min_base_lots_to_fill
+        or result.num_quote_lots_filled < min_quote_lots_to_fill
+    ):
+        result.voided = True
+    return result
@@ -1,19 +1,51 @@
-from typing import List, Optional, Tuple, Set, Any
+from typing import Iterator, List, Optional, Tuple, Set, Any
 import struct
 
 from typing import List, Tuple, Dict
 
+import numpy as np
 from solders.pubkey import Pubkey
+from .codec import CODECS
+from .ioc_simulation import IocSimulation, simulate_ioc
+from .market_arrays import DepthCurve, OrderArrays, PriceImpact, TraderArrays
 from .market_metadata import MarketMetadata
 from .types.market_header import MARKET_HEADER_SIZE, MarketHeader
 from .types.fifo_order_id import FIFOOrderId
 from .types.fifo_resting_order import FIFORestingOrder
+from .types.order_packet import ImmediateOrCancel
+from .types.self_trade_behavior import DecrementTake, SelfTradeBehaviorKind
+from .types.side import Ask, Bid, SideKind
 from .types.trader_state import TraderState
+from collections import defaultdict
 from dataclasses import dataclass
 from decimal import Decimal
+from functools import cached_property
+from itertools import islice
 
 DEFAULT_L2_LADDER_DEPTH = 10
 
+# Red-black tree node registers. Node addresses are 1-based, 0 is the null node.
+SENTINEL = 0
+LEFT_REGISTER = 0
+RIGHT_REGISTER = 1
+PARENT_REGISTER = 2
+COLOR_REGISTER = 3
+
+# Byte offsets into the market account for reads that skip the full decode
+MARKET_SIZE_PARAMS_OFFSET = 16
+MARKET_SEQUENCE_NUMBER_OFFSET = 272
+MARKET_TREES_OFFSET = MARKET_HEADER_SIZE + 8 * 32 + 6 * 8
+
+ORDER_NODE_SIZE = 16 + 16 + 32
+# Node registers followed by the FIFOOrderId key and FIFORestingOrder value
+ORDER_NODE = struct.Struct("<4I6Q")
+NODE_REGISTERS = struct.Struct("<4I")
+
+MARKET_HEADER_CODEC = CODECS[MarketHeader]
+FIFO_ORDER_ID_CODEC = CODECS[FIFOOrderId]
+FIFO_RESTING_ORDER_CODEC = CODECS[FIFORestingOrder]
+TRADER_STATE_CODEC = CODECS[TraderState]
+
 
 @dataclass
 class ActiveOrder:
@@ -44,6 +76,57 @@ class Ladder:
         self.asks = []
 
 
+class ArrayLadder:
+    """
+    L2 ladder with integer level prices (in ticks) and sizes (in base lots)
+    held in NumPy arrays, best level first
+    """
+
+    def __init__(
+        self,
+        bid_prices_in_ticks: np.ndarray,
+        bid_sizes_in_base_lots: np.ndarray,
+        ask_prices_in_ticks: np.ndarray,
+        ask_sizes_in_base_lots: np.ndarray,
+    ):
+        self.bid_prices_in_ticks = bid_prices_in_ticks
+        self.bid_sizes_in_base_lots = bid_sizes_in_base_lots
+        self.ask_prices_in_ticks = ask_prices_in_ticks
+        self.ask_sizes_in_base_lots = ask_sizes_in_base_lots
+
+    def to_ladder(self) -> Ladder:
+        ladder = Ladder()
+        ladder.bids = [
+            LadderLevel(Decimal(price_in_ticks), Decimal(size_in_base_lots))
+            for price_in_ticks, size_in_base_lots in zip(
+                self.bid_prices_in_ticks.tolist(), self.bid_sizes_in_base_lots.tolist()
+            )
+        ]
+        ladder.asks = [
+            LadderLevel(Decimal(price_in_ticks), Decimal(size_in_base_lots))
+            for price_in_ticks, size_in_base_lots in zip(
+                self.ask_prices_in_ticks.tolist(), self.ask_sizes_in_base_lots.tolist()
+            )
+        ]
+        return ladder
+
+    def to_ui_ladder(
+        self, metadata: MarketMetadata, as_float: bool = False
+    ) -> "UiLadder":
+        """
+        Converts the levels to prices in quote units per raw base unit and
+        sizes in raw base units, as exact Decimals or, with as_float, as floats
+        """
+        ui_ladder = UiLadder()
+        ui_ladder.bids = get_ui_ladder_levels(
+            metadata, self.bid_prices_in_ticks, self.bid_sizes_in_base_lots, as_float
+        )
+        ui_ladder.asks = get_ui_ladder_levels(
+            metadata, self.ask_prices_in_ticks, self.ask_sizes_in_base_lots, as_float
+        )
+        return ui_ladder
+
+
 class UiLadderLevel:
     price: Decimal
     size: Decimal
@@ -95,143 +178,33 @@ class Market:
 
     @classmethod
     def deserialize_market_data(cls, market_pubkey: Pubkey, data: bytes) -> "Market":
-        # Deserialize the market header
-
-        header = MarketHeader.from_decoded(
-            MarketHeader.layout.parse(data[:MARKET_HEADER_SIZE])
-        )
-        metadata = MarketMetadata(market_pubkey, header)
-        offset = MARKET_HEADER_SIZE
-
-        # Parse market data
-        padding_len = 8 * 32
-        remaining = data[offset + padding_len :]
-        offset = 0
-
-        base_lots_per_base_unit = int.from_bytes(
-            remaining[offset : offset + 8], "little"
-        )
-        offset += 8
-        quote_lots_per_base_unit_per_tick = int.from_bytes(
-            remaining[offset : offset + 8], "little"
-        )
-        offset += 8
-        sequence_number = int.from_bytes(remaining[offset : offset + 8], "little")
-        offset += 8
-        taker_fee_bps = int.from_bytes(remaining[offset : offset + 8], "little")
-        offset += 8
-        collected_quote_lot_fees = int.from_bytes(
-            remaining[offset : offset + 8], "little"
+        header, market_fields, bid_buffer, ask_buffer, trader_buffer = (
+            split_market_data(data)
         )
-        offset += 8
-        unclaimed_quote_lot_fees = int.from_bytes(
-            remaining[offset : offset + 8], "little"
+        traders, trader_pubkey_to_trader_index, trader_index_to_trader_pubkey = (
+            deserialize_trader_tree(trader_buffer)
         )
-        offset += 8
-        remaining = remaining[offset:]
-
-        # Parse bids, asks, and traders
-        num_bids = header.market_size_params.bids_size
-        num_asks = header.market_size_params.asks_size
-        num_traders = header.market_size_params.num_seats
-
-        bids_size = (
-            16 + 16 + (16 + FIFOOrderId.size() + FIFORestingOrder.size()) * num_bids
-        )
-        asks_size = (
-            16 + 16 + (16 + FIFOOrderId.size() + FIFORestingOrder.size()) * num_asks
-        )
-        traders_size = 16 + 16 + (16 + 32 + TraderState.size()) * num_traders
-        offset = 0
-
-        bid_buffer = remaining[offset : offset + bids_size]
-        offset += bids_size
-        ask_buffer = remaining[offset : offset + asks_size]
-        offset += asks_size
-        trader_buffer = remaining[offset : offset + traders_size]
-
-        deserialize_fifo_order_id = lambda data, offset: FIFOOrderId.from_decoded(
-            FIFOOrderId.layout.parse(data[offset : offset + FIFOOrderId.size()])
-        )
-        deserialize_fifo_resting_order = (
-            lambda data, offset: FIFORestingOrder.from_decoded(
-                FIFORestingOrder.layout.parse(
-                    data[offset : offset + FIFORestingOrder.size()]
-                )
-            )
-        )
-        deserialize_pubkey = lambda data, offset: Pubkey(data[offset : offset + 32])
-        deserialize_trader_state = lambda data, offset: TraderState.from_decoded(
-            TraderState.layout.parse(data[offset : offset + TraderState.size()])
-        )
-
-        bids_unsorted = deserialize_red_black_tree(
-            bid_buffer,
-            FIFOOrderId.size(),
-            FIFORestingOrder.size(),
-            deserialize_fifo_order_id,
-            deserialize_fifo_resting_order,
-        )
-        asks_unsorted = deserialize_red_black_tree(
-            ask_buffer,
-            FIFOOrderId.size(),
-            FIFORestingOrder.size(),
-            deserialize_fifo_order_id,
-            deserialize_fifo_resting_order,
-        )
-
-        # Sort bids in descending order of price, and ascending order of sequence number
-        bids = sorted(
-            bids_unsorted,
-            key=lambda x: (x[0].price_in_ticks, x[0].order_sequence_number),
-            reverse=True,
-        )
-
-        # Sort asks in ascending order of price, and ascending order of sequence number
-        asks = sorted(
-            asks_unsorted,
-            key=lambda x: (x[0].price_in_ticks, x[0].order_sequence_number),
-        )
-
-        traders = {}
-        for k, trader_state in deserialize_red_black_tree(
-            trader_buffer,
-            32,
-            TraderState.size(),
-            deserialize_pubkey,
-            deserialize_trader_state,
-        ):
-            traders[k] = trader_state
-
-        trader_pubkey_to_trader_index = {}
-        trader_index_to_trader_pubkey = {}
-        for k, index in get_node_indices(
-            trader_buffer,
-            32,
-            TraderState.size(),
-            deserialize_pubkey,
-            deserialize_trader_state,
-        ).items():
-            trader_pubkey_to_trader_index[k] = index
-            trader_index_to_trader_pubkey[index] = k
 
         return cls(
             address=market_pubkey,
-            metadata=metadata,
+            metadata=MarketMetadata(market_pubkey, header),
             sequence_number=header.market_sequence_number,
-            base_lots_per_base_unit=base_lots_per_base_unit,
-            quote_lots_per_base_unit_per_tick=quote_lots_per_base_unit_per_tick,
-            order_sequence_number=sequence_number,
-            taker_fee_bps=taker_fee_bps,
-            collected_quote_lot_fees=collected_quote_lot_fees,
-            unclaimed_quote_lot_fees=unclaimed_quote_lot_fees,
-            bids=bids,
-            asks=asks,
+            **market_fields,
+            bids=deserialize_orders(bid_buffer),
+            asks=deserialize_orders(ask_buffer),
             traders=traders,
             trader_pubkey_to_trader_index=trader_pubkey_to_trader_index,
             trader_index_to_trader_pubkey=trader_index_to_trader_pubkey,
         )
 
+    def iter_bids(self) -> Iterator[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        """Iterates over the bids best-first"""
+        return iter(self.bids)
+
+    def iter_asks(self) -> Iterator[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        """Iterates over the asks best-first"""
+        return iter(self.asks)
+
     def get_bids(self, levels=1):
         return list(
             map(
@@ -241,7 +214,7 @@ class Market:
                         order[1].num_base_lots
                     ),
                 ),
-                self.bids[:levels],
+                islice(self.iter_bids(), levels),
             )
         )
 
@@ -254,28 +227,62 @@ class Market:
                         order[1].num_base_lots
                     ),
                 ),
-                self.asks[:levels],
+                islice(self.iter_asks(), levels),
             )
         )
 
-    def get_orders_for_trader(
-        self, trader: Pubkey
-    ) -> Tuple[
+    @cached_property
+    def _orders_by_trader_index(
+        self,
+    ) -> Dict[
+        int,
+        Tuple[
+            List[Tuple[FIFOOrderId, FIFORestingOrder]],
+            List[Tuple[FIFOOrderId, FIFORestingOrder]],
+        ],
+    ]:
+        # Built on first lookup so every trader query on this snapshot after
+        # the first only touches that trader's orders
+        orders_by_trader_index = defaultdict(lambda: ([], []))
+        for order in self.bids:
+            orders_by_trader_index[order[1].trader_index][0].append(order)
+        for order in self.asks:
+            orders_by_trader_index[order[1].trader_index][1].append(order)
+        return dict(orders_by_trader_index)
+
+    @cached_property
+    def _orders_by_sequence_number(
+        self,
+    ) -> Dict[int, Tuple[FIFOOrderId, FIFORestingOrder]]:
+        # Bid sequence numbers are stored bitwise inverted, so they never
+        # collide with ask sequence numbers
+        orders_by_sequence_number = {}
+        for order in self.bids:
+            orders_by_sequence_number[order[0].order_sequence_number] = order
+        for order in self.asks:
+            orders_by_sequence_number[order[0].order_sequence_number] = order
+        return orders_by_sequence_number
+
+    def get_orders_for_trader(self, trader: Pubkey) -> Tuple[
         List[Tuple[FIFOOrderId, FIFORestingOrder]],  # bids
         List[Tuple[FIFOOrderId, FIFORestingOrder]],  # asks
     ]:
         trader_index = self.trader_pubkey_to_trader_index.get(trader)
         if trader_index is None:
             return ([], [])
-        bid_orders = []
-        for bid in self.bids:
-            if bid[1].trader_index == trader_index:
-                bid_orders.append(bid)
-        ask_orders = []
-        for ask in self.asks:
-            if ask[1].trader_index == trader_index:
-                ask_orders.append(ask)
-        return (bid_orders, ask_orders)
+        bid_orders, ask_orders = self._orders_by_trader_index.get(
+            trader_index, ([], [])
+        )
+        return (list(bid_orders), list(ask_orders))
+
+    def get_order(
+        self, order_sequence_number: int
+    ) -> Optional[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        """
+        Returns the resting order with the given order sequence number, as stored
+        in its FIFOOrderId, or None if it is no longer on the book
+        """
+        return self._orders_by_sequence_number.get(order_sequence_number)
 
     def get_active_orders(self, trader: Pubkey) -> List[ActiveOrder]:
         bid_orders, ask_orders = self.get_orders_for_trader(trader)
@@ -313,97 +320,610 @@ class Market:
     def get_trader_state(self, trader: Pubkey) -> Optional[TraderState]:
         return self.traders.get(trader)
 
+    def simulate_ioc(
+        self,
+        side: SideKind,
+        num_base_lots: int = 0,
+        num_quote_lots: int = 0,
+        price_in_ticks: Optional[int] = None,
+        min_base_lots_to_fill: int = 0,
+        min_quote_lots_to_fill: int = 0,
+        self_trade_behavior: SelfTradeBehaviorKind = DecrementTake,
+        match_limit: Optional[int] = None,
+        trader: Optional[Pubkey] = None,
+        last_valid_slot: Optional[int] = None,
+        last_valid_unix_timestamp_in_seconds: Optional[int] = None,
+        slot: int = -1,
+        unix_timestamp: int = -1,
+    ) -> IocSimulation:
+        """
+        Simulates an immediate-or-cancel order (or swap) against this snapshot
+        without sending it. Self trades are only detected when `trader` is given.
+        """
+        return simulate_ioc(
+            self.iter_asks() if side.kind == "Bid" else self.iter_bids(),
+            side,
+            self.base_lots_per_base_unit,
+            self.quote_lots_per_base_unit_per_tick,
+            self.taker_fee_bps,
+            num_base_lots=num_base_lots,
+            num_quote_lots=num_quote_lots,
+            price_in_ticks=price_in_ticks,
+            min_base_lots_to_fill=min_base_lots_to_fill,
+            min_quote_lots_to_fill=min_quote_lots_to_fill,
+            self_trade_behavior=self_trade_behavior,
+            match_limit=match_limit,
+            trader_index=(
+                self.trader_pubkey_to_trader_index.get(trader)
+                if trader is not None
+                else None
+            ),
+            last_valid_slot=last_valid_slot,
+            last_valid_unix_timestamp_in_seconds=last_valid_unix_timestamp_in_seconds,
+            slot=slot,
+            unix_timestamp=unix_timestamp,
+        )
+
+    def simulate_ioc_packet(
+        self,
+        order_packet: ImmediateOrCancel,
+        trader: Optional[Pubkey] = None,
+        slot: int = -1,
+        unix_timestamp: int = -1,
+    ) -> IocSimulation:
+        value = order_packet.value
+        return self.simulate_ioc(
+            value["side"],
+            num_base_lots=value["num_base_lots"],
+            num_quote_lots=value["num_quote_lots"],
+            price_in_ticks=value["price_in_ticks"],
+            min_base_lots_to_fill=value["min_base_lots_to_fill"],
+            min_quote_lots_to_fill=value["min_quote_lots_to_fill"],
+            self_trade_behavior=value["self_trade_behavior"],
+            match_limit=value["match_limit"],
+            trader=trader,
+            last_valid_slot=value["last_valid_slot"],
+            last_valid_unix_timestamp_in_seconds=value[
+                "last_valid_unix_timestamp_in_seconds"
+            ],
+            slot=slot,
+            unix_timestamp=unix_timestamp,
+        )
+
+    @cached_property
+    def bid_arrays(self) -> OrderArrays:
+        return OrderArrays.from_orders(self.bids)
+
+    @cached_property
+    def ask_arrays(self) -> OrderArrays:
+        return OrderArrays.from_orders(self.asks)
+
+    def get_next_expiry(
+        self, slot: int = -1, unix_timestamp: int = -1
+    ) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Returns the first slot and the first unix timestamp after the given
+        clock at which a resting order expires and the book changes, or None
+        when no resting order expires by slot or by timestamp
+        """
+        bid_slot, bid_unix_timestamp = self.bid_arrays.expiry_index.next_expiry(
+            slot, unix_timestamp
+        )
+        ask_slot, ask_unix_timestamp = self.ask_arrays.expiry_index.next_expiry(
+            slot, unix_timestamp
+        )
+        return (
+            min(filter(None, (bid_slot, ask_slot)), default=None),
+            min(filter(None, (bid_unix_timestamp, ask_unix_timestamp)), default=None),
+        )
+
+    def get_price_impact(
+        self,
+        side: SideKind,
+        num_base_lots,
+        slot: int = -1,
+        unix_timestamp: int = -1,
+    ) -> PriceImpact:
+        """
+        Prices taker orders of many sizes at once. `side` is the taker side and
+        `num_base_lots` an array of order sizes. Without a clock the cumulative
+        depth is built once per snapshot and reused across calls.
+        """
+        order_arrays = self.ask_arrays if side.kind == "Bid" else self.bid_arrays
+        if slot <= 0 and unix_timestamp <= 0:
+            depth_curve = order_arrays.depth_curve
+        else:
+            depth_curve = DepthCurve(
+                *order_arrays.get_price_levels(len(order_arrays), slot, unix_timestamp)
+            )
+        return depth_curve.get_price_impact(
+            num_base_lots,
+            side.kind == "Bid",
+            self.base_lots_per_base_unit,
+            self.quote_lots_per_base_unit_per_tick,
+            self.taker_fee_bps,
+        )
+
+    def get_ladder_arrays(
+        self,
+        slot: int = -1,
+        unix_timestamp: int = -1,
+        levels: int = DEFAULT_L2_LADDER_DEPTH,
+    ) -> ArrayLadder:
+        bid_prices_in_ticks, bid_sizes_in_base_lots = self.bid_arrays.get_price_levels(
+            levels, slot, unix_timestamp
+        )
+        ask_prices_in_ticks, ask_sizes_in_base_lots = self.ask_arrays.get_price_levels(
+            levels, slot, unix_timestamp
+        )
+        return ArrayLadder(
+            bid_prices_in_ticks,
+            bid_sizes_in_base_lots,
+            ask_prices_in_ticks,
+            ask_sizes_in_base_lots,
+        )
+
     def get_ladder(
         self,
         slot: int = -1,
         unix_timestamp: int = -1,
         levels: int = DEFAULT_L2_LADDER_DEPTH,
     ) -> Ladder:
-        ladder = Ladder()
-
-        for order_id, resting_order in self.bids:
-            if (
-                resting_order.last_valid_slot != 0
-                and resting_order.last_valid_slot < slot
-            ):
-                continue
-            if (
-                resting_order.last_valid_unix_timestamp_in_seconds != 0
-                and resting_order.last_valid_unix_timestamp_in_seconds < unix_timestamp
-            ):
-                continue
-
-            price_in_ticks = Decimal(order_id.price_in_ticks)
-            size_in_base_lots = Decimal(resting_order.num_base_lots)
-            if not ladder.bids:
-                ladder.bids.append(LadderLevel(price_in_ticks, size_in_base_lots))
-            else:
-                prev = ladder.bids[-1]
-                if price_in_ticks == prev.price_in_ticks:
-                    prev.size_in_base_lots += size_in_base_lots
-                else:
-                    if len(ladder.bids) == levels:
-                        break
-                    ladder.bids.append(LadderLevel(price_in_ticks, size_in_base_lots))
-
-        for order_id, resting_order in self.asks:
-            if (
-                resting_order.last_valid_slot != 0
-                and resting_order.last_valid_slot < slot
-            ):
-                continue
-            if (
-                resting_order.last_valid_unix_timestamp_in_seconds != 0
-                and resting_order.last_valid_unix_timestamp_in_seconds < unix_timestamp
-            ):
-                continue
-
-            price_in_ticks = Decimal(order_id.price_in_ticks)
-            size_in_base_lots = Decimal(resting_order.num_base_lots)
-            if not ladder.asks:
-                ladder.asks.append(LadderLevel(price_in_ticks, size_in_base_lots))
-            else:
-                prev = ladder.asks[-1]
-                if price_in_ticks == prev.price_in_ticks:
-                    prev.size_in_base_lots += size_in_base_lots
-                else:
-                    if len(ladder.asks) == levels:
-                        break
-                    ladder.asks.append(LadderLevel(price_in_ticks, size_in_base_lots))
-
-        return ladder
+        return self.get_ladder_arrays(slot, unix_timestamp, levels).to_ladder()
 
     def get_ui_ladder(
         self,
         slot: int = -1,
         unix_timestamp: int = -1,
         levels: int = DEFAULT_L2_LADDER_DEPTH,
+        as_float: bool = False,
     ) -> UiLadder:
-        ui_ladder = UiLadder()
-        ladder = self.get_ladder(slot, unix_timestamp, levels)
-        for bid in ladder.bids:
-            ui_ladder.bids.append(
-                UiLadderLevel(
-                    Decimal(self.metadata.ticks_to_float_price(bid.price_in_ticks)),
-                    Decimal(
-                        self.metadata.base_lots_to_raw_base_units_as_float(
-                            bid.size_in_base_lots
-                        )
-                    ),
-                )
+        return self.get_ladder_arrays(slot, unix_timestamp, levels).to_ui_ladder(
+            self.metadata, as_float
+        )
+
+
+class LazyMarket(Market):
+    """
+    Market that eagerly parses only the header and fixed market fields. The
+    bids, asks, traders and trader index maps are decoded from the account
+    data on first access and cached for the lifetime of the snapshot.
+    """
+
+    def __init__(
+        self,
+        bid_buffer: memoryview,
+        ask_buffer: memoryview,
+        trader_buffer: memoryview,
+        **market_fields,
+    ):
+        for name, value in market_fields.items():
+            setattr(self, name, value)
+        self._bid_buffer = bid_buffer
+        self._ask_buffer = ask_buffer
+        self._trader_buffer = trader_buffer
+
+    @classmethod
+    def deserialize_market_data(
+        cls, market_pubkey: Pubkey, data: bytes
+    ) -> "LazyMarket":
+        header, market_fields, bid_buffer, ask_buffer, trader_buffer = (
+            split_market_data(data)
+        )
+        return cls(
+            address=market_pubkey,
+            metadata=MarketMetadata(market_pubkey, header),
+            sequence_number=header.market_sequence_number,
+            **market_fields,
+            bid_buffer=bid_buffer,
+            ask_buffer=ask_buffer,
+            trader_buffer=trader_buffer,
+        )
+
+    @cached_property
+    def bids(self) -> List[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        return deserialize_orders(self._bid_buffer)
+
+    @cached_property
+    def asks(self) -> List[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        return deserialize_orders(self._ask_buffer)
+
+    @cached_property
+    def bid_arrays(self) -> OrderArrays:
+        return OrderArrays.from_tree(self._bid_buffer, Bid())
+
+    @cached_property
+    def ask_arrays(self) -> OrderArrays:
+        return OrderArrays.from_tree(self._ask_buffer, Ask())
+
+    @cached_property
+    def trader_arrays(self) -> TraderArrays:
+        return TraderArrays.from_tree(self._trader_buffer)
+
+    @cached_property
+    def _trader_tree(
+        self,
+    ) -> Tuple[Dict[Pubkey, TraderState], Dict[Pubkey, int], Dict[int, Pubkey]]:
+        return deserialize_trader_tree(self._trader_buffer)
+
+    @cached_property
+    def traders(self) -> Dict[Pubkey, TraderState]:
+        return self._trader_tree[0]
+
+    def get_ladder(
+        self,
+        slot: int = -1,
+        unix_timestamp: int = -1,
+        levels: int = DEFAULT_L2_LADDER_DEPTH,
+    ) -> Ladder:
+        ladder = Ladder()
+        ladder.bids = get_price_levels(
+            self._bid_buffer, 0, levels, slot, unix_timestamp
+        )
+        ladder.asks = get_price_levels(
+            self._ask_buffer, 0, levels, slot, unix_timestamp
+        )
+        return ladder
+
+    def iter_bids(self) -> Iterator[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        # Walk the tree directly unless the side has already been decoded
+        if "bids" in self.__dict__:
+            return iter(self.bids)
+        return iterate_orders(self._bid_buffer)
+
+    def iter_asks(self) -> Iterator[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        if "asks" in self.__dict__:
+            return iter(self.asks)
+        return iterate_orders(self._ask_buffer)
+
+    @cached_property
+    def _trader_index_maps(self) -> Tuple[Dict[Pubkey, int], Dict[int, Pubkey]]:
+        return self._trader_tree[1:]
+
+    @cached_property
+    def trader_pubkey_to_trader_index(self) -> Dict[Pubkey, int]:
+        return self._trader_index_maps[0]
+
+    @cached_property
+    def trader_index_to_trader_pubkey(self) -> Dict[int, Pubkey]:
+        return self._trader_index_maps[1]
+
+
+class ArrayMarket(LazyMarket):
+    """
+    LazyMarket whose regions are decoded with NumPy structured arrays mapped
+    directly over the account data. The columnar `bid_arrays`, `ask_arrays`
+    and `trader_arrays` are available for bulk consumers, while `bids`, `asks`,
+    `traders` and the trader index maps are built from them on first access.
+    """
+
+    @cached_property
+    def bids(self) -> List[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        return self.bid_arrays.to_orders()
+
+    @cached_property
+    def asks(self) -> List[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        return self.ask_arrays.to_orders()
+
+    @cached_property
+    def traders(self) -> Dict[Pubkey, TraderState]:
+        return self.trader_arrays.to_traders()
+
+    def iter_bids(self) -> Iterator[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        return iter(self.bids)
+
+    def iter_asks(self) -> Iterator[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        return iter(self.asks)
+
+    @cached_property
+    def _trader_index_maps(self) -> Tuple[Dict[Pubkey, int], Dict[int, Pubkey]]:
+        return self.trader_arrays.to_trader_index_maps()
+
+
+def get_ui_ladder_levels(
+    metadata: MarketMetadata,
+    price_in_ticks: np.ndarray,
+    size_in_base_lots: np.ndarray,
+    as_float: bool = False,
+) -> List[UiLadderLevel]:
+    if as_float:
+        prices = metadata.ticks_to_float_price(price_in_ticks.astype(np.float64))
+        sizes = metadata.base_lots_to_raw_base_units_as_float(
+            size_in_base_lots.astype(np.float64)
+        )
+        return [
+            UiLadderLevel(price, size)
+            for price, size in zip(prices.tolist(), sizes.tolist())
+        ]
+
+    # Scale the integers directly so the Decimals do not pick up float error
+    price_denominator = Decimal(
+        metadata.quote_atoms_per_quote_unit * metadata.raw_base_units_per_base_unit
+    )
+    size_denominator = Decimal(metadata.base_atoms_per_raw_base_unit)
+    return [
+        UiLadderLevel(
+            Decimal(price * metadata.tick_size_in_quote_atoms_per_base_unit)
+            / price_denominator,
+            Decimal(size * metadata.base_atoms_per_base_lot) / size_denominator,
+        )
+        for price, size in zip(price_in_ticks.tolist(), size_in_base_lots.tolist())
+    ]
+
+
+def split_market_data(
+    data: bytes,
+    header: Optional[MarketHeader] = None,
+) -> Tuple[MarketHeader, Dict[str, int], memoryview, memoryview, memoryview]:
+    """
+    Parses the market header and fixed market fields and returns zero-copy
+    views of the bid, ask and trader tree regions. A previously parsed header
+    can be passed in to skip parsing it again.
+    """
+    if header is None:
+        header = MARKET_HEADER_CODEC.from_buffer(data)
+
+    # Parse market data
+    padding_len = 8 * 32
+    offset = MARKET_HEADER_SIZE + padding_len
+    (
+        base_lots_per_base_unit,
+        quote_lots_per_base_unit_per_tick,
+        sequence_number,
+        taker_fee_bps,
+        collected_quote_lot_fees,
+        unclaimed_quote_lot_fees,
+    ) = struct.unpack_from("<6Q", data, offset)
+    offset += 6 * 8
+    market_fields = {
+        "base_lots_per_base_unit": base_lots_per_base_unit,
+        "quote_lots_per_base_unit_per_tick": quote_lots_per_base_unit_per_tick,
+        "order_sequence_number": sequence_number,
+        "taker_fee_bps": taker_fee_bps,
+        "collected_quote_lot_fees": collected_quote_lot_fees,
+        "unclaimed_quote_lot_fees": unclaimed_quote_lot_fees,
+    }
+
+    # Parse bids, asks, and traders
+    num_bids = header.market_size_params.bids_size
+    num_asks = header.market_size_params.asks_size
+    num_traders = header.market_size_params.num_seats
+
+    bids_size = 16 + 16 + (16 + FIFOOrderId.size() + FIFORestingOrder.size()) * num_bids
+    asks_size = 16 + 16 + (16 + FIFOOrderId.size() + FIFORestingOrder.size()) * num_asks
+    traders_size = 16 + 16 + (16 + 32 + TraderState.size()) * num_traders
+
+    view = memoryview(data)
+    bid_buffer = view[offset : offset + bids_size]
+    offset += bids_size
+    ask_buffer = view[offset : offset + asks_size]
+    offset += asks_size
+    trader_buffer = view[offset : offset + traders_size]
+
+    return header, market_fields, bid_buffer, ask_buffer, trader_buffer
+
+
+def deserialize_fifo_order_id(data: bytes, offset: int) -> FIFOOrderId:
+    return FIFO_ORDER_ID_CODEC.from_buffer(data, offset)
+
+
+def deserialize_fifo_resting_order(data: bytes, offset: int) -> FIFORestingOrder:
+    return FIFO_RESTING_ORDER_CODEC.from_buffer(data, offset)
+
+
+def deserialize_pubkey(data: bytes, offset: int) -> Pubkey:
+    return Pubkey(data[offset : offset + 32])
+
+
+def deserialize_trader_state(data: bytes, offset: int) -> TraderState:
+    return TRADER_STATE_CODEC.from_buffer(data, offset)
+
+
+def iterate_orders(data: bytes) -> Iterator[Tuple[FIFOOrderId, FIFORestingOrder]]:
+    """
+    Yields the orders of one side of the book best-first (price-time priority)
+    without decoding the rest of the side.
+    """
+    return iterate_red_black_tree(
+        data,
+        FIFOOrderId.size(),
+        FIFORestingOrder.size(),
+        deserialize_fifo_order_id,
+        deserialize_fifo_resting_order,
+    )
+
+
+def deserialize_orders(data: bytes) -> List[Tuple[FIFOOrderId, FIFORestingOrder]]:
+    # The order trees are keyed in price-time priority for both sides, so an
+    # in-order traversal already yields the best order first
+    return list(iterate_orders(data))
+
+
+def deserialize_traders(data: bytes) -> Dict[Pubkey, TraderState]:
+    return deserialize_trader_tree(data)[0]
+
+
+def deserialize_trader_index_maps(
+    data: bytes,
+) -> Tuple[Dict[Pubkey, int], Dict[int, Pubkey]]:
+    _, trader_pubkey_to_trader_index, trader_index_to_trader_pubkey = (
+        deserialize_trader_tree(data)
+    )
+    return trader_pubkey_to_trader_index, trader_index_to_trader_pubkey
+
+
+def deserialize_trader_tree(
+    data: bytes,
+) -> Tuple[Dict[Pubkey, TraderState], Dict[Pubkey, int], Dict[int, Pubkey]]:
+    """
+    Decodes the traders and both trader index maps in a single pass over the
+    trader tree. The trader index is the address of the trader's node.
+    """
+    traders = {}
+    trader_pubkey_to_trader_index = {}
+    trader_index_to_trader_pubkey = {}
+    for index, trader, trader_state in iterate_allocated_nodes(
+        data,
+        32,
+        TraderState.size(),
+        deserialize_pubkey,
+        deserialize_trader_state,
+    ):
+        traders[trader] = trader_state
+        trader_pubkey_to_trader_index[trader] = index
+        trader_index_to_trader_pubkey[index] = trader
+    return traders, trader_pubkey_to_trader_index, trader_index_to_trader_pubkey
+
+
+def iterate_red_black_tree(
+    data: bytes,
+    key_size: int,
+    value_size: int,
+    deserialize_key,
+    deserialize_value,
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Yields the (key, value) pairs of a serialized red-black tree in key order by
+    following the child registers from the root. Only visited nodes are decoded.
+    """
+    node_size = 16 + key_size + value_size
+    (root,) = struct.unpack_from("<I", data, 0)
+    (bump_index,) = struct.unpack_from("<I", data, 24)
+
+    stack = []
+    node = root
+    counter = 0
+    while stack or node != SENTINEL:
+        while node != SENTINEL:
+            stack.append(node)
+            node = struct.unpack_from(
+                "<I", data, 32 + (node - 1) * node_size + 4 * LEFT_REGISTER
+            )[0]
+            counter += 1
+            if counter > bump_index:
+                raise ValueError("Infinite loop detected")
+        node = stack.pop()
+        offset = 32 + (node - 1) * node_size
+        yield (
+            deserialize_key(data, offset + 16),
+            deserialize_value(data, offset + 16 + key_size),
+        )
+        node = struct.unpack_from("<I", data, offset + 4 * RIGHT_REGISTER)[0]
+
+
+def get_market_sequence_number(data: bytes) -> int:
+    """
+    Reads the market sequence number from raw market account bytes without
+    decoding the header.
+    """
+    return struct.unpack_from("<Q", data, MARKET_SEQUENCE_NUMBER_OFFSET)[0]
+
+
+def get_top_of_book(
+    data: bytes,
+    levels: int = 1,
+    slot: int = -1,
+    unix_timestamp: int = -1,
+) -> Ladder:
+    """
+    Builds the best `levels` price levels of each side directly from raw market
+    account bytes, decoding only the orders that make up those levels.
+    """
+    bids_size, asks_size = struct.unpack_from("<QQ", data, MARKET_SIZE_PARAMS_OFFSET)
+    bids_offset = MARKET_TREES_OFFSET
+    asks_offset = bids_offset + 32 + ORDER_NODE_SIZE * bids_size
+    ladder = Ladder()
+    ladder.bids = get_price_levels(data, bids_offset, levels, slot, unix_timestamp)
+    ladder.asks = get_price_levels(data, asks_offset, levels, slot, unix_timestamp)
+    return ladder
+
+
+def get_price_levels(
+    data: bytes,
+    tree_offset: int,
+    levels: int,
+    slot: int = -1,
+    unix_timestamp: int = -1,
+) -> List[LadderLevel]:
+    """
+    Walks an order tree from its best node through in-order successors until
+    `levels` distinct prices of unexpired orders have been aggregated.
+    """
+    unpack_node = ORDER_NODE.unpack_from
+    unpack_registers = NODE_REGISTERS.unpack_from
+    # Node addresses are 1-based
+    base = tree_offset + 32 - ORDER_NODE_SIZE
+    (node,) = struct.unpack_from("<I", data, tree_offset)
+    (bump_index,) = struct.unpack_from("<I", data, tree_offset + 24)
+
+    # The best order is the leftmost node
+    counter = 0
+    while node != SENTINEL:
+        left = unpack_registers(data, base + node * ORDER_NODE_SIZE)[LEFT_REGISTER]
+        if left == SENTINEL:
+            break
+        node = left
+        counter += 1
+        if counter > bump_index:
+            raise ValueError("Infinite loop detected")
+
+    prices = []
+    sizes = []
+    while node != SENTINEL:
+        (
+            _,
+            right,
+            parent,
+            _,
+            price_in_ticks,
+            _,
+            _,
+            num_base_lots,
+            last_valid_slot,
+            last_valid_unix_timestamp_in_seconds,
+        ) = unpack_node(data, base + node * ORDER_NODE_SIZE)
+
+        if not (
+            (last_valid_slot != 0 and last_valid_slot < slot)
+            or (
+                last_valid_unix_timestamp_in_seconds != 0
+                and last_valid_unix_timestamp_in_seconds < unix_timestamp
             )
-        for ask in ladder.asks:
-            ui_ladder.asks.append(
-                UiLadderLevel(
-                    Decimal(self.metadata.ticks_to_float_price(ask.price_in_ticks)),
-                    Decimal(
-                        self.metadata.base_lots_to_raw_base_units_as_float(
-                            ask.size_in_base_lots
-                        )
-                    ),
+        ):
+            if prices and prices[-1] == price_in_ticks:
+                sizes[-1] += num_base_lots
+            else:
+                if len(prices) == levels:
+                    break
+                prices.append(price_in_ticks)
+                sizes.append(num_base_lots)
+
+        # Move to the in-order successor
+        if right != SENTINEL:
+            node = right
+            left = unpack_registers(data, base + node * ORDER_NODE_SIZE)[0]
+            while left != SENTINEL:
+                node = left
+                left = unpack_registers(data, base + node * ORDER_NODE_SIZE)[0]
+        else:
+            child = node
+            node = parent
+            while node != SENTINEL:
+                _, right, parent, _ = unpack_registers(
+                    data, base + node * ORDER_NODE_SIZE
                 )
-            )
-        return ui_ladder
+                if right != child:
+                    break
+                child = node
+                node = parent
+        counter += 1
+        if counter > 2 * bump_index:
+            raise ValueError("Infinite loop detected")
+
+    return [
+        LadderLevel(Decimal(price_in_ticks), Decimal(size_in_base_lots))
+        for price_in_ticks, size_in_base_lots in zip(prices, sizes)
+    ]
 
 
 def deserialize_red_black_tree(
@@ -413,16 +933,12 @@ def deserialize_red_black_tree(
     deserialize_key,
     deserialize_value,
 ) -> list:
-    tree_nodes = []
-    nodes, free_nodes = deserialize_red_black_tree_nodes(
-        data, key_size, value_size, deserialize_key, deserialize_value
-    )
-
-    for index, (key, value) in enumerate(nodes):
-        if index not in free_nodes:
-            tree_nodes.append((key, value))
-
-    return tree_nodes
+    return [
+        (key, value)
+        for _, key, value in iterate_allocated_nodes(
+            data, key_size, value_size, deserialize_key, deserialize_value
+        )
+    ]
 
 
 def get_node_indices(
@@ -432,16 +948,50 @@ def get_node_indices(
     deserialize_key,
     deserialize_value,
 ) -> dict:
-    index_map = {}
-    nodes, free_nodes = deserialize_red_black_tree_nodes(
-        data, key_size, value_size, deserialize_key, deserialize_value
-    )
+    return {
+        key: index
+        for index, key, _ in iterate_allocated_nodes(
+            data, key_size, value_size, deserialize_key, deserialize_value
+        )
+    }
 
-    for index, (key, _) in enumerate(nodes):
-        if index not in free_nodes:
-            index_map[key] = index + 1
 
-    return index_map
+def iterate_allocated_nodes(
+    data: bytes,
+    key_size: int,
+    value_size: int,
+    deserialize_key,
+    deserialize_value,
+) -> Iterator[Tuple[int, Any, Any]]:
+    """
+    Yields (node address, key, value) for the nodes of a serialized red-black
+    tree in node order, skipping the nodes on the free list without decoding them.
+    """
+    node_size = 16 + key_size + value_size
+    bump_index, free_list_head = struct.unpack_from("<ii", data, 24)
+    num_nodes = min(max(bump_index - 1, 0), (len(data) - 32) // node_size)
+
+    # One flag per node, set for the nodes on the free list
+    free_nodes = bytearray(num_nodes)
+    counter = 0
+    while free_list_head < bump_index:
+        free_nodes[free_list_head - 1] = 1
+        (free_list_head,) = struct.unpack_from(
+            "<i", data, 32 + (free_list_head - 1) * node_size + 4 * LEFT_REGISTER
+        )
+        counter += 1
+        if counter > bump_index:
+            raise ValueError("Infinite loop detected")
+
+    for index in range(num_nodes):
+        if free_nodes[index]:
+            continue
+        offset = 32 + index * node_size + 16
+        yield (
+            index + 1,
+            deserialize_key(data, offset),
+            deserialize_value(data, offset + key_size),
+        )
 
 
 def deserialize_red_black_tree_nodes(
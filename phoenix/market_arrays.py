@@ -0,0 +1,506 @@
+import struct
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+from .types.fifo_order_id import FIFOOrderId
+from .types.fifo_resting_order import FIFORestingOrder
+from .types.side import Bid, SideKind
+from .types.trader_state import TraderState
+
+# Red-black tree header (root pointer + padding) followed by the node allocator
+# header (capacity, bump index and free list head)
+TREE_HEADER_SIZE = 32
+
+# Every node starts with four u32 registers: left, right, parent and color.
+# Freed nodes reuse the first register as the free list "next" pointer.
+ORDER_NODE_DTYPE = np.dtype(
+    [
+        ("left", "<u4"),
+        ("right", "<u4"),
+        ("parent", "<u4"),
+        ("color", "<u4"),
+        ("price_in_ticks", "<u8"),
+        ("order_sequence_number", "<u8"),
+        ("trader_index", "<u8"),
+        ("num_base_lots", "<u8"),
+        ("last_valid_slot", "<u8"),
+        ("last_valid_unix_timestamp_in_seconds", "<u8"),
+    ]
+)
+
+TRADER_NODE_DTYPE = np.dtype(
+    [
+        ("left", "<u4"),
+        ("right", "<u4"),
+        ("parent", "<u4"),
+        ("color", "<u4"),
+        ("trader", "u1", (32,)),
+        ("quote_lots_locked", "<u8"),
+        ("quote_lots_free", "<u8"),
+        ("base_lots_locked", "<u8"),
+        ("base_lots_free", "<u8"),
+        ("padding", "<u8", (8,)),
+    ]
+)
+
+
+def live_node_mask(data, node_size: int) -> np.ndarray:
+    """
+    Returns a boolean mask over the allocated node slots of a serialized
+    red-black tree that is False for the nodes on the free list.
+    """
+    bump_index, free_list_head = struct.unpack_from("<II", data, 24)
+    num_nodes = min(max(bump_index - 1, 0), (len(data) - TREE_HEADER_SIZE) // node_size)
+
+    live = np.ones(num_nodes, dtype=bool)
+    counter = 0
+    while free_list_head < bump_index:
+        live[free_list_head - 1] = False
+        (free_list_head,) = struct.unpack_from(
+            "<I", data, TREE_HEADER_SIZE + (free_list_head - 1) * node_size
+        )
+        counter += 1
+        if counter > bump_index:
+            raise ValueError("Infinite loop detected")
+    return live
+
+
+def map_tree_nodes(data, node_dtype: np.dtype) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Maps the allocated nodes of a serialized red-black tree without copying.
+
+    Returns the node array (indexed by node address - 1) and the 1-based node
+    addresses of the nodes that are not on the free list.
+    """
+    live = live_node_mask(data, node_dtype.itemsize)
+    nodes = np.frombuffer(
+        data, dtype=node_dtype, count=len(live), offset=TREE_HEADER_SIZE
+    )
+    return nodes, np.flatnonzero(live).astype(np.uint32) + 1
+
+
+class OrderArrays:
+    """
+    Columnar view of one side of the book, sorted in price-time priority
+    (best order first).
+    """
+
+    def __init__(self, nodes: np.ndarray, node_addresses: np.ndarray):
+        self.nodes = nodes
+        self.node_addresses = node_addresses
+
+    @classmethod
+    def from_tree(cls, data, side: SideKind) -> "OrderArrays":
+        nodes, addresses = map_tree_nodes(data, ORDER_NODE_DTYPE)
+        live_nodes = nodes[addresses - 1]
+        order = np.lexsort(
+            (live_nodes["order_sequence_number"], live_nodes["price_in_ticks"])
+        )
+        # Bids are sorted by descending price. Bid sequence numbers are stored
+        # bitwise inverted, so descending also puts the oldest order first.
+        if isinstance(side, Bid):
+            order = order[::-1]
+        return cls(live_nodes[order], addresses[order])
+
+    @classmethod
+    def from_orders(
+        cls, orders: List[Tuple[FIFOOrderId, FIFORestingOrder]]
+    ) -> "OrderArrays":
+        """
+        Builds the arrays from orders that are already in price-time priority.
+        Node addresses and registers are not known and are left as 0.
+        """
+        nodes = np.array(
+            [
+                (
+                    0,
+                    0,
+                    0,
+                    0,
+                    order_id.price_in_ticks,
+                    order_id.order_sequence_number,
+                    resting_order.trader_index,
+                    resting_order.num_base_lots,
+                    resting_order.last_valid_slot,
+                    resting_order.last_valid_unix_timestamp_in_seconds,
+                )
+                for order_id, resting_order in orders
+            ],
+            dtype=ORDER_NODE_DTYPE,
+        )
+        return cls(nodes, np.zeros(len(nodes), dtype=np.uint32))
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @cached_property
+    def expiry_index(self) -> "ExpiryIndex":
+        return ExpiryIndex(self)
+
+    def live_mask(self, slot: int = -1, unix_timestamp: int = -1) -> np.ndarray:
+        """
+        Returns a mask that is False for the orders whose time in force has
+        expired at the given slot and unix timestamp
+        """
+        return ~self.expiry_index.expired_mask(slot, unix_timestamp)
+
+    @cached_property
+    def level_boundaries(self) -> np.ndarray:
+        """
+        Start offsets of each run of equal prices (one per price level of the
+        unfiltered book), followed by the number of orders
+        """
+        price_in_ticks = self.price_in_ticks
+        if len(price_in_ticks) == 0:
+            return np.zeros(1, dtype=np.int64)
+        return np.concatenate(
+            (
+                [0],
+                np.flatnonzero(price_in_ticks[1:] != price_in_ticks[:-1]) + 1,
+                [len(price_in_ticks)],
+            )
+        )
+
+    @cached_property
+    def level_prices(self) -> np.ndarray:
+        return self.price_in_ticks[self.level_boundaries[:-1]]
+
+    @cached_property
+    def level_sizes(self) -> np.ndarray:
+        if len(self) == 0:
+            return self.num_base_lots.copy()
+        return np.add.reduceat(self.num_base_lots, self.level_boundaries[:-1])
+
+    @cached_property
+    def depth_curve(self) -> "DepthCurve":
+        return DepthCurve(self.level_prices, self.level_sizes)
+
+    def get_price_levels(
+        self, levels: int, slot: int = -1, unix_timestamp: int = -1
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Aggregates the live orders into at most `levels` price levels, best
+        first. Returns the level prices in ticks and sizes in base lots.
+        """
+        levels = max(levels, 0)
+        expired = self.expiry_index.expired_mask(slot, unix_timestamp)
+        boundaries = self.level_boundaries
+        num_levels = len(boundaries) - 1
+
+        # Start from the first `levels` levels of the unfiltered book and widen
+        # the prefix while expired orders leave too few live levels in it
+        prefix_levels = levels
+        while True:
+            prefix_levels = min(prefix_levels, num_levels)
+            price_in_ticks = self.level_prices[:prefix_levels]
+            size_in_base_lots = self.level_sizes[:prefix_levels]
+            expired_positions = np.flatnonzero(expired[: boundaries[prefix_levels]])
+            if len(expired_positions) > 0:
+                # Take the expired orders out of their levels and drop the
+                # levels that no live order is left in
+                level_ids = np.searchsorted(boundaries, expired_positions, "right") - 1
+                size_in_base_lots = size_in_base_lots.copy()
+                np.subtract.at(
+                    size_in_base_lots, level_ids, self.num_base_lots[expired_positions]
+                )
+                num_orders = np.diff(boundaries[: prefix_levels + 1]) - np.bincount(
+                    level_ids, minlength=prefix_levels
+                )
+                live = num_orders > 0
+                price_in_ticks = price_in_ticks[live]
+                size_in_base_lots = size_in_base_lots[live]
+            if len(price_in_ticks) >= levels or prefix_levels == num_levels:
+                break
+            prefix_levels *= 2
+        return price_in_ticks[:levels], size_in_base_lots[:levels]
+
+    @property
+    def price_in_ticks(self) -> np.ndarray:
+        return self.nodes["price_in_ticks"]
+
+    @property
+    def order_sequence_number(self) -> np.ndarray:
+        return self.nodes["order_sequence_number"]
+
+    @property
+    def trader_index(self) -> np.ndarray:
+        return self.nodes["trader_index"]
+
+    @property
+    def num_base_lots(self) -> np.ndarray:
+        return self.nodes["num_base_lots"]
+
+    @property
+    def last_valid_slot(self) -> np.ndarray:
+        return self.nodes["last_valid_slot"]
+
+    @property
+    def last_valid_unix_timestamp_in_seconds(self) -> np.ndarray:
+        return self.nodes["last_valid_unix_timestamp_in_seconds"]
+
+    def to_orders(self) -> List[Tuple[FIFOOrderId, FIFORestingOrder]]:
+        return [
+            (
+                FIFOOrderId(price_in_ticks, order_sequence_number),
+                FIFORestingOrder(
+                    trader_index,
+                    num_base_lots,
+                    last_valid_slot,
+                    last_valid_unix_timestamp_in_seconds,
+                ),
+            )
+            for (
+                price_in_ticks,
+                order_sequence_number,
+                trader_index,
+                num_base_lots,
+                last_valid_slot,
+                last_valid_unix_timestamp_in_seconds,
+            ) in zip(
+                self.price_in_ticks.tolist(),
+                self.order_sequence_number.tolist(),
+                self.trader_index.tolist(),
+                self.num_base_lots.tolist(),
+                self.last_valid_slot.tolist(),
+                self.last_valid_unix_timestamp_in_seconds.tolist(),
+            )
+        ]
+
+
+class ExpiryIndex:
+    """
+    Positions of the orders in an OrderArrays that carry a time in force,
+    sorted by last valid slot and by last valid unix timestamp, so the orders
+    expired at a given clock are found with a binary search.
+    """
+
+    def __init__(self, order_arrays: OrderArrays):
+        self.num_orders = len(order_arrays)
+        (
+            self.slot_positions,
+            self.last_valid_slots,
+        ) = sort_nonzero(order_arrays.last_valid_slot)
+        (
+            self.unix_timestamp_positions,
+            self.last_valid_unix_timestamps,
+        ) = sort_nonzero(order_arrays.last_valid_unix_timestamp_in_seconds)
+
+    def expired_mask(self, slot: int = -1, unix_timestamp: int = -1) -> np.ndarray:
+        # An order has expired once the clock is past its last valid slot or
+        # timestamp. A negative or zero clock expires nothing.
+        expired = np.zeros(self.num_orders, dtype=bool)
+        expired[
+            self.slot_positions[
+                : np.searchsorted(self.last_valid_slots, max(slot, 0), "left")
+            ]
+        ] = True
+        expired[
+            self.unix_timestamp_positions[
+                : np.searchsorted(
+                    self.last_valid_unix_timestamps, max(unix_timestamp, 0), "left"
+                )
+            ]
+        ] = True
+        return expired
+
+    def expired_positions(self, slot: int = -1, unix_timestamp: int = -1) -> np.ndarray:
+        return np.flatnonzero(self.expired_mask(slot, unix_timestamp))
+
+    def next_expiry(
+        self, slot: int = -1, unix_timestamp: int = -1
+    ) -> Tuple[Optional[int], Optional[int]]:
+        """
+        Returns the first slot and the first unix timestamp after the given
+        clock at which an order that is still valid expires, or None when no
+        such order exists
+        """
+        return (
+            next_expiry(self.last_valid_slots, slot),
+            next_expiry(self.last_valid_unix_timestamps, unix_timestamp),
+        )
+
+
+def sort_nonzero(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    positions = np.flatnonzero(values)
+    order = np.argsort(values[positions], kind="stable")
+    return positions[order], values[positions][order]
+
+
+def next_expiry(last_valid: np.ndarray, clock: int) -> Optional[int]:
+    index = np.searchsorted(last_valid, max(clock, 0), "left")
+    if index == len(last_valid):
+        return None
+    return int(last_valid[index]) + 1
+
+
+@dataclass
+class PriceImpact:
+    """
+    Cost of taker orders of several sizes against one side of the book, one
+    entry per requested size. Lots are u64 arrays, and quote lots are rounded
+    like the program does (up for buys, down for sells) and exclude the taker
+    fee. Prices are NaN where nothing was filled.
+    """
+
+    num_base_lots_filled: np.ndarray
+    num_quote_lots_filled: np.ndarray
+    num_quote_lot_fees: np.ndarray
+    average_price_in_ticks: np.ndarray
+    worst_price_in_ticks: np.ndarray
+
+
+class DepthCurve:
+    """
+    Cumulative base lots and tick-weighted base lots over the price levels of
+    one side of the book, best first. Pricing a batch of order sizes is one
+    binary search per size.
+
+    Tick-weighted lots can exceed 64 bits, so they are kept as Python ints in
+    object arrays and quote lots are rounded with integer division, exactly as
+    the program does.
+    """
+
+    def __init__(self, level_prices: np.ndarray, level_sizes: np.ndarray):
+        self.level_prices = level_prices.astype(np.uint64)
+        self.cumulative_base_lots = np.cumsum(level_sizes, dtype=np.uint64)
+        self.cumulative_tick_lots = np.cumsum(
+            self.level_prices.astype(object) * level_sizes.astype(object)
+        )
+
+    def get_price_impact(
+        self,
+        num_base_lots,
+        is_bid: bool,
+        base_lots_per_base_unit: int,
+        quote_lots_per_base_unit_per_tick: int,
+        taker_fee_bps: int,
+    ) -> PriceImpact:
+        num_base_lots = np.asarray(num_base_lots, dtype=np.uint64)
+        num_levels = len(self.level_prices)
+        total_base_lots = (
+            self.cumulative_base_lots[-1] if num_levels > 0 else np.uint64(0)
+        )
+        filled = np.minimum(num_base_lots, total_base_lots)
+
+        # Index of the level that the last filled lot is taken from
+        level = np.searchsorted(self.cumulative_base_lots, filled, "left")
+        level = np.minimum(level, max(num_levels - 1, 0))
+        if num_levels == 0:
+            tick_lots = np.zeros(filled.shape, dtype=object)
+            worst_price_in_ticks = np.zeros(filled.shape, dtype=np.uint64)
+        else:
+            previous_level = level - 1
+            base_lots_before = np.where(
+                level > 0, self.cumulative_base_lots[previous_level], 0
+            ).astype(np.uint64)
+            tick_lots_before = np.where(
+                level > 0, self.cumulative_tick_lots[previous_level], 0
+            )
+            worst_price_in_ticks = self.level_prices[level]
+            tick_lots = tick_lots_before + (filled - base_lots_before).astype(
+                object
+            ) * worst_price_in_ticks.astype(object)
+
+        nothing_filled = filled == 0
+        adjusted_quote_lots = tick_lots * quote_lots_per_base_unit_per_tick
+        if is_bid:
+            num_quote_lots_filled = -(-adjusted_quote_lots // base_lots_per_base_unit)
+        else:
+            num_quote_lots_filled = adjusted_quote_lots // base_lots_per_base_unit
+        num_quote_lot_fees = -(-num_quote_lots_filled * taker_fee_bps // 10_000)
+
+        # True division of Python ints rounds the average price once
+        average_price_in_ticks = (
+            tick_lots / np.where(nothing_filled, 1, filled).astype(object)
+        ).astype(np.float64)
+        return PriceImpact(
+            num_base_lots_filled=filled,
+            num_quote_lots_filled=num_quote_lots_filled.astype(np.uint64),
+            num_quote_lot_fees=num_quote_lot_fees.astype(np.uint64),
+            average_price_in_ticks=np.where(
+                nothing_filled, np.nan, average_price_in_ticks
+            ),
+            worst_price_in_ticks=np.where(
+                nothing_filled, np.nan, worst_price_in_ticks.astype(np.float64)
+            ),
+        )
+
+
+class TraderArrays:
+    """
+    Columnar view of the trader tree in node order. `trader_index` holds the
+    node address, which is the index resting orders refer to.
+    """
+
+    def __init__(self, nodes: np.ndarray, node_addresses: np.ndarray):
+        self.nodes = nodes
+        self.node_addresses = node_addresses
+
+    @classmethod
+    def from_tree(cls, data) -> "TraderArrays":
+        nodes, addresses = map_tree_nodes(data, TRADER_NODE_DTYPE)
+        return cls(nodes[addresses - 1], addresses)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def trader_index(self) -> np.ndarray:
+        return self.node_addresses
+
+    @property
+    def quote_lots_locked(self) -> np.ndarray:
+        return self.nodes["quote_lots_locked"]
+
+    @property
+    def quote_lots_free(self) -> np.ndarray:
+        return self.nodes["quote_lots_free"]
+
+    @property
+    def base_lots_locked(self) -> np.ndarray:
+        return self.nodes["base_lots_locked"]
+
+    @property
+    def base_lots_free(self) -> np.ndarray:
+        return self.nodes["base_lots_free"]
+
+    def pubkeys(self) -> List[Pubkey]:
+        return [Pubkey(key.tobytes()) for key in self.nodes["trader"]]
+
+    def to_traders(self) -> Dict[Pubkey, TraderState]:
+        return {
+            pubkey: TraderState(
+                quote_lots_locked,
+                quote_lots_free,
+                base_lots_locked,
+                base_lots_free,
+                padding,
+            )
+            for (
+                pubkey,
+                quote_lots_locked,
+                quote_lots_free,
+                base_lots_locked,
+                base_lots_free,
+                padding,
+            ) in zip(
+                self.pubkeys(),
+                self.quote_lots_locked.tolist(),
+                self.quote_lots_free.tolist(),
+                self.base_lots_locked.tolist(),
+                self.base_lots_free.tolist(),
+                self.nodes["padding"].tolist(),
+            )
+        }
+
+    def to_trader_index_maps(self) -> Tuple[Dict[Pubkey, int], Dict[int, Pubkey]]:
+        trader_pubkey_to_trader_index = {}
+        trader_index_to_trader_pubkey = {}
+        for pubkey, index in zip(self.pubkeys(), self.node_addresses.tolist()):
+            trader_pubkey_to_trader_index[pubkey] = index
+            trader_index_to_trader_pubkey[index] = pubkey
+        return trader_pubkey_to_trader_index, trader_index_to_trader_pubkey
@@ -1,17 +1,64 @@
 from typing import Union
 from phoenix.instructions import swap
+from phoenix.instructions.cancel_up_to import (
+    CancelUpToAccounts,
+    CancelUpToArgs,
+    cancel_up_to,
+)
+from phoenix.instructions.cancel_up_to import layout as cancel_up_to_layout
+from phoenix.instructions.cancel_up_to_with_free_funds import (
+    CancelUpToWithFreeFundsAccounts,
+    CancelUpToWithFreeFundsArgs,
+    cancel_up_to_with_free_funds,
+)
+from phoenix.instructions.cancel_up_to_with_free_funds import (
+    layout as cancel_up_to_with_free_funds_layout,
+)
 from phoenix.instructions.place_limit_order import (
     PlaceLimitOrderAccounts,
     PlaceLimitOrderArgs,
     place_limit_order,
 )
+from phoenix.instructions.place_limit_order import layout as place_limit_order_layout
+from phoenix.instructions.place_multiple_post_only_orders import (
+    PlaceMultiplePostOnlyOrdersAccounts,
+    PlaceMultiplePostOnlyOrdersArgs,
+    place_multiple_post_only_orders,
+)
+from phoenix.instructions.place_multiple_post_only_orders import (
+    layout as place_multiple_post_only_orders_layout,
+)
+from phoenix.instructions.place_multiple_post_only_orders_with_free_funds import (
+    PlaceMultiplePostOnlyOrdersWithFreeFundsAccounts,
+    PlaceMultiplePostOnlyOrdersWithFreeFundsArgs,
+    place_multiple_post_only_orders_with_free_funds,
+)
+from phoenix.instructions.place_multiple_post_only_orders_with_free_funds import (
+    layout as place_multiple_post_only_orders_with_free_funds_layout,
+)
 from phoenix.instructions.swap import SwapAccounts, SwapArgs
+from phoenix.instructions.swap import layout as swap_layout
+from phoenix.instructions.template import (
+    InstructionTemplate,
+    InstructionTemplateCache,
+)
 from phoenix.program_id import PROGRAM_ID
+from phoenix.types.cancel_up_to_params import CancelUpToParams
 from phoenix.types.market_status import PostOnly
+from phoenix.types.multiple_order_packet import MultipleOrderPacket
 from phoenix.types.order_packet import ImmediateOrCancel, Limit
 from .types.market_header import MarketHeader
 from solders.pubkey import Pubkey
-from spl.token.instructions import get_associated_token_address
+from .codec import (
+    encode_cancel_up_to_params,
+    encode_multiple_order_packet,
+    encode_order_packet,
+)
+from .addresses import (
+    LOG_AUTHORITY,
+    get_seat_address,
+    get_token_account_address,
+)
 from solana.transaction import Instruction
 
 
@@ -45,6 +92,8 @@ class MarketMetadata:
             self.base_atoms_per_raw_base_unit * self.raw_base_units_per_base_unit
         ) // self.base_atoms_per_base_lot
         self.market_size_params = header.market_size_params
+        # Instruction templates by (instruction name, trader)
+        self.templates = InstructionTemplateCache()
 
     def raw_base_units_to_base_lots_rounded_down(self, raw_base_units):
         base_units = raw_base_units / self.raw_base_units_per_base_unit
@@ -146,45 +195,48 @@ class MarketMetadata:
     def create_place_limit_order_instruction(
         self, limit_order_packet: Union[Limit, PostOnly], trader_pubkey: Pubkey
     ) -> Instruction:
-        # TODO: Refactor these into a separate helper function
-        log_account = Pubkey.find_program_address([b"log"], PROGRAM_ID)[0]
-        seat = Pubkey.find_program_address(
-            [
-                b"seat",
-                bytes(self.address),
-                bytes(trader_pubkey),
-            ],
-            PROGRAM_ID,
-        )[0]
-        base_account = get_associated_token_address(trader_pubkey, self.base_mint)
-        quote_account = get_associated_token_address(trader_pubkey, self.quote_mint)
+        template = self.templates.get(("place_limit_order", trader_pubkey))
+        if template is not None:
+            return template.build_from_encoded_args(
+                encode_order_packet(limit_order_packet)
+            )
+
+        base_account = get_token_account_address(trader_pubkey, self.base_mint)
+        quote_account = get_token_account_address(trader_pubkey, self.quote_mint)
         accounts = PlaceLimitOrderAccounts(
             phoenix_program=PROGRAM_ID,
-            log_authority=log_account,
+            log_authority=LOG_AUTHORITY,
             market=self.address,
             trader=trader_pubkey,
-            seat=seat,
+            seat=get_seat_address(self.address, trader_pubkey),
             base_account=base_account,
             quote_account=quote_account,
             base_vault=self.base_vault,
             quote_vault=self.quote_vault,
         )
-        place_limit_order_args = PlaceLimitOrderArgs(order_packet=limit_order_packet)
-
-        return place_limit_order(
-            place_limit_order_args,
+        instruction = place_limit_order(
+            PlaceLimitOrderArgs(order_packet=limit_order_packet),
             accounts,
         )
+        self.templates[("place_limit_order", trader_pubkey)] = (
+            InstructionTemplate.from_instruction(instruction, place_limit_order_layout)
+        )
+        return instruction
 
     def create_swap_instruction(
         self, ioc_order_packet: ImmediateOrCancel, trader_pubkey: Pubkey
     ) -> Instruction:
-        log_account = Pubkey.find_program_address([b"log"], PROGRAM_ID)[0]
-        base_account = get_associated_token_address(trader_pubkey, self.base_mint)
-        quote_account = get_associated_token_address(trader_pubkey, self.quote_mint)
+        template = self.templates.get(("swap", trader_pubkey))
+        if template is not None:
+            return template.build_from_encoded_args(
+                encode_order_packet(ioc_order_packet)
+            )
+
+        base_account = get_token_account_address(trader_pubkey, self.base_mint)
+        quote_account = get_token_account_address(trader_pubkey, self.quote_mint)
         accounts = SwapAccounts(
             phoenix_program=PROGRAM_ID,
-            log_authority=log_account,
+            log_authority=LOG_AUTHORITY,
             market=self.address,
             trader=trader_pubkey,
             base_account=base_account,
@@ -192,8 +244,108 @@ class MarketMetadata:
             base_vault=self.base_vault,
             quote_vault=self.quote_vault,
         )
-        swap_args = SwapArgs(order_packet=ioc_order_packet)
-        return swap(
-            swap_args,
+        instruction = swap(
+            SwapArgs(order_packet=ioc_order_packet),
             accounts,
         )
+        self.templates[("swap", trader_pubkey)] = InstructionTemplate.from_instruction(
+            instruction, swap_layout
+        )
+        return instruction
+
+    def create_place_multiple_post_only_orders_instruction(
+        self,
+        multiple_order_packet: MultipleOrderPacket,
+        trader_pubkey: Pubkey,
+        use_only_deposited_funds: bool = False,
+    ) -> Instruction:
+        name = (
+            "place_multiple_post_only_orders_with_free_funds"
+            if use_only_deposited_funds
+            else "place_multiple_post_only_orders"
+        )
+        template = self.templates.get((name, trader_pubkey))
+        if template is not None:
+            return template.build_from_encoded_args(
+                encode_multiple_order_packet(multiple_order_packet)
+            )
+
+        seat = get_seat_address(self.address, trader_pubkey)
+        if use_only_deposited_funds:
+            accounts = PlaceMultiplePostOnlyOrdersWithFreeFundsAccounts(
+                phoenix_program=PROGRAM_ID,
+                log_authority=LOG_AUTHORITY,
+                market=self.address,
+                trader=trader_pubkey,
+                seat=seat,
+            )
+            instruction = place_multiple_post_only_orders_with_free_funds(
+                PlaceMultiplePostOnlyOrdersWithFreeFundsArgs(
+                    multiple_order_packet=multiple_order_packet
+                ),
+                accounts,
+            )
+            layout = place_multiple_post_only_orders_with_free_funds_layout
+        else:
+            accounts = PlaceMultiplePostOnlyOrdersAccounts(
+                phoenix_program=PROGRAM_ID,
+                log_authority=LOG_AUTHORITY,
+                market=self.address,
+                trader=trader_pubkey,
+                seat=seat,
+                base_account=get_token_account_address(trader_pubkey, self.base_mint),
+                quote_account=get_token_account_address(trader_pubkey, self.quote_mint),
+                base_vault=self.base_vault,
+                quote_vault=self.quote_vault,
+            )
+            instruction = place_multiple_post_only_orders(
+                PlaceMultiplePostOnlyOrdersArgs(
+                    multiple_order_packet=multiple_order_packet
+                ),
+                accounts,
+            )
+            layout = place_multiple_post_only_orders_layout
+        self.templates[(name, trader_pubkey)] = InstructionTemplate.from_instruction(
+            instruction, layout
+        )
+        return instruction
+
+    def create_cancel_up_to_instruction(
+        self,
+        params: CancelUpToParams,
+        trader_pubkey: Pubkey,
+        withdraw_funds: bool = True,
+    ) -> Instruction:
+        name = "cancel_up_to" if withdraw_funds else "cancel_up_to_with_free_funds"
+        template = self.templates.get((name, trader_pubkey))
+        if template is not None:
+            return template.build_from_encoded_args(encode_cancel_up_to_params(params))
+
+        if withdraw_funds:
+            accounts = CancelUpToAccounts(
+                phoenix_program=PROGRAM_ID,
+                log_authority=LOG_AUTHORITY,
+                market=self.address,
+                trader=trader_pubkey,
+                base_account=get_token_account_address(trader_pubkey, self.base_mint),
+                quote_account=get_token_account_address(trader_pubkey, self.quote_mint),
+                base_vault=self.base_vault,
+                quote_vault=self.quote_vault,
+            )
+            instruction = cancel_up_to(CancelUpToArgs(params=params), accounts)
+            layout = cancel_up_to_layout
+        else:
+            accounts = CancelUpToWithFreeFundsAccounts(
+                phoenix_program=PROGRAM_ID,
+                log_authority=LOG_AUTHORITY,
+                market=self.address,
+                trader=trader_pubkey,
+            )
+            instruction = cancel_up_to_with_free_funds(
+                CancelUpToWithFreeFundsArgs(params=params), accounts
+            )
+            layout = cancel_up_to_with_free_funds_layout
+        self.templates[(name, trader_pubkey)] = InstructionTemplate.from_instruction(
+            instruction, layout
+        )
+        return instruction
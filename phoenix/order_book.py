@@ -0,0 +1,167 @@
+from bisect import bisect_left
+from dataclasses import fields
+from typing import Dict, List, Tuple
+
+from solders.pubkey import Pubkey
+
+from .events import PhoenixEventsFromInstruction
+from .market import Market
+from .types.fifo_order_id import FIFOOrderId
+from .types.fifo_resting_order import FIFORestingOrder
+
+
+def is_bid_sequence_number(order_sequence_number: int) -> bool:
+    # Bid sequence numbers are stored bitwise inverted, setting the top bit
+    return order_sequence_number >> 63 == 1
+
+
+class OrderBook:
+    """
+    Order book of a single market that starts from a Market snapshot and is
+    kept up to date by applying the events logged by each market instruction.
+
+    `sequence_number` is the sequence number of the next instruction batch to
+    apply, which for a fresh snapshot is the market's sequence number.
+    """
+
+    def __init__(self, market: Market):
+        self.market = market
+        self.address: Pubkey = market.address
+        self.sequence_number: int = market.sequence_number
+        self.orders: Dict[int, Tuple[FIFOOrderId, FIFORestingOrder]] = {}
+        # Parallel lists kept in price-time priority (best order first). The
+        # snapshot's sides are already in that order.
+        self.bids: List[Tuple[FIFOOrderId, FIFORestingOrder]] = list(market.bids)
+        self.asks: List[Tuple[FIFOOrderId, FIFORestingOrder]] = list(market.asks)
+        self._bid_keys: List[Tuple[int, int]] = [
+            (-order_id.price_in_ticks, -order_id.order_sequence_number)
+            for order_id, _ in self.bids
+        ]
+        self._ask_keys: List[Tuple[int, int]] = [
+            (order_id.price_in_ticks, order_id.order_sequence_number)
+            for order_id, _ in self.asks
+        ]
+        for order in self.bids:
+            self.orders[order[0].order_sequence_number] = order
+        for order in self.asks:
+            self.orders[order[0].order_sequence_number] = order
+
+    def apply(self, events: PhoenixEventsFromInstruction) -> bool:
+        """
+        Applies the events of one instruction. Returns False when the batch is
+        for another market or has already been applied, and raises if batches
+        were skipped since the last one applied.
+        """
+        header = events.header
+        if header.market != self.address:
+            return False
+        if header.sequence_number < self.sequence_number:
+            return False
+        if header.sequence_number > self.sequence_number:
+            raise ValueError(
+                f"Sequence number gap: expected {self.sequence_number}, got {header.sequence_number}"
+            )
+
+        for event in events.events:
+            kind = event.kind
+            if kind == "Place":
+                self._place(event.value[0], header.signer)
+            elif kind == "TimeInForce":
+                event = event.value[0]
+                order = self.orders.get(event.order_sequence_number)
+                if order is not None:
+                    order_id, resting_order = order
+                    self._replace(
+                        order_id,
+                        FIFORestingOrder(
+                            resting_order.trader_index,
+                            resting_order.num_base_lots,
+                            event.last_valid_slot,
+                            event.last_valid_unix_timestamp_in_seconds,
+                        ),
+                    )
+            elif kind == "Fill" or kind == "Reduce":
+                event = event.value[0]
+                self._reduce(event.order_sequence_number, event.base_lots_remaining)
+            elif kind == "Evict" or kind == "ExpiredOrder":
+                self._reduce(event.value[0].order_sequence_number, 0)
+        self.sequence_number = header.sequence_number + 1
+        return True
+
+    def to_market(self) -> Market:
+        """
+        Returns a Market with the current bids and asks. Trader states and the
+        remaining market fields are those of the snapshot the book started from.
+        """
+        market_fields = {
+            field.name: getattr(self.market, field.name) for field in fields(Market)
+        }
+        market_fields.update(
+            sequence_number=self.sequence_number,
+            bids=list(self.bids),
+            asks=list(self.asks),
+        )
+        return Market(**market_fields)
+
+    def _place(self, event, trader: Pubkey):
+        # Orders placed by traders that were not seated in the snapshot are
+        # recorded with a trader index of 0
+        self._insert(
+            (
+                FIFOOrderId(event.price_in_ticks, event.order_sequence_number),
+                FIFORestingOrder(
+                    self.market.trader_pubkey_to_trader_index.get(trader, 0),
+                    event.base_lots_placed,
+                    0,
+                    0,
+                ),
+            )
+        )
+
+    def _reduce(self, order_sequence_number: int, base_lots_remaining: int):
+        order = self.orders.get(order_sequence_number)
+        if order is None:
+            return
+        order_id, resting_order = order
+        if base_lots_remaining == 0:
+            self._remove(order_id)
+        else:
+            self._replace(
+                order_id,
+                FIFORestingOrder(
+                    resting_order.trader_index,
+                    base_lots_remaining,
+                    resting_order.last_valid_slot,
+                    resting_order.last_valid_unix_timestamp_in_seconds,
+                ),
+            )
+
+    def _side(self, order_id: FIFOOrderId) -> Tuple[
+        List[Tuple[int, int]],
+        List[Tuple[FIFOOrderId, FIFORestingOrder]],
+        Tuple[int, int],
+    ]:
+        if is_bid_sequence_number(order_id.order_sequence_number):
+            key = (-order_id.price_in_ticks, -order_id.order_sequence_number)
+            return self._bid_keys, self.bids, key
+        key = (order_id.price_in_ticks, order_id.order_sequence_number)
+        return self._ask_keys, self.asks, key
+
+    def _insert(self, order: Tuple[FIFOOrderId, FIFORestingOrder]):
+        keys, orders, key = self._side(order[0])
+        index = bisect_left(keys, key)
+        keys.insert(index, key)
+        orders.insert(index, order)
+        self.orders[order[0].order_sequence_number] = order
+
+    def _replace(self, order_id: FIFOOrderId, resting_order: FIFORestingOrder):
+        keys, orders, key = self._side(order_id)
+        orders[bisect_left(keys, key)] = (order_id, resting_order)
+        self.orders[order_id.order_sequence_number] = (order_id, resting_order)
+
+    def _remove(self, order_id: FIFOOrderId):
+        keys, orders, key = self._side(order_id)
+        index = bisect_left(keys, key)
+        del keys[index]
+        del orders[index]
+        del self.orders[order_id.order_sequence_number]
@@ -0,0 +1,100 @@
+from typing import Awaitable, Callable, Dict, Optional
+
+from solders.pubkey import Pubkey
+
+from .events import PhoenixEventsFromInstruction
+from .market import Market
+from .order_book import OrderBook
+
+
+class MarketSequencer:
+    """
+    Applies the instruction event batches of one market to an OrderBook in
+    AuditLogHeader.sequence_number order.
+
+    Batches that arrive ahead of the next expected sequence number are
+    buffered until the missing ones arrive. If more than `max_pending`
+    batches are buffered behind a gap, or a batch arrives more than
+    `max_gap_slots` slots after the oldest buffered one, the gap is treated as
+    lost: a fresh snapshot is fetched and the buffered batches newer than it
+    are replayed.
+    The first batch also triggers a snapshot fetch, so subscribing before
+    fetching cannot miss events.
+    """
+
+    def __init__(
+        self,
+        market_pubkey: Pubkey,
+        fetch_snapshot: Callable[[], Awaitable[Market]],
+        max_pending: int = 32,
+        max_gap_slots: int = 150,
+    ):
+        self.market_pubkey = market_pubkey
+        self.fetch_snapshot = fetch_snapshot
+        self.max_pending = max_pending
+        self.max_gap_slots = max_gap_slots
+        self.book: Optional[OrderBook] = None
+        self.pending: Dict[int, PhoenixEventsFromInstruction] = {}
+        self.resync_count = 0
+
+    @property
+    def expected_sequence_number(self) -> Optional[int]:
+        if self.book is None:
+            return None
+        return self.book.sequence_number
+
+    @property
+    def has_gap(self) -> bool:
+        return len(self.pending) > 0
+
+    @property
+    def gap_start_slot(self) -> Optional[int]:
+        """Slot of the oldest batch buffered behind the gap"""
+        if not self.pending:
+            return None
+        return min(events.header.slot for events in self.pending.values())
+
+    async def push(self, events: PhoenixEventsFromInstruction) -> int:
+        """
+        Buffers a batch and applies every batch that is now in sequence,
+        resyncing if needed. Returns the number of batches applied.
+        """
+        header = events.header
+        if header.market != self.market_pubkey:
+            return 0
+        if self.book is not None and header.sequence_number < self.book.sequence_number:
+            # Already applied, e.g. a duplicate from a redundant subscription
+            return 0
+        self.pending[header.sequence_number] = events
+        if self.book is None:
+            return await self.resync()
+
+        applied = self._drain()
+        if self.pending and (
+            len(self.pending) > self.max_pending
+            or header.slot - self.gap_start_slot > self.max_gap_slots
+        ):
+            applied += await self.resync()
+        return applied
+
+    async def resync(self) -> int:
+        """
+        Replaces the book with a fresh snapshot, unless the snapshot is older
+        than the book, and replays the buffered batches that follow it.
+        Returns the number of batches replayed.
+        """
+        market = await self.fetch_snapshot()
+        self.resync_count += 1
+        if self.book is None or market.sequence_number >= self.book.sequence_number:
+            self.book = OrderBook(market)
+        for sequence_number in list(self.pending):
+            if sequence_number < self.book.sequence_number:
+                del self.pending[sequence_number]
+        return self._drain()
+
+    def _drain(self) -> int:
+        applied = 0
+        while self.book.sequence_number in self.pending:
+            self.book.apply(self.pending.pop(self.book.sequence_number))
+            applied += 1
+        return applied
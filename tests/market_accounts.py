@@ -0,0 +1,327 @@
+"""
+Builds synthetic market accounts with the serialized layout of the program,
+for tests that decode raw account data.
+"""
+
+import random
+import struct
+from typing import Callable, Dict, List, Tuple
+
+from solders.pubkey import Pubkey
+
+from phoenix.market import Market
+from phoenix.types.fifo_order_id import FIFOOrderId
+from phoenix.types.fifo_resting_order import FIFORestingOrder
+from phoenix.types.market_header import MarketHeader
+from phoenix.types.market_size_params import MarketSizeParams
+from phoenix.types.token_params import TokenParams
+from phoenix.types.trader_state import TraderState
+
+ORDER_NODE_SIZE = 16 + 16 + 32
+TRADER_NODE_SIZE = 16 + 32 + 96
+U64_MASK = 2**64 - 1
+
+
+class TreeBuilder:
+    """
+    Serialized red-black tree whose nodes are allocated like the program's
+    node allocator: freed nodes are zeroed and pushed onto the front of the
+    free list, and new nodes are popped from the free list before the bump
+    index grows.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        node_size: int,
+        pack_entry: Callable[[object, object], bytes],
+        sort_key: Callable[[object], object],
+    ):
+        self.capacity = capacity
+        self.node_size = node_size
+        self.pack_entry = pack_entry
+        self.sort_key = sort_key
+        # (key, value) by 1-based node address
+        self.entries: Dict[int, Tuple[object, object]] = {}
+        self.next_free: Dict[int, int] = {}
+        self.bump_index = 1
+        self.free_list_head = 1
+
+    def insert(self, key, value) -> int:
+        address = self.free_list_head
+        if address == self.bump_index:
+            if address > self.capacity:
+                raise ValueError("Tree is full")
+            self.bump_index += 1
+            self.free_list_head = self.bump_index
+        else:
+            self.free_list_head = self.next_free.pop(address)
+        self.entries[address] = (key, value)
+        return address
+
+    def remove(self, address: int):
+        del self.entries[address]
+        self.next_free[address] = self.free_list_head
+        self.free_list_head = address
+
+    def free_list(self) -> List[int]:
+        addresses = []
+        address = self.free_list_head
+        while address != self.bump_index:
+            addresses.append(address)
+            address = self.next_free[address]
+        return addresses
+
+    def items(self) -> List[Tuple[object, object]]:
+        """Entries in key order"""
+        return sorted(self.entries.values(), key=self.sort_key)
+
+    def build(self) -> bytes:
+        # Nodes are linked into a search tree in address order, which keeps
+        # the root in place while nodes with higher addresses change
+        registers = {address: [0, 0, 0, 0] for address in self.entries}
+        root = 0
+        for address in sorted(self.entries):
+            key = self.sort_key(self.entries[address])
+            if root == 0:
+                root = address
+                continue
+            node = root
+            while True:
+                child = 0 if key < self.sort_key(self.entries[node]) else 1
+                if registers[node][child] == 0:
+                    registers[node][child] = address
+                    registers[address][2] = node
+                    break
+                node = registers[node][child]
+
+        data = bytearray(32 + self.node_size * self.capacity)
+        struct.pack_into("<I", data, 0, root)
+        struct.pack_into(
+            "<QII", data, 16, self.capacity, self.bump_index, self.free_list_head
+        )
+        for address, (key, value) in self.entries.items():
+            offset = 32 + (address - 1) * self.node_size
+            struct.pack_into("<4I", data, offset, *registers[address])
+            data[offset + 16 : offset + self.node_size] = self.pack_entry(key, value)
+        for address, next_free in self.next_free.items():
+            struct.pack_into("<I", data, 32 + (address - 1) * self.node_size, next_free)
+        return bytes(data)
+
+
+def pack_order(order_id: FIFOOrderId, order: FIFORestingOrder) -> bytes:
+    return struct.pack(
+        "<6Q",
+        order_id.price_in_ticks,
+        order_id.order_sequence_number,
+        order.trader_index,
+        order.num_base_lots,
+        order.last_valid_slot,
+        order.last_valid_unix_timestamp_in_seconds,
+    )
+
+
+def pack_trader(trader: Pubkey, trader_state: TraderState) -> bytes:
+    return bytes(trader) + struct.pack(
+        "<12Q",
+        trader_state.quote_lots_locked,
+        trader_state.quote_lots_free,
+        trader_state.base_lots_locked,
+        trader_state.base_lots_free,
+        *trader_state.padding,
+    )
+
+
+def bid_sort_key(entry) -> Tuple[int, int]:
+    # Bid sequence numbers are stored inverted, so the earliest bid at a
+    # price has the largest stored sequence number
+    order_id, _ = entry
+    return (-order_id.price_in_ticks, -order_id.order_sequence_number)
+
+
+def ask_sort_key(entry) -> Tuple[int, int]:
+    order_id, _ = entry
+    return (order_id.price_in_ticks, order_id.order_sequence_number)
+
+
+class MarketAccountBuilder:
+    """
+    Synthetic market account. Orders and seats are added and removed through
+    the tree allocators, and `build` serializes the current state.
+    """
+
+    def __init__(
+        self,
+        bids_size: int = 64,
+        asks_size: int = 64,
+        num_seats: int = 32,
+        base_lots_per_base_unit: int = 1_000,
+        quote_lots_per_base_unit_per_tick: int = 10,
+        taker_fee_bps: int = 5,
+    ):
+        self.header = MarketHeader(
+            discriminant=1,
+            status=1,
+            market_size_params=MarketSizeParams(
+                bids_size=bids_size, asks_size=asks_size, num_seats=num_seats
+            ),
+            base_params=TokenParams(
+                decimals=9,
+                vault_bump=1,
+                mint_key=Pubkey.new_unique(),
+                vault_key=Pubkey.new_unique(),
+            ),
+            base_lot_size=1_000_000,
+            quote_params=TokenParams(
+                decimals=6,
+                vault_bump=1,
+                mint_key=Pubkey.new_unique(),
+                vault_key=Pubkey.new_unique(),
+            ),
+            quote_lot_size=1,
+            tick_size_in_quote_atoms_per_base_unit=1_000,
+            authority=Pubkey.new_unique(),
+            fee_recipient=Pubkey.new_unique(),
+            market_sequence_number=0,
+            successor=Pubkey.default(),
+            raw_base_units_per_base_unit=1,
+            padding1=0,
+            padding2=[0] * 32,
+        )
+        self.base_lots_per_base_unit = base_lots_per_base_unit
+        self.quote_lots_per_base_unit_per_tick = quote_lots_per_base_unit_per_tick
+        self.taker_fee_bps = taker_fee_bps
+        self.order_sequence_number = 0
+        self.bids = TreeBuilder(bids_size, ORDER_NODE_SIZE, pack_order, bid_sort_key)
+        self.asks = TreeBuilder(asks_size, ORDER_NODE_SIZE, pack_order, ask_sort_key)
+        self.traders = TreeBuilder(
+            num_seats, TRADER_NODE_SIZE, pack_trader, lambda entry: bytes(entry[0])
+        )
+
+    def add_trader(self, trader: Pubkey, trader_state: TraderState = None) -> int:
+        """Adds a seat and returns the trader index"""
+        if trader_state is None:
+            trader_state = TraderState(0, 0, 0, 0, [0] * 8)
+        return self.traders.insert(trader, trader_state)
+
+    def add_order(
+        self,
+        is_bid: bool,
+        price_in_ticks: int,
+        trader_index: int,
+        num_base_lots: int,
+        last_valid_slot: int = 0,
+        last_valid_unix_timestamp_in_seconds: int = 0,
+    ) -> int:
+        """Adds a resting order and returns its node address"""
+        self.order_sequence_number += 1
+        sequence_number = self.order_sequence_number
+        if is_bid:
+            sequence_number = ~sequence_number & U64_MASK
+        order_id = FIFOOrderId(price_in_ticks, sequence_number)
+        order = FIFORestingOrder(
+            trader_index,
+            num_base_lots,
+            last_valid_slot,
+            last_valid_unix_timestamp_in_seconds,
+        )
+        return (self.bids if is_bid else self.asks).insert(order_id, order)
+
+    def build(self) -> bytes:
+        self.header.market_sequence_number += 1
+        market_fields = struct.pack(
+            "<6Q",
+            self.base_lots_per_base_unit,
+            self.quote_lots_per_base_unit_per_tick,
+            self.order_sequence_number,
+            self.taker_fee_bps,
+            0,
+            0,
+        )
+        return (
+            MarketHeader.layout.build(self.header.to_encodable())
+            + bytes(8 * 32)
+            + market_fields
+            + self.bids.build()
+            + self.asks.build()
+            + self.traders.build()
+        )
+
+
+def make_market_account(
+    rng: random.Random,
+    num_bids: int = 40,
+    num_asks: int = 40,
+    num_traders: int = 12,
+    num_removed: int = 10,
+    **kwargs,
+) -> MarketAccountBuilder:
+    """
+    Random book around a mid price of 1000 ticks. Some orders expire at a
+    slot or timestamp, and some orders and seats are removed so that the free
+    lists are interleaved with live nodes.
+    """
+    market = MarketAccountBuilder(**kwargs)
+    trader_indices = [
+        market.add_trader(
+            Pubkey.new_unique(),
+            TraderState(*(rng.randrange(10**6) for _ in range(4)), [0] * 8),
+        )
+        for _ in range(num_traders + num_removed)
+    ]
+    for trader_index in rng.sample(trader_indices, num_removed):
+        market.traders.remove(trader_index)
+        trader_indices.remove(trader_index)
+    for is_bid, num_orders in [(True, num_bids), (False, num_asks)]:
+        tree = market.bids if is_bid else market.asks
+        addresses = [
+            add_random_order(rng, market, is_bid, trader_indices)
+            for _ in range(num_orders + num_removed)
+        ]
+        for address in rng.sample(addresses, num_removed):
+            tree.remove(address)
+    return market
+
+
+def add_random_order(
+    rng: random.Random,
+    market: MarketAccountBuilder,
+    is_bid: bool,
+    trader_indices: List[int],
+) -> int:
+    price_in_ticks = rng.randint(980, 999) if is_bid else rng.randint(1001, 1020)
+    last_valid_slot = 0
+    last_valid_unix_timestamp_in_seconds = 0
+    if rng.random() < 0.2:
+        last_valid_slot = rng.randint(100, 200)
+    if rng.random() < 0.2:
+        last_valid_unix_timestamp_in_seconds = rng.randint(1_000, 2_000)
+    return market.add_order(
+        is_bid,
+        price_in_ticks,
+        rng.choice(trader_indices),
+        rng.randint(1, 1_000),
+        last_valid_slot,
+        last_valid_unix_timestamp_in_seconds,
+    )
+
+
+def get_market_state(market: Market) -> dict:
+    """Decoded fields of a market that can be compared across decoders"""
+    return {
+        "address": market.address,
+        "sequence_number": market.sequence_number,
+        "base_lots_per_base_unit": market.base_lots_per_base_unit,
+        "quote_lots_per_base_unit_per_tick": market.quote_lots_per_base_unit_per_tick,
+        "order_sequence_number": market.order_sequence_number,
+        "taker_fee_bps": market.taker_fee_bps,
+        "collected_quote_lot_fees": market.collected_quote_lot_fees,
+        "unclaimed_quote_lot_fees": market.unclaimed_quote_lot_fees,
+        "base_mint": market.metadata.base_mint,
+        "quote_mint": market.metadata.quote_mint,
+        "bids": list(market.bids),
+        "asks": list(market.asks),
+        "traders": dict(market.traders),
+        "trader_pubkey_to_trader_index": dict(market.trader_pubkey_to_trader_index),
+        "trader_index_to_trader_pubkey": dict(market.trader_index_to_trader_pubkey),
+    }
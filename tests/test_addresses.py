@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from solders.pubkey import Pubkey
+from spl.token.instructions import get_associated_token_address
+
+from phoenix.addresses import (
+    get_seat_address,
+    get_token_account_address,
+    prewarm_addresses,
+)
+from phoenix.program_id import PROGRAM_ID
+
+
+def derive_seat_address(market: Pubkey, trader: Pubkey) -> Pubkey:
+    return Pubkey.find_program_address(
+        [b"seat", bytes(market), bytes(trader)], PROGRAM_ID
+    )[0]
+
+
+def test_cached_addresses_match_derivations():
+    get_seat_address.cache_clear()
+    get_token_account_address.cache_clear()
+    traders = [Pubkey.new_unique() for _ in range(3)]
+    markets = [
+        SimpleNamespace(
+            address=Pubkey.new_unique(),
+            base_mint=Pubkey.new_unique(),
+            quote_mint=Pubkey.new_unique(),
+        )
+        for _ in range(2)
+    ]
+    prewarm_addresses(traders, markets)
+    assert get_seat_address.cache_info().currsize == len(traders) * len(markets)
+    assert get_token_account_address.cache_info().currsize == (
+        2 * len(traders) * len(markets)
+    )
+
+    seat_addresses = set()
+    for trader in traders:
+        for market in markets:
+            seat_address = get_seat_address(market.address, trader)
+            assert seat_address == derive_seat_address(market.address, trader)
+            seat_addresses.add(seat_address)
+            for mint in [market.base_mint, market.quote_mint]:
+                assert get_token_account_address(
+                    trader, mint
+                ) == get_associated_token_address(trader, mint)
+    # Every (market, trader) pair has its own seat, and the prewarmed
+    # derivations were all served from the caches
+    assert len(seat_addresses) == len(traders) * len(markets)
+    assert get_seat_address.cache_info().misses == len(traders) * len(markets)
+    assert get_token_account_address.cache_info().misses == (
+        2 * len(traders) * len(markets)
+    )
+
+    # Swapping the market and trader derives a different seat
+    market, trader = markets[0].address, traders[0]
+    assert get_seat_address(trader, market) == derive_seat_address(trader, market)
+    assert get_seat_address(trader, market) != get_seat_address(market, trader)
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from solders.pubkey import Pubkey
+
+from phoenix.backfill import Backfill, BackfillCheckpoint
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "backfill")
+MARKET = Pubkey.from_string("4DoNfFBfF7UokCC2FQzriy7yHK6DY6NVdYpuekQ5pRgg")
+
+
+def load_fixture(name: str):
+    with open(os.path.join(FIXTURES, name)) as f:
+        return json.load(f)
+
+
+# Responses of getSignaturesForAddress for the market, newest first, and the
+# getTransaction result of each successful transaction
+SIGNATURES = load_fixture("signatures.json")
+TRANSACTIONS = load_fixture("transactions.json")
+SUCCESSFUL_SIGNATURES = [
+    info["signature"] for info in reversed(SIGNATURES) if info["err"] is None
+]
+
+
+class RpcHandler(BaseHTTPRequestHandler):
+    """
+    Serves the fixture responses. The first getTransaction of the newest
+    transaction is not found yet, and the second request is rate limited.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append(body)
+            num_requests = len(server.requests)
+        if num_requests == 2:
+            self.send_response(429)
+            self.end_headers()
+            return
+
+        method, params = body["method"], body["params"]
+        if method == "getSignaturesForAddress":
+            assert params[0] == str(MARKET)
+            result = self.get_signatures(params[1])
+        elif method == "getTransaction":
+            signature = params[0]
+            with server.lock:
+                found = signature not in server.not_found
+                server.not_found.discard(signature)
+            result = TRANSACTIONS[signature] if found else None
+        else:
+            raise AssertionError(f"Unexpected method {method}")
+
+        data = json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": result})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data.encode())
+
+    def get_signatures(self, config: dict) -> list:
+        signatures = [info["signature"] for info in SIGNATURES]
+        start = 0
+        if "before" in config:
+            start = signatures.index(config["before"]) + 1
+        end = len(signatures)
+        if "until" in config:
+            end = signatures.index(config["until"])
+        return SIGNATURES[start:end][: config["limit"]]
+
+
+@pytest.fixture
+def rpc_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RpcHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.not_found = {SUCCESSFUL_SIGNATURES[-1]}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def get_endpoint(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def collect(backfill: Backfill, limit=None, **kwargs) -> list:
+    async def run():
+        transactions = []
+        async for transaction in backfill.run(**kwargs):
+            transactions.append(transaction)
+            if len(transactions) == limit:
+                break
+        return transactions
+
+    return asyncio.run(run())
+
+
+def test_backfill_returns_successful_transactions_oldest_first(rpc_server):
+    with ThreadPoolExecutor(2) as executor:
+        backfill = Backfill(
+            get_endpoint(rpc_server), MARKET, page_limit=2, executor=executor
+        )
+        transactions = collect(backfill)
+
+    assert [t.signature for t in transactions] == SUCCESSFUL_SIGNATURES
+    assert [t.slot for t in transactions] == [
+        TRANSACTIONS[signature]["slot"] for signature in SUCCESSFUL_SIGNATURES
+    ]
+    assert [t.block_time for t in transactions] == [
+        TRANSACTIONS[signature]["blockTime"] for signature in SUCCESSFUL_SIGNATURES
+    ]
+    for transaction in transactions:
+        [instruction] = transaction.transaction.events_from_instructions
+        assert instruction.header.market == MARKET
+        assert instruction.header.slot == transaction.slot
+        assert instruction.events[-1].kind == "Place"
+    sequence_numbers = [
+        t.transaction.events_from_instructions[0].header.sequence_number
+        for t in transactions
+    ]
+    assert sequence_numbers == list(range(9000, 9000 + len(transactions)))
+
+    # The signatures were paged two at a time
+    pages = [
+        request
+        for request in rpc_server.requests
+        if request["method"] == "getSignaturesForAddress"
+    ]
+    assert len(pages) > len(SIGNATURES) // 2
+
+
+def test_backfill_resumes_after_checkpoint(rpc_server, tmp_path):
+    checkpoint_path = str(tmp_path / "checkpoint.json")
+    with ThreadPoolExecutor(2) as executor:
+        backfill = Backfill(
+            get_endpoint(rpc_server),
+            MARKET,
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=2,
+            executor=executor,
+        )
+        first_run = collect(backfill, limit=3)
+        checkpoint = BackfillCheckpoint.load(checkpoint_path)
+        assert checkpoint.signature == SUCCESSFUL_SIGNATURES[1]
+        assert checkpoint.slot == first_run[1].slot
+
+        # The transaction handed out after the checkpoint is returned again
+        second_run = collect(backfill)
+        assert [t.signature for t in second_run] == SUCCESSFUL_SIGNATURES[2:]
+        assert collect(backfill) == []
+
+
+def test_backfill_stops_at_min_slot(rpc_server):
+    min_slot = TRANSACTIONS[SUCCESSFUL_SIGNATURES[3]]["slot"]
+    with ThreadPoolExecutor(2) as executor:
+        backfill = Backfill(
+            get_endpoint(rpc_server), MARKET, page_limit=2, executor=executor
+        )
+        transactions = collect(backfill, min_slot=min_slot)
+    assert [t.signature for t in transactions] == SUCCESSFUL_SIGNATURES[3:]
@@ -0,0 +1,217 @@
+import itertools
+import random
+
+import pytest
+
+from phoenix.codec import (
+    CODECS,
+    ORDER_PACKET_FIELDS,
+    encode_cancel_up_to_params,
+    encode_multiple_order_packet,
+    encode_order_packet,
+    encode_order_packet_into,
+)
+from phoenix.events import get_phoenix_events_from_log_data
+from phoenix.types import (
+    AuditLogHeader,
+    EvictEvent,
+    ExpiredOrderEvent,
+    FeeEvent,
+    FillEvent,
+    FillSummaryEvent,
+    PlaceEvent,
+    ReduceEvent,
+    TimeInForceEvent,
+)
+from phoenix.types.cancel_up_to_params import CancelUpToParams
+from phoenix.types.condensed_order import CondensedOrder
+from phoenix.types.failed_multiple_limit_order_behavior import (
+    FailOnInsufficientFundsAndAmendOnCross,
+    FailOnInsufficientFundsAndFailOnCross,
+    SkipOnInsufficientFundsAndAmendOnCross,
+    SkipOnInsufficientFundsAndFailOnCross,
+)
+from phoenix.types.multiple_order_packet import MultipleOrderPacket
+from phoenix.types.order_packet import ImmediateOrCancel, Limit, PostOnly
+from phoenix.types.order_packet import layout as order_packet_layout
+from phoenix.types.phoenix_market_event import (
+    Evict,
+    ExpiredOrder,
+    Fee,
+    Fill,
+    FillSummary,
+    Place,
+    Reduce,
+    TimeInForce,
+)
+from phoenix.types.phoenix_market_event import layout as phoenix_market_event_layout
+from phoenix.types.self_trade_behavior import Abort, CancelProvide, DecrementTake
+from phoenix.types.side import Ask, Bid
+
+EVENT_KINDS = [
+    (Fill, FillEvent),
+    (Place, PlaceEvent),
+    (Reduce, ReduceEvent),
+    (Evict, EvictEvent),
+    (FillSummary, FillSummaryEvent),
+    (Fee, FeeEvent),
+    (TimeInForce, TimeInForceEvent),
+    (ExpiredOrder, ExpiredOrderEvent),
+]
+
+rng = random.Random(0)
+
+
+def random_bytes(size: int) -> bytes:
+    return rng.randbytes(size)
+
+
+def borsh_decode(cls, buf: bytes, offset: int):
+    size = cls.layout.sizeof()
+    return cls.from_decoded(cls.layout.parse(buf[offset : offset + size]))
+
+
+@pytest.mark.parametrize("cls", list(CODECS), ids=lambda cls: cls.__name__)
+def test_struct_codec_matches_borsh(cls):
+    codec = CODECS[cls]
+    assert codec.size == cls.layout.sizeof()
+    # Random bytes cover every value range, including the high bit of each field
+    for _ in range(200):
+        offset = rng.randrange(16)
+        buf = random_bytes(offset + codec.size)
+        assert codec.from_buffer(buf, offset) == borsh_decode(cls, buf, offset)
+    for buf in [bytes(codec.size), b"\xff" * codec.size]:
+        assert codec.from_buffer(buf) == borsh_decode(cls, buf, 0)
+
+
+def build_log_data(num_events: int) -> bytes:
+    header = AuditLogHeader.layout.parse(random_bytes(AuditLogHeader.layout.sizeof()))
+    header.total_events = num_events
+    data = bytearray([1]) + AuditLogHeader.layout.build(header)
+    for index in range(num_events):
+        kind, cls = EVENT_KINDS[index % len(EVENT_KINDS)]
+        event = cls.from_decoded(cls.layout.parse(random_bytes(cls.layout.sizeof())))
+        data += phoenix_market_event_layout.build(kind((event,)).to_encodable())
+    return bytes(data)
+
+
+@pytest.mark.parametrize("num_events", [0, 1, 8, 63])
+def test_log_data_decodes_like_borsh(num_events):
+    data = build_log_data(num_events)
+    decoded = get_phoenix_events_from_log_data(data)
+    assert decoded.header == borsh_decode(AuditLogHeader, data, 1)
+    assert len(decoded.events) == num_events
+    offset = 1 + AuditLogHeader.layout.sizeof()
+    for event in decoded.events:
+        parsed = phoenix_market_event_layout.parse(data[offset:])
+        kind = next(iter(parsed.keys()))
+        assert event.kind == kind
+        cls = type(event.value[0])
+        assert event.value[0] == cls.from_decoded(parsed[kind]["item_0"])
+        offset += 1 + cls.layout.sizeof()
+    assert offset == len(data)
+
+
+def make_order_packet(kind, values: dict):
+    """Order packet of `kind` with the given fields and edge values elsewhere"""
+    fields = {}
+    for name, encoding in ORDER_PACKET_FIELDS[kind.kind]:
+        if name in values:
+            fields[name] = values[name]
+        elif name == "side":
+            fields[name] = rng.choice([Bid(), Ask()])
+        elif name == "self_trade_behavior":
+            fields[name] = rng.choice([Abort(), CancelProvide(), DecrementTake()])
+        elif encoding == "bool":
+            fields[name] = rng.random() < 0.5
+        elif encoding == "u128":
+            fields[name] = rng.choice([0, 1, 2**128 - 1, rng.getrandbits(128)])
+        else:
+            fields[name] = rng.choice([0, 1, 2**64 - 1, rng.getrandbits(64)])
+    return kind(fields)
+
+
+@pytest.mark.parametrize(
+    "kind", [PostOnly, Limit, ImmediateOrCancel], ids=lambda kind: kind.kind
+)
+def test_order_packet_encoding_matches_borsh(kind):
+    option_names = [
+        name
+        for name, encoding in ORDER_PACKET_FIELDS[kind.kind]
+        if encoding == "option_u64"
+    ]
+    buf = bytearray(256)
+    # Every combination of None and Some for the Option fields
+    for options in itertools.product([False, True], repeat=len(option_names)):
+        for value in [0, 2**64 - 1, rng.getrandbits(64)]:
+            packet = make_order_packet(
+                kind,
+                {
+                    name: value if present else None
+                    for name, present in zip(option_names, options)
+                },
+            )
+            expected = order_packet_layout.build(packet.to_encodable())
+            assert encode_order_packet(packet) == expected
+            offset = rng.randrange(64)
+            size = encode_order_packet_into(buf, offset, packet)
+            assert bytes(buf[offset : offset + size]) == expected
+
+
+def test_order_packet_encoding_rejects_large_client_order_id():
+    packet = make_order_packet(PostOnly, {"client_order_id": 2**128})
+    with pytest.raises(ValueError):
+        encode_order_packet(packet)
+
+
+def make_condensed_orders(count: int, options) -> list:
+    last_valid_slot, last_valid_unix_timestamp = options
+    return [
+        CondensedOrder(
+            price_in_ticks=rng.getrandbits(64),
+            size_in_base_lots=rng.getrandbits(64),
+            last_valid_slot=rng.getrandbits(64) if last_valid_slot else None,
+            last_valid_unix_timestamp_in_seconds=(
+                rng.getrandbits(64) if last_valid_unix_timestamp else None
+            ),
+        )
+        for _ in range(count)
+    ]
+
+
+@pytest.mark.parametrize(
+    "behavior",
+    [
+        FailOnInsufficientFundsAndAmendOnCross,
+        FailOnInsufficientFundsAndFailOnCross,
+        SkipOnInsufficientFundsAndAmendOnCross,
+        SkipOnInsufficientFundsAndFailOnCross,
+    ],
+    ids=lambda behavior: behavior.kind,
+)
+def test_multiple_order_packet_encoding_matches_borsh(behavior):
+    for options in itertools.product([False, True], repeat=2):
+        for client_order_id in [None, 0, 2**128 - 1]:
+            packet = MultipleOrderPacket(
+                bids=make_condensed_orders(rng.randrange(4), options),
+                asks=make_condensed_orders(rng.randrange(4), options),
+                client_order_id=client_order_id,
+                failed_multiple_limit_order_behavior=behavior(),
+            )
+            expected = MultipleOrderPacket.layout.build(packet.to_encodable())
+            assert encode_multiple_order_packet(packet) == expected
+
+
+def test_cancel_up_to_params_encoding_matches_borsh():
+    for side in [Bid(), Ask()]:
+        for tick_limit in [None, 0, 2**64 - 1]:
+            for num_orders_to_search in [None, 0, 2**32 - 1]:
+                for num_orders_to_cancel in [None, 1, rng.getrandbits(32)]:
+                    params = CancelUpToParams(
+                        side=side,
+                        tick_limit=tick_limit,
+                        num_orders_to_search=num_orders_to_search,
+                        num_orders_to_cancel=num_orders_to_cancel,
+                    )
+                    expected = CancelUpToParams.layout.build(params.to_encodable())
+                    assert encode_cancel_up_to_params(params) == expected
@@ -0,0 +1,173 @@
+import os
+
+import numpy as np
+import pytest
+from solders.pubkey import Pubkey
+
+from phoenix.event_archive import (
+    CHUNK_DTYPE,
+    INDEX_FILE,
+    EventArchive,
+    get_archive_columns,
+)
+from phoenix.events import EVENT_DTYPES, EventBatch
+
+MARKET = Pubkey.new_unique()
+
+rng = np.random.default_rng(0)
+
+
+def random_column(dtype: np.dtype, shape: tuple, num_rows: int) -> np.ndarray:
+    values = rng.integers(0, 256, (num_rows, *shape, dtype.itemsize), dtype=np.uint8)
+    return values.view(dtype).reshape((num_rows, *shape))
+
+
+def make_columns(kind: str, slots) -> dict:
+    slots = np.asarray(slots, dtype=np.uint64)
+    columns = {
+        name: random_column(dtype, shape, len(slots))
+        for name, dtype, shape in get_archive_columns(kind)
+    }
+    columns["slot"] = slots
+    columns["sequence_number"] = np.arange(len(slots), dtype=np.uint64) + slots
+    return columns
+
+
+def concatenate(parts) -> dict:
+    return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+
+
+def assert_columns_equal(columns: dict, expected: dict):
+    assert columns.keys() == expected.keys()
+    for name in expected:
+        np.testing.assert_array_equal(columns[name], expected[name])
+
+
+def test_appended_rows_are_read_back(tmp_path):
+    archive = EventArchive(str(tmp_path), partition_slots=100)
+    chunks = [
+        make_columns("Fill", [10, 10, 20]),
+        make_columns("Fill", [20, 50]),
+        make_columns("Fill", [99]),
+    ]
+    for chunk in chunks:
+        archive.append_columns(MARKET, "Fill", chunk)
+    expected = concatenate(chunks)
+
+    # Rows of a single partition are memory maps of the column files
+    columns = archive.read(MARKET, "Fill")
+    assert_columns_equal(columns, expected)
+    for column in columns.values():
+        assert isinstance(column, np.memmap)
+        assert not column.flags.writeable
+
+    index = archive.get_index(MARKET, "Fill")
+    assert index["row"].tolist() == [0, 3, 5]
+    assert index["num_rows"].tolist() == [3, 2, 1]
+    assert index["min_slot"].tolist() == [10, 20, 99]
+    assert index["max_slot"].tolist() == [20, 50, 99]
+
+    selected = (expected["slot"] >= 20) & (expected["slot"] <= 50)
+    assert_columns_equal(
+        archive.read(MARKET, "Fill", 20, 50),
+        {name: column[selected] for name, column in expected.items()},
+    )
+    assert list(archive.scan(MARKET, "Fill", 51, 98)) == []
+    assert list(archive.scan(Pubkey.new_unique(), "Fill")) == []
+    empty = archive.read(MARKET, "Place")
+    assert [len(column) for column in empty.values()] == [0] * len(empty)
+
+
+def test_rows_roll_over_into_slot_partitions(tmp_path):
+    archive = EventArchive(str(tmp_path), partition_slots=100)
+    first = make_columns("Place", [5, 99, 100, 150])
+    second = make_columns("Place", [150, 250, 420])
+    archive.append_columns(MARKET, "Place", first)
+    archive.append_columns(MARKET, "Place", second)
+    expected = concatenate([first, second])
+
+    directory = archive.get_directory(MARKET, "Place")
+    assert sorted(os.listdir(directory)) == [
+        "000000000000",
+        "000000000001",
+        "000000000002",
+        "000000000004",
+        INDEX_FILE,
+    ]
+    index = archive.get_index(MARKET, "Place")
+    assert index["partition"].tolist() == [0, 1, 1, 2, 4]
+    assert index["row"].tolist() == [0, 0, 2, 0, 0]
+
+    parts = list(archive.scan(MARKET, "Place"))
+    assert [part["slot"].tolist() for part in parts] == [
+        [5, 99],
+        [100, 150, 150],
+        [250],
+        [420],
+    ]
+    assert_columns_equal(concatenate(parts), expected)
+    assert_columns_equal(archive.read(MARKET, "Place"), expected)
+    slots = archive.read(MARKET, "Place", 99, 250)["slot"]
+    assert slots.tolist() == [99, 100, 150, 150, 250]
+
+    with pytest.raises(ValueError):
+        archive.append_columns(MARKET, "Place", make_columns("Place", [419]))
+    with pytest.raises(ValueError):
+        archive.append_columns(MARKET, "Place", make_columns("Place", [500, 499]))
+
+
+def test_torn_append_is_truncated(tmp_path):
+    archive = EventArchive(str(tmp_path), partition_slots=100)
+    committed = make_columns("Reduce", [1, 2, 3])
+    archive.append_columns(MARKET, "Reduce", committed)
+
+    # An append that wrote part of its column data and index record before
+    # the process stopped
+    directory = archive.get_directory(MARKET, "Reduce")
+    partition_directory = os.path.join(directory, "000000000000")
+    for name in os.listdir(partition_directory):
+        with open(os.path.join(partition_directory, name), "ab") as f:
+            f.write(b"\xff" * 11)
+    with open(os.path.join(directory, INDEX_FILE), "ab") as f:
+        f.write(b"\xff" * (CHUNK_DTYPE.itemsize - 1))
+
+    assert len(archive.get_index(MARKET, "Reduce")) == 1
+    assert_columns_equal(archive.read(MARKET, "Reduce"), committed)
+
+    appended = make_columns("Reduce", [3, 4])
+    archive.append_columns(MARKET, "Reduce", appended)
+    assert os.path.getsize(os.path.join(directory, INDEX_FILE)) == (
+        2 * CHUNK_DTYPE.itemsize
+    )
+    assert_columns_equal(
+        archive.read(MARKET, "Reduce"), concatenate([committed, appended])
+    )
+
+
+def test_append_groups_batch_rows_by_market(tmp_path):
+    archive = EventArchive(str(tmp_path))
+    markets = [Pubkey.new_unique() for _ in range(2)]
+    num_rows = 6
+    events = random_column(EVENT_DTYPES["Fill"], (), num_rows)
+    batch = EventBatch(
+        kind="Fill",
+        events=events,
+        slot=np.arange(num_rows, dtype=np.uint64),
+        timestamp=np.arange(num_rows, dtype=np.int64),
+        sequence_number=np.arange(num_rows, dtype=np.uint64),
+        market=np.frombuffer(
+            b"".join(bytes(markets[i % 2]) for i in range(num_rows)), dtype=np.uint8
+        ).reshape(num_rows, 32),
+        signer=random_column(np.dtype("u1"), (32,), num_rows),
+    )
+    archive.append(batch)
+
+    for i, market in enumerate(markets):
+        columns = archive.read(market, "Fill")
+        rows = np.arange(i, num_rows, 2)
+        for name, _, _ in get_archive_columns("Fill"):
+            if name in EVENT_DTYPES["Fill"].names:
+                expected = batch.events[name][rows]
+            else:
+                expected = getattr(batch, name)[rows]
+            np.testing.assert_array_equal(columns[name], expected)
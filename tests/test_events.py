@@ -0,0 +1,187 @@
+import dataclasses
+import random
+
+import numpy as np
+import pytest
+from solders.pubkey import Pubkey
+
+from phoenix.events import (
+    EventFilter,
+    get_event_batches_from_log_data,
+    get_phoenix_events_from_log_data,
+)
+from phoenix.types import (
+    AuditLogHeader,
+    EvictEvent,
+    ExpiredOrderEvent,
+    FeeEvent,
+    FillEvent,
+    FillSummaryEvent,
+    PlaceEvent,
+    ReduceEvent,
+    TimeInForceEvent,
+)
+from phoenix.types.phoenix_market_event import (
+    Evict,
+    ExpiredOrder,
+    Fee,
+    Fill,
+    FillSummary,
+    Place,
+    Reduce,
+    TimeInForce,
+)
+from phoenix.types.phoenix_market_event import layout as phoenix_market_event_layout
+
+EVENT_KINDS = [
+    (Fill, FillEvent),
+    (Place, PlaceEvent),
+    (Reduce, ReduceEvent),
+    (Evict, EvictEvent),
+    (FillSummary, FillSummaryEvent),
+    (Fee, FeeEvent),
+    (TimeInForce, TimeInForceEvent),
+    (ExpiredOrder, ExpiredOrderEvent),
+]
+MAKER_KINDS = {"Fill", "Evict", "ExpiredOrder"}
+SUMMARY_KINDS = {"FillSummary", "Fee"}
+
+rng = random.Random(0)
+MARKETS = [Pubkey.new_unique() for _ in range(3)]
+TRADERS = [Pubkey.new_unique() for _ in range(4)]
+
+
+def random_instance(cls):
+    return cls.from_decoded(cls.layout.parse(rng.randbytes(cls.layout.sizeof())))
+
+
+def build_log_data(num_events: int, kinds=EVENT_KINDS) -> bytes:
+    """Log data of one instruction on a random market, signed by a random trader"""
+    header = dataclasses.replace(
+        random_instance(AuditLogHeader),
+        market=rng.choice(MARKETS),
+        signer=rng.choice(TRADERS),
+        total_events=num_events,
+    )
+    data = bytearray([1]) + AuditLogHeader.layout.build(header.to_encodable())
+    for _ in range(num_events):
+        kind, cls = rng.choice(kinds)
+        event = random_instance(cls)
+        if kind.kind in MAKER_KINDS:
+            event = dataclasses.replace(event, maker_id=rng.choice(TRADERS))
+        data += phoenix_market_event_layout.build(kind((event,)).to_encodable())
+    return bytes(data)
+
+
+LOG_DATA = [build_log_data(rng.randrange(8)) for _ in range(200)]
+
+
+def get_events(instruction):
+    return [(event.kind, event.value[0]) for event in instruction.events]
+
+
+def filter_events(instruction, markets=None, traders=None, kinds=None):
+    """Applies the filter semantics of EventFilter to a fully decoded instruction"""
+    header = instruction.header
+    if markets is not None and header.market not in markets:
+        return None
+    events = get_events(instruction)
+    if kinds is not None:
+        events = [(kind, event) for kind, event in events if kind in kinds]
+    if traders is not None and header.signer not in traders:
+        events = [
+            (kind, event)
+            for kind, event in events
+            if kind in SUMMARY_KINDS
+            or (kind in MAKER_KINDS and event.maker_id in traders)
+        ]
+        # Summaries are only kept along with a fill, evict or expiry of a trader
+        if all(kind in SUMMARY_KINDS for kind, _ in events):
+            return None
+    if kinds is not None and not events:
+        return None
+    return events
+
+
+@pytest.mark.parametrize(
+    "markets, traders, kinds",
+    [
+        (None, None, None),
+        (MARKETS[:1], None, None),
+        (None, TRADERS[:1], None),
+        (None, None, ["Fill"]),
+        (None, None, ["Place", "Reduce", "TimeInForce"]),
+        (MARKETS[1:], TRADERS[:2], None),
+        (None, TRADERS[2:], ["Fill", "Fee"]),
+        (MARKETS[:2], TRADERS[1:2], ["Evict", "ExpiredOrder", "FillSummary"]),
+        ([], None, None),
+        (None, None, []),
+    ],
+)
+def test_event_filter_matches_filtered_objects(markets, traders, kinds):
+    event_filter = EventFilter(markets=markets, traders=traders, kinds=kinds)
+    for data in LOG_DATA:
+        instruction = get_phoenix_events_from_log_data(data)
+        expected = filter_events(instruction, markets, traders, kinds)
+        filtered = get_phoenix_events_from_log_data(data, event_filter)
+        if expected is None:
+            assert filtered is None
+        else:
+            assert filtered.header == instruction.header
+            assert get_events(filtered) == expected
+
+
+def get_column_value(event, name: str):
+    value = getattr(event, name)
+    if isinstance(value, Pubkey):
+        return list(bytes(value))
+    if name == "client_order_id":
+        # u128 client order ids are stored as (low, high) u64 pairs
+        return [value & (2**64 - 1), value >> 64]
+    return value
+
+
+@pytest.mark.parametrize(
+    "kinds",
+    [["Fill", "Place", "Reduce"], ["Fill"], ["Place", "Reduce"]],
+    ids=lambda kinds: "_".join(kinds),
+)
+def test_event_batch_columns_match_event_objects(kinds):
+    batches = get_event_batches_from_log_data(LOG_DATA, kinds)
+    assert sorted(batches) == sorted(kinds)
+    instructions = [get_phoenix_events_from_log_data(data) for data in LOG_DATA]
+    for kind in kinds:
+        batch = batches[kind]
+        # Events of the kind in log order, with the header that logged each one
+        expected = [
+            (instruction.header, event.value[0])
+            for instruction in instructions
+            for event in instruction.events
+            if event.kind == kind
+        ]
+        assert batch.kind == kind
+        assert len(batch) == len(expected) > 0
+        for row, (header, event) in enumerate(expected):
+            for name in batch.events.dtype.names:
+                if name != "discriminator":
+                    assert batch[name][row].tolist() == get_column_value(event, name)
+            assert batch.slot[row] == header.slot
+            assert batch.timestamp[row] == header.timestamp
+            assert batch.sequence_number[row] == header.sequence_number
+            assert bytes(batch.market[row]) == bytes(header.market)
+            assert bytes(batch.signer[row]) == bytes(header.signer)
+
+
+def test_event_batches_of_instructions_without_matching_events():
+    # Only Fee and TimeInForce events, which have no columnar layout
+    data_array = [
+        build_log_data(3, [(Fee, FeeEvent), (TimeInForce, TimeInForceEvent)])
+        for _ in range(4)
+    ]
+    batches = get_event_batches_from_log_data(data_array, ["Fill", "Place"])
+    for kind in ["Fill", "Place"]:
+        assert len(batches[kind]) == 0
+        assert batches[kind].events.dtype.names[0] == "discriminator"
+        assert batches[kind].market.shape == (0, 32)
+    with pytest.raises(ValueError):
+        get_event_batches_from_log_data(data_array, ["Fee"])
@@ -0,0 +1,81 @@
+import random
+
+from solders.pubkey import Pubkey
+
+from market_accounts import (
+    add_random_order,
+    get_market_state,
+    make_market_account,
+)
+from phoenix.incremental_market import IncrementalMarketDecoder
+from phoenix.market import MARKET_TREES_OFFSET, Market
+from phoenix.types.fifo_resting_order import FIFORestingOrder
+from phoenix.types.trader_state import TraderState
+
+
+def assert_decodes_like_market(decoder: IncrementalMarketDecoder, data: bytes):
+    expected = Market.deserialize_market_data(decoder.market_pubkey, data)
+    assert get_market_state(decoder.decode(data)) == get_market_state(expected)
+
+
+def test_free_list_change_behind_an_unchanged_tree_header():
+    market = make_market_account(random.Random(0))
+    decoder = IncrementalMarketDecoder(Pubkey.new_unique())
+    first = market.build()
+    assert_decodes_like_market(decoder, first)
+
+    # Allocating the head of the free list, freeing a live node and then
+    # freeing the allocated node again leaves the root, bump index and free
+    # list head as they were, but the live node is now on the free list
+    trader_indices = list(market.traders.entries)
+    for tree in [market.asks, market.traders]:
+        if tree is market.asks:
+            address = add_random_order(random.Random(1), market, False, trader_indices)
+        else:
+            address = market.add_trader(Pubkey.new_unique())
+        tree.remove(max(set(tree.entries) - {address}))
+        tree.remove(address)
+    second = market.build()
+
+    asks_offset = MARKET_TREES_OFFSET + len(market.bids.build())
+    traders_offset = asks_offset + len(market.asks.build())
+    for offset in [asks_offset, traders_offset]:
+        assert first[offset : offset + 32] == second[offset : offset + 32]
+    assert_decodes_like_market(decoder, second)
+
+
+def test_snapshot_sequence_decodes_like_market():
+    rng = random.Random(2)
+    market = make_market_account(rng)
+    decoder = IncrementalMarketDecoder(Pubkey.new_unique())
+    assert_decodes_like_market(decoder, market.build())
+
+    for _ in range(200):
+        trader_indices = list(market.traders.entries)
+        for _ in range(rng.randint(0, 4)):
+            tree = rng.choice([market.bids, market.asks, market.traders])
+            action = rng.random()
+            if action < 0.4 and len(tree.entries) < tree.capacity:
+                if tree is market.traders:
+                    market.add_trader(
+                        Pubkey.new_unique(),
+                        TraderState(*(rng.randrange(10**6) for _ in range(4)), [0] * 8),
+                    )
+                else:
+                    add_random_order(rng, market, tree is market.bids, trader_indices)
+            elif action < 0.8 and len(tree.entries) > 1:
+                tree.remove(rng.choice(list(tree.entries)))
+            elif tree is not market.traders and tree.entries:
+                # Partial fill of a resting order
+                address = rng.choice(list(tree.entries))
+                order_id, order = tree.entries[address]
+                tree.entries[address] = (
+                    order_id,
+                    FIFORestingOrder(
+                        order.trader_index,
+                        max(order.num_base_lots - 1, 1),
+                        order.last_valid_slot,
+                        order.last_valid_unix_timestamp_in_seconds,
+                    ),
+                )
+        assert_decodes_like_market(decoder, market.build())
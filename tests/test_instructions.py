@@ -0,0 +1,116 @@
+import pytest
+from solders.instruction import AccountMeta
+from solders.pubkey import Pubkey
+from spl.token.constants import TOKEN_PROGRAM_ID
+
+from market_accounts import MarketAccountBuilder
+from phoenix.addresses import LOG_AUTHORITY, get_seat_address, get_token_account_address
+from phoenix.instructions.place_multiple_post_only_orders import (
+    PlaceMultiplePostOnlyOrdersAccounts,
+    PlaceMultiplePostOnlyOrdersArgs,
+    place_multiple_post_only_orders,
+)
+from phoenix.instructions.place_multiple_post_only_orders_with_free_funds import (
+    PlaceMultiplePostOnlyOrdersWithFreeFundsAccounts,
+    PlaceMultiplePostOnlyOrdersWithFreeFundsArgs,
+    place_multiple_post_only_orders_with_free_funds,
+)
+from phoenix.market_metadata import MarketMetadata
+from phoenix.program_id import PROGRAM_ID
+from phoenix.types.condensed_order import CondensedOrder
+from phoenix.types.failed_multiple_limit_order_behavior import (
+    SkipOnInsufficientFundsAndAmendOnCross,
+)
+from phoenix.types.multiple_order_packet import MultipleOrderPacket
+
+PACKET = MultipleOrderPacket(
+    bids=[CondensedOrder(99, 10, None, None), CondensedOrder(98, 20, 500, None)],
+    asks=[CondensedOrder(101, 5, None, 1_700_000_000)],
+    client_order_id=42,
+    failed_multiple_limit_order_behavior=SkipOnInsufficientFundsAndAmendOnCross(),
+)
+
+
+def get_expected_accounts(metadata: MarketMetadata, trader: Pubkey, with_free_funds):
+    accounts = [
+        AccountMeta(PROGRAM_ID, is_signer=False, is_writable=False),
+        AccountMeta(LOG_AUTHORITY, is_signer=False, is_writable=False),
+        AccountMeta(metadata.address, is_signer=False, is_writable=True),
+        AccountMeta(trader, is_signer=True, is_writable=False),
+        AccountMeta(
+            get_seat_address(metadata.address, trader),
+            is_signer=False,
+            is_writable=False,
+        ),
+    ]
+    if not with_free_funds:
+        accounts += [
+            AccountMeta(
+                get_token_account_address(trader, metadata.base_mint),
+                is_signer=False,
+                is_writable=True,
+            ),
+            AccountMeta(
+                get_token_account_address(trader, metadata.quote_mint),
+                is_signer=False,
+                is_writable=True,
+            ),
+            AccountMeta(metadata.base_vault, is_signer=False, is_writable=True),
+            AccountMeta(metadata.quote_vault, is_signer=False, is_writable=True),
+            AccountMeta(TOKEN_PROGRAM_ID, is_signer=False, is_writable=False),
+        ]
+    return accounts
+
+
+@pytest.mark.parametrize(
+    "with_free_funds, identifier",
+    [(False, b"\x10"), (True, b"\x11")],
+    ids=["deposit", "free_funds"],
+)
+def test_place_multiple_post_only_orders_instruction(with_free_funds, identifier):
+    metadata = MarketMetadata(Pubkey.new_unique(), MarketAccountBuilder().header)
+    trader = Pubkey.new_unique()
+    expected_data = identifier + MultipleOrderPacket.layout.build(PACKET.to_encodable())
+    expected_accounts = get_expected_accounts(metadata, trader, with_free_funds)
+    seat = get_seat_address(metadata.address, trader)
+
+    if with_free_funds:
+        instruction = place_multiple_post_only_orders_with_free_funds(
+            PlaceMultiplePostOnlyOrdersWithFreeFundsArgs(multiple_order_packet=PACKET),
+            PlaceMultiplePostOnlyOrdersWithFreeFundsAccounts(
+                phoenix_program=PROGRAM_ID,
+                log_authority=LOG_AUTHORITY,
+                market=metadata.address,
+                trader=trader,
+                seat=seat,
+            ),
+        )
+    else:
+        instruction = place_multiple_post_only_orders(
+            PlaceMultiplePostOnlyOrdersArgs(multiple_order_packet=PACKET),
+            PlaceMultiplePostOnlyOrdersAccounts(
+                phoenix_program=PROGRAM_ID,
+                log_authority=LOG_AUTHORITY,
+                market=metadata.address,
+                trader=trader,
+                seat=seat,
+                base_account=get_token_account_address(trader, metadata.base_mint),
+                quote_account=get_token_account_address(trader, metadata.quote_mint),
+                base_vault=metadata.base_vault,
+                quote_vault=metadata.quote_vault,
+            ),
+        )
+    assert instruction.program_id == PROGRAM_ID
+    assert bytes(instruction.data) == expected_data
+    assert list(instruction.accounts) == expected_accounts
+
+    # The first instruction is built by the generated builder and the second
+    # from the cached template
+    for _ in range(2):
+        instruction = metadata.create_place_multiple_post_only_orders_instruction(
+            PACKET, trader, use_only_deposited_funds=with_free_funds
+        )
+        assert instruction.program_id == PROGRAM_ID
+        assert bytes(instruction.data) == expected_data
+        assert list(instruction.accounts) == expected_accounts
+        assert len(metadata.templates) == 1
@@ -0,0 +1,48 @@
+from phoenix.ioc_simulation import simulate_ioc
+from phoenix.types.fifo_order_id import FIFOOrderId
+from phoenix.types.fifo_resting_order import FIFORestingOrder
+from phoenix.types.side import Bid
+
+
+def make_asks(time_in_force):
+    """Asks of 10 base lots at increasing prices with the given expiries"""
+    return [
+        (
+            FIFOOrderId(price_in_ticks=100 + i, order_sequence_number=i),
+            FIFORestingOrder(
+                trader_index=1,
+                num_base_lots=10,
+                last_valid_slot=last_valid_slot,
+                last_valid_unix_timestamp_in_seconds=last_valid_unix_timestamp,
+            ),
+        )
+        for i, (last_valid_slot, last_valid_unix_timestamp) in enumerate(time_in_force)
+    ]
+
+
+def test_expired_orders_count_towards_the_match_limit():
+    # The first two asks expired at slot 50 and timestamp 500
+    asks = make_asks([(40, 0), (0, 400), (0, 0), (60, 600)])
+
+    def simulate(match_limit, slot=50, unix_timestamp=500):
+        return simulate_ioc(
+            asks,
+            Bid(),
+            base_lots_per_base_unit=1,
+            quote_lots_per_base_unit_per_tick=1,
+            taker_fee_bps=0,
+            match_limit=match_limit,
+            slot=slot,
+            unix_timestamp=unix_timestamp,
+        )
+
+    assert simulate(2).num_base_lots_filled == 0
+    simulation = simulate(3)
+    assert simulation.num_orders_matched == 1
+    assert simulation.best_price_in_ticks == 102
+    assert simulation.num_base_lots_filled == 10
+    simulation = simulate(None)
+    assert simulation.num_orders_matched == 2
+    assert simulation.worst_price_in_ticks == 103
+    # Without a clock no order has expired
+    assert simulate(3, -1, -1).num_base_lots_filled == 30
@@ -0,0 +1,247 @@
+import random
+
+import numpy as np
+import pytest
+from solders.pubkey import Pubkey
+
+from market_accounts import (
+    ORDER_NODE_SIZE,
+    U64_MASK,
+    MarketAccountBuilder,
+    TreeBuilder,
+    ask_sort_key,
+    bid_sort_key,
+    get_market_state,
+    make_market_account,
+    pack_order,
+)
+from phoenix.market import (
+    ArrayMarket,
+    LazyMarket,
+    Market,
+    deserialize_fifo_order_id,
+    deserialize_fifo_resting_order,
+    get_top_of_book,
+    iterate_orders,
+    iterate_red_black_tree,
+    split_market_data,
+)
+from phoenix.types.fifo_order_id import FIFOOrderId
+from phoenix.types.fifo_resting_order import FIFORestingOrder
+from phoenix.types.market_header import MARKET_HEADER_SIZE, MarketHeader
+
+MARKET_ACCOUNTS = {
+    "random": dict(),
+    "empty": dict(num_bids=0, num_asks=0, num_traders=0, num_removed=0),
+    "full": dict(bids_size=50, asks_size=50, num_seats=22),
+    "one_sided": dict(num_asks=0, num_removed=3),
+}
+
+
+@pytest.fixture(params=list(MARKET_ACCOUNTS), ids=list(MARKET_ACCOUNTS))
+def market_data(request) -> bytes:
+    rng = random.Random(request.param)
+    return make_market_account(rng, **MARKET_ACCOUNTS[request.param]).build()
+
+
+@pytest.mark.parametrize("cls", [LazyMarket, ArrayMarket])
+def test_lazy_market_decodes_like_market(cls, market_data):
+    market_pubkey = Pubkey.new_unique()
+    expected = Market.deserialize_market_data(market_pubkey, market_data)
+    market = cls.deserialize_market_data(market_pubkey, market_data)
+    # Orders are walked from the tree before the sides are decoded
+    assert list(market.iter_bids()) == expected.bids
+    assert list(market.iter_asks()) == expected.asks
+    assert get_market_state(market) == get_market_state(expected)
+    assert list(market.iter_bids()) == expected.bids
+    assert market.metadata.market_size_params == expected.metadata.market_size_params
+
+
+def test_split_market_data_matches_borsh(market_data):
+    header, market_fields, bid_buffer, ask_buffer, trader_buffer = split_market_data(
+        market_data
+    )
+    assert header == MarketHeader.from_decoded(
+        MarketHeader.layout.parse(market_data[:MARKET_HEADER_SIZE])
+    )
+    assert split_market_data(market_data, header)[1] == market_fields
+
+    size_params = header.market_size_params
+    assert len(bid_buffer) == 32 + 64 * size_params.bids_size
+    assert len(ask_buffer) == 32 + 64 * size_params.asks_size
+    assert len(trader_buffer) == 32 + 144 * size_params.num_seats
+    offset = MARKET_HEADER_SIZE + 8 * 32 + 6 * 8
+    for buffer in [bid_buffer, ask_buffer, trader_buffer]:
+        assert bytes(buffer) == market_data[offset : offset + len(buffer)]
+        offset += len(buffer)
+    assert offset == len(market_data)
+
+
+def get_levels(orders, levels: int, slot: int = -1, unix_timestamp: int = -1):
+    """Reference aggregation of best-first orders into price levels"""
+    prices = []
+    sizes = []
+    for order_id, order in orders:
+        if (order.last_valid_slot != 0 and order.last_valid_slot < slot) or (
+            order.last_valid_unix_timestamp_in_seconds != 0
+            and order.last_valid_unix_timestamp_in_seconds < unix_timestamp
+        ):
+            continue
+        if prices and prices[-1] == order_id.price_in_ticks:
+            sizes[-1] += order.num_base_lots
+        elif len(prices) < levels:
+            prices.append(order_id.price_in_ticks)
+            sizes.append(order.num_base_lots)
+        else:
+            break
+    return list(zip(prices, sizes))
+
+
+def build_order_tree(orders, is_bid: bool, capacity: int = 16) -> bytes:
+    tree = TreeBuilder(
+        capacity, ORDER_NODE_SIZE, pack_order, bid_sort_key if is_bid else ask_sort_key
+    )
+    for order_id, order in orders:
+        tree.insert(order_id, order)
+    return tree.build()
+
+
+@pytest.mark.parametrize("is_bid", [True, False], ids=["bid", "ask"])
+def test_iterate_red_black_tree_yields_best_first(is_bid):
+    rng = random.Random(3)
+    market = make_market_account(rng, num_removed=20)
+    tree = market.bids if is_bid else market.asks
+    orders = list(
+        iterate_red_black_tree(
+            tree.build(),
+            16,
+            32,
+            deserialize_fifo_order_id,
+            deserialize_fifo_resting_order,
+        )
+    )
+    assert orders == tree.items()
+    # Bids are best-first by descending price, and the earliest bid at a price
+    # has the largest inverted sequence number
+    prices = [order_id.price_in_ticks for order_id, _ in orders]
+    assert prices == sorted(prices, reverse=is_bid)
+    for (order_id, _), (next_order_id, _) in zip(orders, orders[1:]):
+        if order_id.price_in_ticks == next_order_id.price_in_ticks:
+            sequence_number = order_id.order_sequence_number
+            next_sequence_number = next_order_id.order_sequence_number
+            if is_bid:
+                sequence_number = ~sequence_number & U64_MASK
+                next_sequence_number = ~next_sequence_number & U64_MASK
+            assert sequence_number < next_sequence_number
+
+
+def test_iterate_red_black_tree_of_degenerate_and_empty_trees():
+    orders = [
+        (FIFOOrderId(100 + i, i), FIFORestingOrder(1, 10, 0, 0)) for i in range(16)
+    ]
+    # Inserting in key order links every node as a right child
+    data = build_order_tree(orders, False)
+    assert list(iterate_orders(data)) == orders
+    assert list(iterate_orders(build_order_tree(orders[::-1], False))) == orders
+    assert list(iterate_orders(build_order_tree([], False))) == []
+
+
+def test_get_top_of_book_matches_aggregated_orders(market_data):
+    market = Market.deserialize_market_data(Pubkey.new_unique(), market_data)
+    for levels in [1, 3, 100]:
+        for slot, unix_timestamp in [(-1, -1), (150, -1), (-1, 1_500), (150, 1_500)]:
+            ladder = get_top_of_book(market_data, levels, slot, unix_timestamp)
+            for ladder_levels, orders in [
+                (ladder.bids, market.bids),
+                (ladder.asks, market.asks),
+            ]:
+                assert [
+                    (level.price_in_ticks, level.size_in_base_lots)
+                    for level in ladder_levels
+                ] == get_levels(orders, levels, slot, unix_timestamp)
+
+
+CLOCKS = [(-1, -1), (150, -1), (-1, 1_500), (150, 1_500), (10**6, 10**6)]
+
+
+@pytest.mark.parametrize("cls", [Market, LazyMarket, ArrayMarket])
+def test_ladder_arrays_aggregate_levels(cls, market_data):
+    market = cls.deserialize_market_data(Pubkey.new_unique(), market_data)
+    lazy_market = LazyMarket.deserialize_market_data(Pubkey.new_unique(), market_data)
+    for levels in [0, 1, 3, 1_000]:
+        for slot, unix_timestamp in CLOCKS:
+            ladder = market.get_ladder_arrays(slot, unix_timestamp, levels)
+            for prices, sizes, orders in [
+                (
+                    ladder.bid_prices_in_ticks,
+                    ladder.bid_sizes_in_base_lots,
+                    market.bids,
+                ),
+                (
+                    ladder.ask_prices_in_ticks,
+                    ladder.ask_sizes_in_base_lots,
+                    market.asks,
+                ),
+            ]:
+                assert prices.dtype == np.uint64 and sizes.dtype == np.uint64
+                assert len(prices) <= levels
+                assert list(zip(prices.tolist(), sizes.tolist())) == get_levels(
+                    orders, levels, slot, unix_timestamp
+                )
+
+            # The tree walk of the lazy ladder gives the same levels
+            expected = lazy_market.get_ladder(slot, unix_timestamp, levels)
+            ladder = ladder.to_ladder()
+            for ladder_levels, expected_levels in [
+                (ladder.bids, expected.bids),
+                (ladder.asks, expected.asks),
+            ]:
+                assert [
+                    (level.price_in_ticks, level.size_in_base_lots)
+                    for level in ladder_levels
+                ] == [
+                    (level.price_in_ticks, level.size_in_base_lots)
+                    for level in expected_levels
+                ]
+
+
+def test_ladder_arrays_keep_integer_precision():
+    market = MarketAccountBuilder()
+    trader_index = market.add_trader(Pubkey.new_unique())
+    # Prices and level sizes that a float64 cannot represent exactly
+    for i in range(6):
+        market.add_order(True, 2**60 + i // 3, trader_index, 2**61 + i)
+        market.add_order(False, 2**61 + i // 3, trader_index, 2**61 - i)
+    ladder = ArrayMarket.deserialize_market_data(
+        Pubkey.new_unique(), market.build()
+    ).get_ladder_arrays(levels=5)
+    assert ladder.bid_prices_in_ticks.tolist() == [2**60 + 1, 2**60]
+    assert ladder.bid_sizes_in_base_lots.tolist() == [3 * 2**61 + 12, 3 * 2**61 + 3]
+    assert ladder.ask_prices_in_ticks.tolist() == [2**61, 2**61 + 1]
+    assert ladder.ask_sizes_in_base_lots.tolist() == [3 * 2**61 - 3, 3 * 2**61 - 12]
+
+
+def test_next_expiry_of_both_sides(market_data):
+    market = Market.deserialize_market_data(Pubkey.new_unique(), market_data)
+    orders = market.bids + market.asks
+    for slot, unix_timestamp in CLOCKS + [(100, 1_000), (200, 2_000)]:
+        expected_slot = min(
+            (
+                order.last_valid_slot + 1
+                for _, order in orders
+                if order.last_valid_slot >= max(slot, 1)
+            ),
+            default=None,
+        )
+        expected_unix_timestamp = min(
+            (
+                order.last_valid_unix_timestamp_in_seconds + 1
+                for _, order in orders
+                if order.last_valid_unix_timestamp_in_seconds >= max(unix_timestamp, 1)
+            ),
+            default=None,
+        )
+        assert market.get_next_expiry(slot, unix_timestamp) == (
+            expected_slot,
+            expected_unix_timestamp,
+        )
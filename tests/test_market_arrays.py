@@ -0,0 +1,236 @@
+import random
+import struct
+
+import numpy as np
+import pytest
+
+from market_accounts import (
+    ORDER_NODE_SIZE,
+    TreeBuilder,
+    ask_sort_key,
+    bid_sort_key,
+    pack_order,
+)
+from phoenix.ioc_simulation import simulate_ioc
+from phoenix.market_arrays import (
+    ORDER_NODE_DTYPE,
+    OrderArrays,
+    live_node_mask,
+    map_tree_nodes,
+)
+from phoenix.types.fifo_order_id import FIFOOrderId
+from phoenix.types.fifo_resting_order import FIFORestingOrder
+from phoenix.types.side import Ask, Bid
+
+
+def make_orders(rng: random.Random, side, num_orders: int, max_price: int):
+    """Random resting orders in price-time priority, several per level"""
+    prices = sorted(
+        (rng.randint(1, max_price) for _ in range(num_orders)),
+        reverse=isinstance(side, Bid),
+    )
+    return [
+        (
+            FIFOOrderId(price_in_ticks=price, order_sequence_number=sequence_number),
+            FIFORestingOrder(
+                trader_index=rng.randint(1, 8),
+                num_base_lots=rng.randint(1, 10_000),
+                last_valid_slot=0,
+                last_valid_unix_timestamp_in_seconds=0,
+            ),
+        )
+        for sequence_number, price in enumerate(prices)
+    ]
+
+
+@pytest.mark.parametrize("side", [Bid(), Ask()], ids=["bid", "ask"])
+@pytest.mark.parametrize(
+    "max_price, quote_lots_per_base_unit_per_tick",
+    # Tick lots of the second case do not fit in a float64
+    [(5_000, 7), (2**40, 1)],
+    ids=["small", "large"],
+)
+def test_depth_curve_matches_simulate_ioc(
+    side, max_price, quote_lots_per_base_unit_per_tick
+):
+    rng = random.Random(max_price)
+    # The taker crosses the opposite side of the book
+    taker_side = Ask() if isinstance(side, Bid) else Bid()
+    orders = make_orders(rng, side, 300, max_price)
+    depth_curve = OrderArrays.from_orders(orders).depth_curve
+    total_base_lots = sum(order.num_base_lots for _, order in orders)
+    sizes = [1, total_base_lots - 1, total_base_lots, total_base_lots + 1] + [
+        rng.randint(1, total_base_lots) for _ in range(200)
+    ]
+
+    impact = depth_curve.get_price_impact(
+        sizes,
+        isinstance(taker_side, Bid),
+        base_lots_per_base_unit=1_000,
+        quote_lots_per_base_unit_per_tick=quote_lots_per_base_unit_per_tick,
+        taker_fee_bps=5,
+    )
+    assert impact.num_quote_lots_filled.dtype == np.uint64
+    assert impact.num_quote_lot_fees.dtype == np.uint64
+    for i, size in enumerate(sizes):
+        simulation = simulate_ioc(
+            orders,
+            taker_side,
+            base_lots_per_base_unit=1_000,
+            quote_lots_per_base_unit_per_tick=quote_lots_per_base_unit_per_tick,
+            taker_fee_bps=5,
+            num_base_lots=size,
+        )
+        assert int(impact.num_base_lots_filled[i]) == simulation.num_base_lots_filled
+        assert int(impact.num_quote_lots_filled[i]) == simulation.num_quote_lots_filled
+        assert int(impact.num_quote_lot_fees[i]) == simulation.num_quote_lot_fees
+        assert impact.worst_price_in_ticks[i] == simulation.worst_price_in_ticks
+        assert impact.average_price_in_ticks[i] == simulation.average_price_in_ticks
+
+
+def test_depth_curve_of_empty_book():
+    depth_curve = OrderArrays.from_orders([]).depth_curve
+    impact = depth_curve.get_price_impact([0, 5], True, 1_000, 7, 5)
+    assert impact.num_base_lots_filled.tolist() == [0, 0]
+    assert impact.num_quote_lots_filled.tolist() == [0, 0]
+    assert impact.num_quote_lot_fees.tolist() == [0, 0]
+    assert np.isnan(impact.average_price_in_ticks).all()
+    assert np.isnan(impact.worst_price_in_ticks).all()
+
+
+# Node addresses to free after inserting 12 orders into a tree of 16 nodes
+FREE_LISTS = {
+    "none": [],
+    "ascending": [2, 5, 9],
+    "descending": [11, 7, 3, 1],
+    "last_allocated": [12],
+    "all": list(range(1, 13)),
+}
+
+
+def make_order_tree(free_list, is_bid: bool, capacity: int = 16) -> TreeBuilder:
+    rng = random.Random(len(free_list))
+    tree = TreeBuilder(
+        capacity, ORDER_NODE_SIZE, pack_order, bid_sort_key if is_bid else ask_sort_key
+    )
+    orders = make_orders(rng, Bid() if is_bid else Ask(), 12, 5)
+    for order_id, order in orders:
+        if is_bid:
+            order_id = FIFOOrderId(
+                order_id.price_in_ticks, ~order_id.order_sequence_number & (2**64 - 1)
+            )
+        tree.insert(order_id, order)
+    for address in free_list:
+        tree.remove(address)
+    return tree
+
+
+@pytest.mark.parametrize("is_bid", [True, False], ids=["bid", "ask"])
+@pytest.mark.parametrize("free_list", list(FREE_LISTS.values()), ids=list(FREE_LISTS))
+def test_tree_arrays_skip_free_nodes(free_list, is_bid):
+    tree = make_order_tree(free_list, is_bid)
+    data = tree.build()
+    # Freed nodes are pushed onto the front of the free list
+    assert tree.free_list() == free_list[::-1]
+
+    live = live_node_mask(data, ORDER_NODE_SIZE)
+    assert live.tolist() == [address in tree.entries for address in range(1, 13)]
+
+    nodes, addresses = map_tree_nodes(data, ORDER_NODE_DTYPE)
+    assert len(nodes) == 12
+    assert addresses.tolist() == sorted(tree.entries)
+
+    order_arrays = OrderArrays.from_tree(data, Bid() if is_bid else Ask())
+    assert order_arrays.to_orders() == tree.items()
+    assert [
+        tree.entries[address] for address in order_arrays.node_addresses.tolist()
+    ] == tree.items()
+
+
+def test_tree_arrays_of_full_and_reused_trees():
+    tree = make_order_tree([], False, capacity=12)
+    assert live_node_mask(tree.build(), ORDER_NODE_SIZE).all()
+    # Freed nodes are reused before the bump index grows
+    tree.remove(4)
+    tree.remove(8)
+    _, order = tree.entries[1]
+    assert tree.insert(FIFOOrderId(6, 100), order) == 8
+    data = tree.build()
+    assert live_node_mask(data, ORDER_NODE_SIZE).tolist() == [
+        address != 4 for address in range(1, 13)
+    ]
+    assert OrderArrays.from_tree(data, Ask()).to_orders() == tree.items()
+
+    empty = TreeBuilder(12, ORDER_NODE_SIZE, pack_order, ask_sort_key).build()
+    assert len(live_node_mask(empty, ORDER_NODE_SIZE)) == 0
+    assert len(OrderArrays.from_tree(empty, Ask())) == 0
+
+
+def test_live_node_mask_rejects_free_list_cycles():
+    data = bytearray(make_order_tree([2, 5, 9], False).build())
+    # Point the tail of the free list back at its head
+    struct.pack_into("<I", data, 32 + (2 - 1) * ORDER_NODE_SIZE, 9)
+    with pytest.raises(ValueError):
+        live_node_mask(data, ORDER_NODE_SIZE)
+
+
+def get_expired(orders, slot: int, unix_timestamp: int) -> list:
+    return [
+        (order.last_valid_slot != 0 and order.last_valid_slot < slot)
+        or (
+            order.last_valid_unix_timestamp_in_seconds != 0
+            and order.last_valid_unix_timestamp_in_seconds < unix_timestamp
+        )
+        for _, order in orders
+    ]
+
+
+def get_next_expiry(last_valid: list, clock: int):
+    return min(
+        (value + 1 for value in last_valid if value != 0 and value >= clock),
+        default=None,
+    )
+
+
+def test_expiry_index_matches_time_in_force():
+    # Orders that never expire (0), slot and timestamp expiries, and ties
+    time_in_force = [(0, 0), (150, 0), (150, 0), (120, 1_000), (0, 1_000), (0, 900)]
+    orders = [
+        (
+            FIFOOrderId(100, sequence_number),
+            FIFORestingOrder(1, 10, last_valid_slot, last_valid_unix_timestamp),
+        )
+        for sequence_number, (last_valid_slot, last_valid_unix_timestamp) in enumerate(
+            time_in_force
+        )
+    ]
+    expiry_index = OrderArrays.from_orders(orders).expiry_index
+    last_valid_slots = [slot for slot, _ in time_in_force]
+    last_valid_unix_timestamps = [unix_timestamp for _, unix_timestamp in time_in_force]
+    for slot in [-1, 0, 1, 119, 120, 121, 150, 151, 10**6]:
+        for unix_timestamp in [-1, 0, 899, 900, 901, 1_000, 1_001]:
+            expected = get_expired(orders, slot, unix_timestamp)
+            assert expiry_index.expired_mask(slot, unix_timestamp).tolist() == expected
+            assert expiry_index.expired_positions(slot, unix_timestamp).tolist() == [
+                position for position, expired in enumerate(expected) if expired
+            ]
+            assert expiry_index.next_expiry(slot, unix_timestamp) == (
+                get_next_expiry(last_valid_slots, slot),
+                get_next_expiry(last_valid_unix_timestamps, unix_timestamp),
+            )
+
+    # An order is still valid at its last valid slot and expires one slot later
+    assert expiry_index.expired_positions(150, -1).tolist() == [3]
+    assert expiry_index.expired_positions(151, -1).tolist() == [1, 2, 3]
+    assert expiry_index.next_expiry(150, 1_000) == (151, 1_001)
+    assert expiry_index.next_expiry(151, 1_001) == (None, None)
+
+
+def test_expiry_index_of_orders_without_time_in_force():
+    orders = make_orders(random.Random(4), Ask(), 20, 50)
+    expiry_index = OrderArrays.from_orders(orders).expiry_index
+    assert not expiry_index.expired_mask(10**9, 10**9).any()
+    assert expiry_index.next_expiry() == (None, None)
+    empty = OrderArrays.from_orders([]).expiry_index
+    assert len(empty.expired_mask(1, 1)) == 0
+    assert empty.next_expiry(1, 1) == (None, None)
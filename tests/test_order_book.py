@@ -0,0 +1,230 @@
+import random
+
+import pytest
+from solders.pubkey import Pubkey
+
+from market_accounts import MarketAccountBuilder, TreeBuilder
+from phoenix.events import PhoenixEventsFromInstruction
+from phoenix.market import Market
+from phoenix.order_book import OrderBook
+from phoenix.types import (
+    EvictEvent,
+    ExpiredOrderEvent,
+    FillEvent,
+    PlaceEvent,
+    ReduceEvent,
+    TimeInForceEvent,
+)
+from phoenix.types.audit_log_header import AuditLogHeader
+from phoenix.types.fifo_resting_order import FIFORestingOrder
+from phoenix.types.phoenix_market_event import (
+    Evict,
+    ExpiredOrder,
+    Fill,
+    Place,
+    Reduce,
+    TimeInForce,
+)
+
+MARKET = Pubkey.new_unique()
+MAKER = Pubkey.new_unique()
+TAKER = Pubkey.new_unique()
+
+
+def make_batch(
+    sequence_number: int, signer: Pubkey, events: list, market: Pubkey = MARKET
+) -> PhoenixEventsFromInstruction:
+    header = AuditLogHeader(
+        instruction=0,
+        sequence_number=sequence_number,
+        timestamp=0,
+        slot=0,
+        market=market,
+        signer=signer,
+        total_events=len(events),
+    )
+    return PhoenixEventsFromInstruction(header, events)
+
+
+def get_order(tree: TreeBuilder, address: int):
+    order_id, order = tree.entries[address]
+    return order_id.price_in_ticks, order_id.order_sequence_number, order
+
+
+def set_num_base_lots(tree: TreeBuilder, address: int, num_base_lots: int):
+    order_id, order = tree.entries[address]
+    tree.entries[address] = (
+        order_id,
+        FIFORestingOrder(
+            order.trader_index,
+            num_base_lots,
+            order.last_valid_slot,
+            order.last_valid_unix_timestamp_in_seconds,
+        ),
+    )
+
+
+def get_best_addresses(tree: TreeBuilder, count: int) -> list:
+    return sorted(
+        tree.entries, key=lambda address: tree.sort_key(tree.entries[address])
+    )[:count]
+
+
+class BookReplay:
+    """
+    Applies each instruction to both a market account and an OrderBook, so
+    that the book can be compared with a decoded snapshot after every batch.
+    """
+
+    def __init__(self, rng: random.Random):
+        self.account = MarketAccountBuilder()
+        self.maker_index = self.account.add_trader(MAKER)
+        self.account.add_trader(TAKER)
+        for _ in range(20):
+            self.account.add_order(
+                True, rng.randint(90, 99), self.maker_index, rng.randint(1, 100)
+            )
+            self.account.add_order(
+                False, rng.randint(101, 110), self.maker_index, rng.randint(1, 100)
+            )
+        self.snapshot = self.decode()
+        self.book = OrderBook(self.snapshot)
+
+    def decode(self) -> Market:
+        return Market.deserialize_market_data(MARKET, self.account.build())
+
+    def apply(self, signer: Pubkey, events: list):
+        assert self.book.apply(make_batch(self.book.sequence_number, signer, events))
+        market = self.decode()
+        assert self.book.sequence_number == market.sequence_number
+        assert self.book.bids == market.bids
+        assert self.book.asks == market.asks
+        return market
+
+
+def test_replay_matches_snapshots():
+    replay = BookReplay(random.Random(0))
+    account = replay.account
+
+    # Place a bid with a time in force and a post-only ask
+    bid = account.add_order(True, 99, replay.maker_index, 40, 150, 1_500)
+    ask = account.add_order(False, 101, replay.maker_index, 30)
+    price, bid_sequence_number, _ = get_order(account.bids, bid)
+    _, ask_sequence_number, _ = get_order(account.asks, ask)
+    replay.apply(
+        MAKER,
+        [
+            Place((PlaceEvent(0, bid_sequence_number, 7, price, 40),)),
+            TimeInForce(
+                (TimeInForceEvent(1, bid_sequence_number, 150, 1_500),),
+            ),
+            Place((PlaceEvent(2, ask_sequence_number, 8, 101, 30),)),
+        ],
+    )
+
+    # A taker buys through the best asks, fully filling the first and
+    # partially filling the second
+    events = []
+    for index, address in enumerate(get_best_addresses(account.asks, 2)):
+        price, sequence_number, order = get_order(account.asks, address)
+        remaining = 0 if index == 0 else order.num_base_lots - 1
+        events.append(
+            Fill(
+                (
+                    FillEvent(
+                        index,
+                        MAKER,
+                        sequence_number,
+                        price,
+                        order.num_base_lots - remaining,
+                        remaining,
+                    ),
+                )
+            )
+        )
+        if remaining == 0:
+            account.asks.remove(address)
+        else:
+            set_num_base_lots(account.asks, address, remaining)
+    replay.apply(TAKER, events)
+
+    # The maker reduces one bid and cancels another
+    reduced, cancelled = list(account.bids.entries)[:2]
+    events = []
+    for index, (address, remaining) in enumerate([(reduced, 1), (cancelled, 0)]):
+        price, sequence_number, order = get_order(account.bids, address)
+        events.append(
+            Reduce(
+                (
+                    ReduceEvent(
+                        index,
+                        sequence_number,
+                        price,
+                        order.num_base_lots - remaining,
+                        remaining,
+                    ),
+                )
+            )
+        )
+        if remaining == 0:
+            account.bids.remove(address)
+        else:
+            set_num_base_lots(account.bids, address, remaining)
+    replay.apply(MAKER, events)
+
+    # A new order evicts an ask, and an expired bid is removed
+    evicted = list(account.asks.entries)[-1]
+    expired = bid
+    price, evicted_sequence_number, order = get_order(account.asks, evicted)
+    _, expired_sequence_number, expired_order = get_order(account.bids, expired)
+    account.asks.remove(evicted)
+    account.bids.remove(expired)
+    market = replay.apply(
+        TAKER,
+        [
+            Evict(
+                (
+                    EvictEvent(
+                        0, MAKER, evicted_sequence_number, price, order.num_base_lots
+                    ),
+                )
+            ),
+            ExpiredOrder(
+                (
+                    ExpiredOrderEvent(
+                        1,
+                        MAKER,
+                        expired_sequence_number,
+                        99,
+                        expired_order.num_base_lots,
+                    ),
+                )
+            ),
+        ],
+    )
+
+    rebuilt = replay.book.to_market()
+    assert rebuilt.sequence_number == market.sequence_number
+    assert rebuilt.bids == market.bids
+    assert rebuilt.asks == market.asks
+    assert rebuilt.traders == replay.snapshot.traders
+    assert rebuilt.metadata is replay.snapshot.metadata
+
+
+def test_apply_skips_applied_batches_and_raises_on_gaps():
+    replay = BookReplay(random.Random(1))
+    book = replay.book
+    sequence_number = book.sequence_number
+    bids = list(book.bids)
+
+    assert not book.apply(make_batch(sequence_number - 1, MAKER, []))
+    assert not book.apply(
+        make_batch(sequence_number, MAKER, [], market=Pubkey.new_unique())
+    )
+    with pytest.raises(ValueError):
+        book.apply(make_batch(sequence_number + 1, MAKER, []))
+    assert book.sequence_number == sequence_number
+    assert book.bids == bids
+
+    assert book.apply(make_batch(sequence_number, MAKER, []))
+    assert book.sequence_number == sequence_number + 1
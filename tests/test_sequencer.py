@@ -0,0 +1,82 @@
+import asyncio
+from types import SimpleNamespace
+
+from solders.pubkey import Pubkey
+
+from phoenix.events import PhoenixEventsFromInstruction
+from phoenix.sequencer import MarketSequencer
+from phoenix.types.audit_log_header import AuditLogHeader
+
+MARKET = Pubkey.new_unique()
+
+
+def make_batch(sequence_number: int, slot: int) -> PhoenixEventsFromInstruction:
+    header = AuditLogHeader(
+        instruction=0,
+        sequence_number=sequence_number,
+        timestamp=0,
+        slot=slot,
+        market=MARKET,
+        signer=Pubkey.default(),
+        total_events=0,
+    )
+    return PhoenixEventsFromInstruction(header, [])
+
+
+def make_sequencer(snapshot_sequence_numbers, **kwargs) -> MarketSequencer:
+    """Sequencer whose snapshots are empty books at the given sequence numbers"""
+    snapshots = iter(snapshot_sequence_numbers)
+
+    async def fetch_snapshot():
+        return SimpleNamespace(
+            address=MARKET, sequence_number=next(snapshots), bids=[], asks=[]
+        )
+
+    return MarketSequencer(MARKET, fetch_snapshot, **kwargs)
+
+
+def push_all(sequencer: MarketSequencer, batches) -> int:
+    async def push():
+        applied = 0
+        for batch in batches:
+            applied += await sequencer.push(batch)
+        return applied
+
+    return asyncio.run(push())
+
+
+def test_applies_batches_in_sequence_order():
+    sequencer = make_sequencer([10])
+    applied = push_all(
+        sequencer, [make_batch(10, 100), make_batch(12, 101), make_batch(11, 101)]
+    )
+    assert applied == 3
+    assert sequencer.expected_sequence_number == 13
+    assert not sequencer.has_gap
+    assert sequencer.resync_count == 1
+
+
+def test_resyncs_when_too_many_batches_are_pending():
+    sequencer = make_sequencer([10, 13], max_pending=2, max_gap_slots=1_000)
+    push_all(sequencer, [make_batch(10, 100)])
+    # Batch 11 is lost
+    applied = push_all(
+        sequencer, [make_batch(12, 100), make_batch(13, 100), make_batch(14, 100)]
+    )
+    assert applied == 2
+    assert sequencer.expected_sequence_number == 15
+    assert sequencer.resync_count == 2
+
+
+def test_resyncs_when_a_gap_stays_open_too_long():
+    sequencer = make_sequencer([10, 12], max_gap_slots=5)
+    push_all(sequencer, [make_batch(10, 100)])
+    # Batch 11 is lost, and the gap is waited on for up to 5 slots
+    assert push_all(sequencer, [make_batch(12, 101), make_batch(13, 106)]) == 0
+    assert sequencer.gap_start_slot == 101
+    assert sequencer.resync_count == 1
+
+    assert push_all(sequencer, [make_batch(14, 107)]) == 3
+    assert sequencer.expected_sequence_number == 15
+    assert sequencer.gap_start_slot is None
+    assert sequencer.resync_count == 2
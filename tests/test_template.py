@@ -0,0 +1,42 @@
+from solders.instruction import AccountMeta
+from solders.pubkey import Pubkey
+
+from phoenix.instructions.template import (
+    InstructionTemplate,
+    InstructionTemplateCache,
+)
+from phoenix.program_id import PROGRAM_ID
+
+
+def make_template(trader: Pubkey) -> InstructionTemplate:
+    return InstructionTemplate(
+        PROGRAM_ID, b"\x02", [AccountMeta(trader, is_signer=True, is_writable=False)]
+    )
+
+
+def test_template_cache_evicts_least_recently_used():
+    traders = [Pubkey.new_unique() for _ in range(4)]
+    cache = InstructionTemplateCache(maxsize=2)
+    cache[("place_limit_order", traders[0])] = make_template(traders[0])
+    cache[("place_limit_order", traders[1])] = make_template(traders[1])
+    # Using the first template makes the second one the least recently used
+    assert cache.get(("place_limit_order", traders[0])).keys[0].pubkey == traders[0]
+    cache[("place_limit_order", traders[2])] = make_template(traders[2])
+
+    assert len(cache) == 2
+    assert ("place_limit_order", traders[0]) in cache
+    assert cache.get(("place_limit_order", traders[1])) is None
+    assert ("place_limit_order", traders[2]) in cache
+
+    for trader in traders:
+        cache[("swap", trader)] = make_template(trader)
+    assert len(cache) == 2
+    assert ("swap", traders[2]) in cache and ("swap", traders[3]) in cache
+
+
+def test_template_builds_instruction_with_encoded_args():
+    trader = Pubkey.new_unique()
+    instruction = make_template(trader).build_from_encoded_args(b"\x01\x02")
+    assert instruction.program_id == PROGRAM_ID
+    assert bytes(instruction.data) == b"\x02\x01\x02"
+    assert instruction.accounts[0].pubkey == trader